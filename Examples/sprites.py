@@ -21,6 +21,9 @@ def pos_dist(self, x, y, *args):
 
 @sequenced
 class MySprite(Sprite):
+	# Loaded once, shared by all the instances
+	bomb_sheet = SpriteSheet.from_grid('./Examples/tiles.png', 48, 48, columns=3, rows=1)
+
 	def __init__(self, parent, *args):
 		super().__init__(parent, *args)
 		self.set_size(50, 50)
@@ -46,11 +49,11 @@ class MySprite(Sprite):
 			bbox.setWidth(bbox.width() * time / duration)
 		painter.fillRect(bbox, self.get_background_color())
 	
-	@sequence('bomb', speed=100, action=StyledItem.move_to, distance_func=pos_dist, easing='Linear')
-	def _bomb_paint(self, painter, speed, time, duration):
-		f = int(time // speed) % 3
-		self.bg_clip_rect = (48 * f, 0, 48, 48)
-		StyledItem.paint(self, painter)
+	@frameseq('bomb', frames=3, fps=10, speed=100, action=StyledItem.move_to, distance_func=pos_dist, easing='Linear')
+	def _bomb_paint(self, painter, frame):
+		bbox = QRectF(0, 0, *self.get_size()).adjusted(1, 1, -1, -1)
+		painter.fillRect(bbox, self.get_background_color())
+		self.bomb_sheet.draw(painter, frame, bbox)
 
 s = MySprite(_root_, True)
 
@@ -0,0 +1,160 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Asyncio integrated with the Qt event loop.
+
+install() creates an asyncio event loop which runs inside the Qt one:
+a timer runs an iteration of it every few milliseconds, never waiting
+for I/O, so Qt keeps handling input and painting. Animations can then
+be awaited in coroutines, without nested event loops:
+
+	async def dance(it):
+		await it.move_to(100, 0)
+		await it.background_color_to((0, 0, 1))
+		async with par_anim_cm(it):
+			it.rotate_to(360)
+			it.resize_to(50, 50)
+
+	task = spawn(dance(it))
+	task.cancel() # Stops the animation being awaited
+
+The console accepts top-level await, and runs such commands as tasks.'''
+
+from PyQt5.QtCore import QAbstractAnimation, QTimer
+from PyQt5 import sip
+
+import asyncio
+import ast
+import code
+import inspect
+import traceback
+
+_loop = None
+_timer = None
+
+def _iterate():
+	# Qt may run nested event loops (e.g. blocking animations)
+	# from inside an iteration
+	if _loop.is_running():
+		return
+	# Run the callbacks that are ready, then return
+	_loop.call_soon(_loop.stop)
+	_loop.run_forever()
+
+def install(interval=5):
+	'''Create the asyncio loop and run it with the Qt one, checking it
+	every interval milliseconds. Requires a QApplication'''
+	global _loop, _timer
+	if _loop is not None:
+		return _loop
+	_loop = asyncio.new_event_loop()
+	asyncio.set_event_loop(_loop)
+	_timer = QTimer()
+	_timer.timeout.connect(_iterate)
+	_timer.start(interval)
+	return _loop
+
+def get_loop():
+	'''The installed loop, installing it if needed'''
+	return install()
+
+def _wake():
+	'''Run the loop soon, instead of waiting for the timer'''
+	QTimer.singleShot(0, _iterate)
+
+def _report(task):
+	'''Print the errors of tasks, as the console does for commands'''
+	if not task.cancelled() and task.exception() is not None:
+		exc = task.exception()
+		traceback.print_exception(type(exc), exc, exc.__traceback__)
+
+def spawn(coro):
+	'''Run coro concurrently, returns its asyncio task'''
+	task = get_loop().create_task(coro)
+	task.add_done_callback(_report)
+	_wake()
+	return task
+
+def animation_future(anim):
+	'''Returns a future done when anim (a Qt animation or a compiled
+	Timeline) finishes, and cancelled if anim is stopped (or deleted)
+	before its end. Cancelling the future stops the animation'''
+	if hasattr(anim, 'compiled'):
+		anim = anim.compiled()
+	loop = get_loop()
+	fut = loop.create_future()
+	# Stopped animations are deleted
+	if anim is None or sip.isdeleted(anim) or anim.state() == QAbstractAnimation.Stopped:
+		fut.set_result(None)
+		return fut
+
+	def _settle(finished):
+		if not fut.done():
+			if finished:
+				fut.set_result(None)
+			else:
+				fut.cancel()
+			_wake()
+
+	def _finished():
+		_settle(True)
+
+	def _state_changed(new_state, old_state):
+		# Qt emits finished right after stopping, only if anim reached its end
+		if new_state == QAbstractAnimation.Stopped:
+			loop.call_soon(_settle, False)
+			_wake()
+
+	def _destroyed():
+		_settle(False)
+
+	anim.finished.connect(_finished)
+	anim.stateChanged.connect(_state_changed)
+	anim.destroyed.connect(_destroyed)
+
+	def _done(f):
+		if sip.isdeleted(anim):
+			return
+		anim.finished.disconnect(_finished)
+		anim.stateChanged.disconnect(_state_changed)
+		anim.destroyed.disconnect(_destroyed)
+		if f.cancelled() and anim.state() != QAbstractAnimation.Stopped:
+			anim.stop()
+	fut.add_done_callback(_done)
+	return fut
+
+def sleep(ms):
+	'''Awaitable pause of ms milliseconds'''
+	return asyncio.sleep(ms / 1000)
+
+class AsyncConsole(code.InteractiveConsole):
+	'''Interactive console accepting top-level await: commands using it
+	are spawned as tasks, so the console is not blocked'''
+
+	def __init__(self, locals=None, filename='<console>'):
+		super().__init__(locals, filename)
+		self.compile.compiler.flags |= ast.PyCF_ALLOW_TOP_LEVEL_AWAIT
+
+	def runcode(self, code):
+		if not code.co_flags & inspect.CO_COROUTINE:
+			return super().runcode(code)
+		try:
+			spawn(eval(code, self.locals))
+		except SystemExit:
+			raise
+		except:
+			self.showtraceback()
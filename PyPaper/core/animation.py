@@ -15,26 +15,156 @@
 #
 # Copyright 2015 Alessandro "AkiRoss" Re
 
-from PyQt5.QtCore import QAbstractAnimation, QVariantAnimation, QPropertyAnimation, QParallelAnimationGroup, QSequentialAnimationGroup, QEasingCurve, QEventLoop, QVariant
+from PyQt5.QtCore import QAbstractAnimation, QAnimationGroup, QVariantAnimation, QPropertyAnimation, QParallelAnimationGroup, QSequentialAnimationGroup, QEasingCurve, QEventLoop, QVariant
+
+from PyQt5.QtCore import QObject, QPoint, QPointF, QSize, QSizeF, QRect, QRectF, QLine, QLineF
+from PyQt5.QtGui import QColor
+from PyQt5 import sip
+
+from PyPaper.core.easing import easing_curve
+
+from functools import partial
+
+import time
+
+def _color_distance(v1, v2):
+	return ((v1.redF() - v2.redF()) ** 2 + (v1.greenF() - v2.greenF()) ** 2 + (v1.blueF() - v2.blueF()) ** 2 + (v1.alphaF() - v2.alphaF()) ** 2) ** 0.5
+
+def _point_distance(v1, v2):
+	return ((v1.x() - v2.x()) ** 2 + (v1.y() - v2.y()) ** 2) ** 0.5
+
+def _size_distance(v1, v2):
+	return ((v1.width() - v2.width()) ** 2 + (v1.height() - v2.height()) ** 2) ** 0.5
+
+def _rect_distance(v1, v2):
+	# The farthest travelled corner: no corner moves faster than speed
+	return max(_point_distance(v1.topLeft(), v2.topLeft()), _point_distance(v1.bottomRight(), v2.bottomRight()))
+
+def _line_distance(v1, v2):
+	return max(_point_distance(v1.p1(), v2.p1()), _point_distance(v1.p2(), v2.p2()))
+
+def _tuple_distance(v1, v2):
+	return sum((b - a) ** 2 for a, b in zip(v1, v2)) ** 0.5
+
+# Distance functions by type, see register_metric
+_METRICS = {
+	QColor: _color_distance,
+	QPointF: _point_distance,
+	QPoint: _point_distance,
+	QSizeF: _size_distance,
+	QSize: _size_distance,
+	QRectF: _rect_distance,
+	QRect: _rect_distance,
+	QLineF: _line_distance,
+	QLine: _line_distance,
+	tuple: _tuple_distance,
+	list: _tuple_distance,
+}
+
+def register_metric(kind, func):
+	'''Use func(v1, v2) as distance between values of type kind (and
+	its subclasses) when computing durations from speed'''
+	_METRICS[kind] = func
 
 def qvariant_distance(v1, v2):
 	'''This method computes the distance between two QVariants value,
 	it is used to calculate the duration of animations based on speed.
-	This function has to return a float'''
-	assert(isinstance(v1, type(v2)) or isinstance(v2, type(v1)))
-
-	from PyQt5.QtGui import QColor
-	from PyQt5.QtCore import QPointF, QPoint, QSizeF, QSize
-	# TODO do the same for the other types: rect(f), line(f), point(f), size(f)
-
-	if isinstance(v1, QColor):
-		return ((v1.redF() - v2.redF()) ** 2 + (v1.greenF() - v2.greenF()) ** 2 + (v1.blueF() - v2.blueF()) ** 2 + (v1.alphaF() - v2.alphaF()) ** 2) ** 0.5
-	if isinstance(v1, QPointF) or isinstance(v1, QPoint):
-		return ((v1.x() - v2.x()) ** 2 + (v1.y() - v2.y()) ** 2) ** 0.5
-	if isinstance(v1, QSizeF) or isinstance(v1, QSize):
-		return ((v1.width() - v2.width()) ** 2 + (v1.height() - v2.height()) ** 2) ** 0.5
+	The function is chosen by the type of v1, see register_metric;
+	numbers use their difference. This function has to return a float'''
+	for kind in type(v1).__mro__:
+		func = _METRICS.get(kind)
+		if func is not None:
+			return float(func(v1, v2))
 	return abs(v2 - v1)
 
+def value_components(value):
+	'''Returns the components of value (a number, QPointF, QSizeF, QColor
+	or tuple of numbers) as a list of floats, and a function building
+	a value of the same type from the components'''
+	if isinstance(value, QPointF):
+		return [value.x(), value.y()], lambda v: QPointF(v[0], v[1])
+	if isinstance(value, QSizeF):
+		return [value.width(), value.height()], lambda v: QSizeF(v[0], v[1])
+	if isinstance(value, QColor):
+		return list(value.getRgbF()), lambda v: QColor.fromRgbF(*v)
+	if isinstance(value, (tuple, list)):
+		kind = type(value)
+		return [float(c) for c in value], lambda v: kind(v)
+	return [float(value)], lambda v: v[0]
+
+def _is_qt_property(obj, attr):
+	return isinstance(obj, QObject) and obj.metaObject().indexOfProperty(attr) >= 0
+
+def read_property(obj, attr):
+	'''Value of a Qt property or of a plain attribute'''
+	if _is_qt_property(obj, attr):
+		return obj.property(attr)
+	return getattr(obj, attr)
+
+# Setters of common item properties, avoiding setProperty
+_FAST_SETTERS = {
+	'x': lambda o, v: o.setX(v[0]),
+	'y': lambda o, v: o.setY(v[0]),
+	'pos': lambda o, v: (o.setX(v[0]), o.setY(v[1])),
+	'width': lambda o, v: o.setWidth(v[0]),
+	'height': lambda o, v: o.setHeight(v[0]),
+	'size': lambda o, v: (o.setWidth(v[0]), o.setHeight(v[1])),
+	'opacity': lambda o, v: o.setOpacity(v[0]),
+	'rotation': lambda o, v: o.setRotation(v[0]),
+	'scale': lambda o, v: o.setScale(v[0]),
+	'background_color': lambda o, v: o.set_background_color(QColor.fromRgbF(*v)),
+	'border_color': lambda o, v: o.set_border_color(QColor.fromRgbF(*v)),
+}
+
+def property_writer(obj, attr, make):
+	'''Returns a function(obj, components) setting attr of obj, a Qt
+	property or a plain attribute. make builds the value from the
+	components, see value_components'''
+	writer = _FAST_SETTERS.get(attr) if isinstance(obj, QObject) else None
+	if writer is None:
+		if _is_qt_property(obj, attr):
+			writer = lambda o, v: o.setProperty(attr, make(v))
+		else:
+			writer = lambda o, v: setattr(o, attr, make(v))
+	return writer
+
+# Clock driving the animations started by PyPaper, None for wall time
+_clock = None
+
+def set_clock(clock):
+	'''Install a clock (e.g. a render.VirtualClock) driving the animations
+	started from now on, or None to go back to wall time'''
+	global _clock
+	_clock = clock
+
+def get_clock():
+	return _clock
+
+def start_animation(anim, policy=QAbstractAnimation.KeepWhenStopped):
+	'''Start anim, on the installed clock if any'''
+	if _clock is None:
+		anim.start(policy)
+	else:
+		_clock.start(anim, policy)
+
+def wait_animation(anim):
+	'''Start anim and return when it is finished'''
+	if _clock is not None:
+		_clock.start(anim)
+		_clock.wait(anim)
+		return
+	loop = QEventLoop()
+	# Connect signal termination to end of event
+	anim.finished.connect(loop.quit)
+	# Start animation and wait
+	anim.start()
+	# FIXME exec_ should use ExcludeUserInputEvents to prevent
+	# other events to be fired while this is still running
+	# but using it produce sloppy animations... Don't know why.
+	# FIXME as a temporary fix, we are using flags to prevent 
+	# nested loops, but it is so fragile...
+	loop.exec_()
+
 class TimeAnim(QVariantAnimation):
 	'''When animation starts, the duration_func is called to get
 	the duration of the animation. Animation will always start at 0
@@ -46,11 +176,7 @@ class TimeAnim(QVariantAnimation):
 		self._callback = callback
 
 		# Set the easing curve
-		if hasattr(QEasingCurve, easing):
-			ec = getattr(QEasingCurve, easing)
-		else:
-			ec = QEasingCurve.Linear
-		self.setEasingCurve(ec)
+		self.setEasingCurve(easing_curve(easing))
 	
 	def updateCurrentValue(self, new_val):
 		self._callback(new_val, self._duration)
@@ -62,7 +188,10 @@ class TimeAnim(QVariantAnimation):
 			self._duration = float(self._duration_f())
 			self.setStartValue(0.0)
 			self.setEndValue(self._duration)
-			self.setDuration(self._duration)
+			self.setDuration(int(round(self._duration)))
+
+# Speed based animations created since the last planning
+_unplanned = 0
 
 class PropertyAnimation(QPropertyAnimation):
 	'''This class extends QPropertyAnimation to support "speed",
@@ -75,39 +204,53 @@ class PropertyAnimation(QPropertyAnimation):
 		'''distance_f is the distance function which receives the start and end value and returns
 		their distance
 		'''
+		# Property names must be bytes
+		if isinstance(prop, str):
+			prop = prop.encode()
 		super().__init__(obj, prop)
 		self._speed = None
+		self._planned = False
 		self._df = distance_f
 	
 	def set_speed(self, speed):
+		global _unplanned
 		self._speed = speed
+		self._planned = False
+		if speed:
+			_unplanned += 1
 	
 	def compute_duration(self, start_val, end_val):
 		d = 1000 * self._df(start_val, end_val) / self._speed
 		return d
 	
+	def get_speed(self):
+		return self._speed
+
+	def set_planned_duration(self, duration):
+		'''Set the duration computed ahead of time from speed (see
+		resolve_durations): it is not computed again when starting'''
+		self.setDuration(int(round(duration)))
+		self._planned = True
+
 	def updateState(self, new_state, old_state):
 		super().updateState(new_state, old_state)
 		# When starting, change current value and end value
-		if self._speed and new_state == QPropertyAnimation.Running and old_state == QPropertyAnimation.Stopped:
+		if self._speed and not self._planned and new_state == QPropertyAnimation.Running and old_state == QPropertyAnimation.Stopped:
 			# Get start and end values
 			sv, ev = self.startValue(), self.endValue()
 			# Get current value for property
-			cv = self.targetObject().property(self.propertyName())
+			if sv is None or ev is None:
+				cv = self.targetObject().property(bytes(self.propertyName()).decode())
 			if sv is None:
 				sv = cv
-			elif ev is NOne:
+			if ev is None:
 				ev = cv
 			duration = self.compute_duration(sv, ev)
-			self.setDuration(duration)
+			self.setDuration(int(round(duration)))
 
 def prop_animation(obj, prop, end, duration=500, easing='InOutQuad', start=None, speed=None):#, on_finished=None):
 	'''Builds a property animation for an object'''
-	if hasattr(QEasingCurve, easing):
-		ec = getattr(QEasingCurve, easing)
-	else:
-		ec = QEasingCurve.Linear
-	
+	ec = easing_curve(easing)
 	an = PropertyAnimation(obj, prop)
 	if start is not None:
 		an.setStartValue(start)
@@ -118,35 +261,292 @@ def prop_animation(obj, prop, end, duration=500, easing='InOutQuad', start=None,
 
 	return an
 
+# Properties made of other properties, for the planner
+_COMPOSITES = {
+	'pos': ('x', 'y', QPointF),
+	'size': ('width', 'height', QSizeF),
+}
+
+class _Plan:
+	'''Values the properties will have, while walking a tree of animations.
+	Composite properties are stored by part, so pos and x agree.
+	A plan only holds the values set in it, others are read from the
+	parent plan, or from the objects'''
+
+	def __init__(self, parent=None):
+		self.values = {} # (object, property name): value
+		self._parent = parent
+
+	def get(self, obj, name):
+		comp = _COMPOSITES.get(name)
+		if comp is not None:
+			return comp[2](self.get(obj, comp[0]), self.get(obj, comp[1]))
+		plan = self
+		while plan is not None:
+			v = plan.values.get((obj, name))
+			if v is not None:
+				return v
+			plan = plan._parent
+		return obj.property(name)
+
+	def set(self, obj, name, value):
+		comp = _COMPOSITES.get(name)
+		if comp is not None:
+			a, b = value_components(value)[0]
+			self.values[(obj, comp[0])] = a
+			self.values[(obj, comp[1])] = b
+		else:
+			self.values[(obj, name)] = value
+
+def _plan(anim, plan):
+	'''Resolve the durations in anim, starting from plan, which is
+	updated with the values at the end of anim. Returns False if some
+	duration is known only when starting'''
+	if isinstance(anim, QSequentialAnimationGroup):
+		ok = True
+		for i in range(anim.animationCount()):
+			ok = _plan(anim.animationAt(i), plan) and ok
+		return ok
+	if isinstance(anim, QAnimationGroup):
+		# Children start together from the same values
+		ok = True
+		ends = []
+		for i in range(anim.animationCount()):
+			child = _Plan(plan)
+			ok = _plan(anim.animationAt(i), child) and ok
+			ends.append(child)
+		for child in ends:
+			plan.values.update(child.values)
+		return ok
+	if isinstance(anim, QPropertyAnimation):
+		obj, name = anim.targetObject(), bytes(anim.propertyName()).decode()
+		sv, ev = anim.startValue(), anim.endValue()
+		if sv is None:
+			sv = plan.get(obj, name)
+		if ev is None:
+			ev = plan.get(obj, name)
+		if isinstance(anim, PropertyAnimation) and anim.get_speed():
+			anim.set_planned_duration(anim.compute_duration(sv, ev))
+		plan.set(obj, name, ev)
+		return True
+	# E.g. TimeAnim, computing the duration when starting
+	return not isinstance(anim, TimeAnim)
+
+def resolve_durations(anim):
+	'''Compute the durations of the speed based animations in the tree
+	of anim, before it starts: the end value of each animation is the
+	start value of the next one on the same property. After this,
+	anim.totalDuration() is known. Returns True if every duration is
+	known, False if some (e.g. of TimeAnim) are still computed when
+	starting'''
+	return _plan(anim, _Plan())
+
+class _Callbacks(list):
+	'''Mimics a signal: functions connected here are called when the
+	compiled animation finishes'''
+	def connect(self, func):
+		self.append(func)
+
+	def disconnect(self, func):
+		self.remove(func)
+
+class Timeline:
+	'''Lightweight group of animations, recorded inside an animation context.
+	When the outermost context exits, the timeline is compiled in a minimal
+	tree of Qt animation groups: groups with a single child are replaced by
+	the child, and groups nested in a group of the same kind (sequential
+	in sequential, parallel in parallel) are merged in it.
+	Supports addAnimation and finished.connect, like Qt groups.
+	Once compiled, timelines can be awaited in coroutines (see core.aio)'''
+
+	def __init__(self, sequential):
+		self.sequential = sequential
+		self.children = [] # Qt animations and timelines
+		self.finished = _Callbacks()
+		self.animation = None # Compiled animation
+		self._parent = None
+		_stats['timelines'] += 1
+
+	def addAnimation(self, anim):
+		if isinstance(anim, Timeline):
+			if anim._parent is self:
+				# Added again, e.g. once for each item of its context
+				return
+			# Like Qt, an animation belongs to one group
+			if anim._parent is not None:
+				anim._parent.children.remove(anim)
+			anim._parent = self
+		else:
+			_stats['animations'] += 1
+		self.children.append(anim)
+
+	def compile(self):
+		'''Returns the Qt animation for this timeline, None if empty'''
+		t0 = time.perf_counter()
+		anim = self._build()
+		_stats['compiles'] += 1
+		_stats['build_time'] += time.perf_counter() - t0
+		return anim
+
+	def _flat_children(self):
+		'''Compiled children, merging timelines of the same kind'''
+		out = []
+		for c in self.children:
+			if not isinstance(c, Timeline):
+				out.append(c)
+			elif c.sequential == self.sequential and not c.finished:
+				out.extend(c._flat_children())
+			else:
+				anim = c._build()
+				if anim is not None:
+					out.append(anim)
+		return out
+
+	def _build(self):
+		children = self._flat_children()
+		if len(children) == 1:
+			anim = children[0]
+		elif not children and not self.finished:
+			return None
+		else:
+			anim = QSequentialAnimationGroup() if self.sequential else QParallelAnimationGroup()
+			for c in children:
+				anim.addAnimation(c)
+			_stats['groups'] += 1
+		for func in self.finished:
+			anim.finished.connect(func)
+		self.animation = anim
+		return anim
+
+	def compiled(self):
+		'''The compiled animation playing this timeline: if it was merged
+		in the parent, the animation of the parent'''
+		tl = self
+		while tl is not None and tl.animation is None:
+			tl = tl._parent
+		return None if tl is None else tl.animation
+
+	def __await__(self):
+		from PyPaper.core.aio import animation_future
+		return animation_future(self).__await__()
+
+_stats = dict.fromkeys(('timelines', 'animations', 'groups', 'compiles', 'build_time'), 0)
+
+def timeline_stats():
+	'''Returns a dict with the number of timelines and animations recorded,
+	the number of Qt groups they were compiled to, the number of compiles
+	and the total time spent compiling (in seconds)'''
+	return dict(_stats)
+
+def reset_timeline_stats():
+	for k in _stats:
+		_stats[k] = 0
+
+# Animations started by contexts: items they involve, number of objects
+_live = {}
+# Released animations waiting for deletion, with their number of objects.
+# Keeping the wrappers ensures that destroyed is delivered
+_dying = {}
+_lifecycle = dict.fromkeys(('objects', 'started', 'released'), 0)
+
+def _count_objects(anim):
+	n = 1
+	if isinstance(anim, QAnimationGroup):
+		for i in range(anim.animationCount()):
+			n += _count_objects(anim.animationAt(i))
+	return n
+
+def _track(anim, items):
+	'''Record anim as running on items, until it stops'''
+	n = _count_objects(anim)
+	_live[anim] = (items, n)
+	for item in items:
+		item._animations.append(anim)
+	_lifecycle['objects'] += n
+	_lifecycle['started'] += 1
+	anim.stateChanged.connect(partial(_state_changed, anim))
+	anim.destroyed.connect(partial(_destroyed, anim))
+
+def _state_changed(anim, new_state, old_state):
+	if new_state == QAbstractAnimation.Stopped:
+		_release(anim)
+
+def _destroyed(anim):
+	_lifecycle['objects'] -= _dying.pop(anim, 0)
+
+def _release(anim):
+	'''Forget a stopped animation and delete it, with its children'''
+	items, n = _live.pop(anim, (None, 0))
+	if items is None:
+		return
+	for item in items:
+		if not sip.isdeleted(item):
+			item._animations.remove(anim)
+	_lifecycle['released'] += 1
+	if sip.isdeleted(anim):
+		# Stopped while being destroyed
+		_lifecycle['objects'] -= n
+		return
+	_dying[anim] = n
+	# Qt deletes it when control returns to the event loop, even
+	# if Python still has references (e.g. awaited timelines)
+	sip.transferto(anim, None)
+	anim.deleteLater()
+
+def running_animations(item=None):
+	'''Returns the running (or paused) animations started by contexts,
+	those involving item if given'''
+	if item is None:
+		return list(_live)
+	return list(item._animations)
+
+def stop_animations(item=None, finish=False):
+	'''Stop the running animations, those involving item if given.
+	Animations stop where they are, without calling on_finished, and
+	coroutines awaiting them are cancelled: to jump to their end
+	(calling on_finished and waking awaits normally) use finish=True.
+	Note that an animation built in a context with several items is
+	stopped for all of them'''
+	for anim in running_animations(item):
+		if sip.isdeleted(anim) or anim.state() == QAbstractAnimation.Stopped:
+			continue
+		if finish and anim.totalDuration() >= 0:
+			anim.setCurrentTime(anim.totalDuration())
+		if anim.state() != QAbstractAnimation.Stopped:
+			anim.stop()
+
+def animation_stats():
+	'''Returns a dict with the number of running animations, the number
+	of Qt animation objects alive in their trees (flat with continuous
+	animation, since trees are deleted when they stop), and the number of
+	animations started and released since the start'''
+	stats = dict(_lifecycle)
+	stats['running'] = len(_live)
+	return stats
+
 class AnimContextManager:
-	'''Builds a context manager to handle animation groups'''
+	'''Builds a context manager to handle animation groups.
+	Inside the context, animations are recorded in a Timeline, which is
+	compiled and started when the outermost context exits'''
 	def __init__(self, sequential, blocking, *items, parent=None):
 		self._its = set(items) # Unique items
 		self._seq = sequential
 		self._block = blocking
 		self._parent = parent
 
-	def _clear_anims(self, item):
-		def is_not_stopped(a):
-			return a.state() != QAbstractAnimation.Stopped
-		item._animations = list(filter(is_not_stopped, item._animations))
-
 	def __enter__(self):
 		'''When entering the context, each item subject to animation
 		will have a property set to the current animation group'''
-		if self._seq:
-			self._animation_group = QSequentialAnimationGroup()
-		else:
-			self._animation_group = QParallelAnimationGroup()
+		self._animation_group = Timeline(self._seq)
 
 		for item in self._its:
-			self._clear_anims(item)
 			# Save to current item
 			item._animation_contexts.append(self)
 		return self._animation_group
 
 	def __exit__(self, excep_type, excep_value, excep_traceback):
 		'''Start the animation and clean the property in the subject items'''
+		outermost = [] # Items for which this was the last context
 		for item in self._its:
 			# Let's close the current context
 			ctx = item._animation_contexts.pop()
@@ -154,32 +554,47 @@ class AnimContextManager:
 				print('WARNING: I think this should never happen :|')
 			if self._parent:
 				# If a parent context manager has been provided, use it
-				self._parent.addAnimation(ctx._animation_group)
+				if isinstance(self._parent, Timeline):
+					self._parent.addAnimation(ctx._animation_group)
+				elif not outermost:
+					# A Qt group: add the compiled animation, once
+					outermost.append(item)
+					anim = self._animation_group.compile()
+					if anim is not None:
+						self._parent.addAnimation(anim)
 			elif item._animation_contexts:
 				# If there was a previous group, add to that group
 				item._animation_contexts[-1]._animation_group.addAnimation(ctx._animation_group)
 			else:
-				# If it's the last one, save into animations and start
-				item._animations.append(self._animation_group)
-				# Start animation
-				if self._block:
-					loop = QEventLoop()
-					# Connect signal termination to end of event
-					self._animation_group.finished.connect(loop.quit)
-					# Start animation and wait
-					#anim.start()
-					self._animation_group.start()
-					# FIXME exec_ should use ExcludeUserInputEvents to prevent
-					# other events to be fired while this is still running
-					# but using it produce sloppy animations... Don't know why.
-					# FIXME as a temporary fix, we are using flags to prevent 
-					# nested loops, but it is so fragile...
-					loop.exec_()
-					# Callback if necessary
-					#if on_finished is not None:
-					#	on_finished()
-				else:
-					self._animation_group.start()
+				outermost.append(item)
+		if self._parent or not outermost:
+			return
+
+		# Compile, save into animations and start
+		anim = self._animation_group.compile()
+		if anim is None:
+			return
+		# Durations from speed are known before starting
+		global _unplanned
+		if _unplanned:
+			resolve_durations(anim)
+			_unplanned = 0
+		_track(anim, outermost)
+		# Start animation
+		if self._block:
+			wait_animation(anim)
+		else:
+			start_animation(anim)
+
+	async def __aenter__(self):
+		return self.__enter__()
+
+	async def __aexit__(self, excep_type, excep_value, excep_traceback):
+		'''Start the animation and wait for it, without blocking'''
+		self._block = False
+		self.__exit__(excep_type, excep_value, excep_traceback)
+		if excep_type is None:
+			await self._animation_group
 
 def seq_anim_cm(*items, **kwargs):
 	return AnimContextManager(True, False, *items, **kwargs)
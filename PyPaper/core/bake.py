@@ -0,0 +1,217 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Baking of animations into sampled arrays.
+
+bake runs an animation tree offline, stepping it at a fixed frame rate,
+and records the value of every animated property at each step. The
+resulting BakedTimeline can seek to any time by indexing the samples,
+and play forward, backward or be scrubbed without running the Qt
+animations (or the script that built them) again.
+
+	with seq_anim_cm(a, b):
+		...
+	baked = bake(a, b, fps=60)
+	baked.seek(12500)
+	baked.play(reverse=True)
+'''
+
+from PyQt5.QtCore import QAbstractAnimation, QAnimationGroup, QPropertyAnimation
+
+from PyPaper.core.animation import value_components, read_property, property_writer, start_animation
+
+from array import array
+from functools import partial
+import math
+
+def _property_animations(anim):
+	'''Yields the property animations in the tree of anim'''
+	if isinstance(anim, QAnimationGroup):
+		for i in range(anim.animationCount()):
+			yield from _property_animations(anim.animationAt(i))
+	elif isinstance(anim, QPropertyAnimation):
+		yield anim
+
+class _Track:
+	'''Samples of one attribute of one object'''
+
+	def __init__(self, obj, attr):
+		self.obj = obj
+		self.attr = attr
+		self._values = array('d') # Components of each sample, in sequence
+		self._n = None # Components per sample
+		self._writer = None
+		self._applied = None # Components last written
+
+	def sample(self):
+		comps, make = value_components(read_property(self.obj, self.attr))
+		if self._n is None:
+			self._n = len(comps)
+			self._writer = property_writer(self.obj, self.attr, make)
+		self._values.extend(comps)
+
+	def value(self, k):
+		n = self._n
+		return self._values[k * n:(k + 1) * n].tolist()
+
+	def apply(self, k):
+		'''Write sample k, unless it is what was written last'''
+		v = self.value(k)
+		if v != self._applied:
+			self._writer(self.obj, v)
+			self._applied = v
+
+def bake(*sources, fps=60, track=()):
+	'''Bake animations, sampling them fps times per second. sources are
+	Qt animations or items, whose current animations are baked.
+	Property animations are found in the animation trees; other values
+	changed while playing (e.g. by TimeAnim callbacks) can be sampled
+	by listing (object, attribute) pairs in track.
+	Animations are run to the end, then the baked timeline is seeked to 0'''
+	roots = []
+	for s in sources:
+		if isinstance(s, QAbstractAnimation):
+			roots.append(s)
+		else:
+			roots.extend(s._animations)
+	if not roots:
+		raise RuntimeError('Nothing to bake')
+
+	tracks = {}
+	for r in roots:
+		for a in _property_animations(r):
+			obj, attr = a.targetObject(), bytes(a.propertyName()).decode()
+			tracks.setdefault((obj, attr), None)
+	for obj, attr in track:
+		tracks.setdefault((obj, attr), None)
+	tracks = [_Track(obj, attr) for obj, attr in tracks]
+
+	# Paused animations are driven only by setCurrentTime
+	for r in roots:
+		r.stop()
+		r.start()
+		r.pause()
+	step = 1000 / fps
+	k = 0
+	while True:
+		t = k * step
+		# Durations computed from speed are known only when animations
+		# start, so the total duration is checked at each step
+		total = max(r.totalDuration() for r in roots)
+		if total < 0:
+			for r in roots:
+				r.stop()
+			raise RuntimeError('Cannot bake animations running forever')
+		t = min(t, total)
+		for r in roots:
+			if r.state() != QAbstractAnimation.Stopped:
+				r.setCurrentTime(int(round(t)))
+		for tr in tracks:
+			tr.sample()
+		if t >= total:
+			break
+		k += 1
+	for r in roots:
+		r.stop()
+
+	baked = BakedTimeline(tracks, fps, total, k + 1)
+	baked.seek(0)
+	return baked
+
+class _Player(QAbstractAnimation):
+	'''Plays a BakedTimeline from a time, in one direction'''
+
+	def __init__(self, baked, start, reverse, speed):
+		super().__init__()
+		self._baked = baked
+		self._start = start
+		self._dir = -speed if reverse else speed
+		self._length = (start if reverse else baked.duration - start) / speed
+
+	def duration(self):
+		return int(math.ceil(self._length))
+
+	def updateCurrentTime(self, t):
+		self._baked.seek(self._start + self._dir * t)
+
+class BakedTimeline:
+	'''Sampled values of baked animations. Seeking writes, for each
+	property, the sample nearest to the given time'''
+
+	def __init__(self, tracks, fps, duration, samples):
+		self._tracks = tracks
+		self.fps = fps
+		self.duration = duration
+		self._samples = samples
+		self._time = 0
+		self._player = None
+
+	def __len__(self):
+		'''Number of samples'''
+		return self._samples
+
+	def targets(self):
+		'''Returns the (object, attribute) pairs of the baked values'''
+		return [(tr.obj, tr.attr) for tr in self._tracks]
+
+	def get_time(self):
+		return self._time
+
+	def seek(self, t):
+		'''Show the state at time t (in milliseconds, clamped to the duration)'''
+		t = min(max(t, 0), self.duration)
+		self._time = t
+		k = min(int(round(t * self.fps / 1000)), self._samples - 1)
+		for tr in self._tracks:
+			tr.apply(k)
+
+	def play(self, reverse=False, speed=1.0, on_finished=None):
+		'''Play from the current time to the end (or to the start, if
+		reverse), speed times faster than real time'''
+		self.stop()
+		start = self._time
+		if not reverse and start >= self.duration:
+			start = 0
+		elif reverse and start <= 0:
+			start = self.duration
+		self._player = _Player(self, start, reverse, speed)
+		# The player is deleted when it stops, at the end or when stopped
+		self._player.stateChanged.connect(partial(self._player_state, self._player))
+		if on_finished is not None:
+			self._player.finished.connect(on_finished)
+		start_animation(self._player, QAbstractAnimation.DeleteWhenStopped)
+
+	def reverse(self, **kwargs):
+		self.play(reverse=True, **kwargs)
+
+	def pause(self):
+		if self._player is not None:
+			self._player.pause()
+
+	def resume(self):
+		if self._player is not None:
+			self._player.resume()
+
+	def stop(self):
+		'''Stop playing, keeping the current state'''
+		if self._player is not None:
+			player, self._player = self._player, None
+			player.stop()
+
+	def _player_state(self, player, new, old):
+		if new == QAbstractAnimation.Stopped and self._player is player:
+			self._player = None
@@ -0,0 +1,163 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Console output for the Window.
+
+Writes to the streams are split in lines and queued; the queue is
+flushed to the QPlainTextEdit at most once per frame, inserting all the
+pending lines at once. The scrollback is a ring of at most max_blocks
+lines: lines pushed out of it are appended to the log file, if any.
+
+	output = ConsoleOutput(edit, max_blocks=10000, log_path='console.log')
+	sys.stdout = output.writer('black', tee=sys.__stdout__)
+'''
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QTextCursor, QTextCharFormat, QColor
+
+from collections import deque
+import io
+
+class ConsoleOutput:
+	'''Batches the lines written to one or more ConsoleWriters'''
+
+	def __init__(self, edit, max_blocks=10000, log_path=None, interval=16):
+		'''edit is the QPlainTextEdit showing the output, max_blocks the
+		number of lines kept (0 for no limit), log_path the file receiving
+		the lines removed from the scrollback and interval the minimum time
+		between two updates of edit, in ms'''
+		self._edit = edit
+		self._max = max_blocks
+		self._lines = deque() # (color, text) in the scrollback
+		self._pending = 0 # Lines at the end of _lines not in edit yet
+		self._log_path = log_path
+		self._log = None
+		self._formats = {}
+		edit.setMaximumBlockCount(max_blocks)
+		self._timer = QTimer()
+		self._timer.setSingleShot(True)
+		self._timer.setInterval(interval)
+		self._timer.timeout.connect(self.flush)
+
+	def writer(self, color=None, tee=None):
+		'''Returns a stream writing here with the given color'''
+		return ConsoleWriter(self, color, tee)
+
+	def push(self, color, lines):
+		'''Queue complete lines'''
+		ring = self._lines
+		for line in lines:
+			ring.append((color, line))
+		self._pending += len(lines)
+		if self._max:
+			# Drop the oldest lines, saving them
+			over = len(ring) - self._max
+			if over > 0:
+				self._log_lines([ring.popleft()[1] for _ in range(over)])
+				self._pending = min(self._pending, self._max)
+		if not self._timer.isActive():
+			self._timer.start()
+
+	def flush(self):
+		'''Show the pending lines in the edit'''
+		self._timer.stop()
+		if self._log is not None:
+			self._log.flush()
+		n, self._pending = self._pending, 0
+		if not n:
+			return
+		ring = self._lines
+		start = len(ring) - n
+		cursor = QTextCursor(self._edit.document())
+		cursor.beginEditBlock()
+		cursor.movePosition(QTextCursor.End)
+		# Consecutive lines with the same color are inserted together
+		sep = '' if self._edit.document().isEmpty() else '\n'
+		i = start
+		while i < len(ring):
+			color = ring[i][0]
+			j = i + 1
+			while j < len(ring) and ring[j][0] == color:
+				j += 1
+			cursor.insertText(sep + '\n'.join(ring[k][1] for k in range(i, j)), self._format(color))
+			sep = '\n'
+			i = j
+		cursor.endEditBlock()
+		self._edit.verticalScrollBar().setValue(self._edit.verticalScrollBar().maximum())
+
+	def clear(self):
+		'''Empty the scrollback, saving it to the log'''
+		self._log_lines([text for color, text in self._lines])
+		self._lines.clear()
+		self._pending = 0
+		self._edit.clear()
+
+	def close(self):
+		'''Show the pending lines and close the log'''
+		self.flush()
+		if self._log is not None:
+			self._log.close()
+			self._log = None
+
+	def _format(self, color):
+		if color not in self._formats:
+			fmt = QTextCharFormat()
+			if color is not None:
+				fmt.setForeground(QColor(color))
+			self._formats[color] = fmt
+		return self._formats[color]
+
+	def _log_lines(self, lines):
+		if self._log_path is None or not lines:
+			return
+		if self._log is None:
+			self._log = open(self._log_path, 'a', encoding='utf-8', errors='backslashreplace')
+		self._log.write('\n'.join(lines) + '\n')
+
+class ConsoleWriter(io.IOBase):
+	'''Used in place of stdout and stderr to print to a ConsoleOutput.
+	If tee is provided, data is written (and flushed) also there'''
+
+	def __init__(self, output, color=None, tee=None):
+		self._output = output
+		self._color = color
+		self._tee = tee
+		self._partial = '' # Last line, until its newline arrives
+
+		self.errors = 'backslashreplace'
+		self.encoding = 'UTF-8'
+
+	def writable(self):
+		return True
+
+	def write(self, data):
+		if self._tee is not None:
+			self._tee.write(data)
+			self._tee.flush()
+		# Only the new data is split, the partial line is prepended
+		end = data.rfind('\n')
+		if end < 0:
+			self._partial += data
+		else:
+			lines = (self._partial + data[:end]).split('\n')
+			self._partial = data[end + 1:]
+			self._output.push(self._color, lines)
+		return len(data)
+
+	def flush(self):
+		if self._tee is not None:
+			self._tee.flush()
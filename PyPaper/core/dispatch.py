@@ -0,0 +1,113 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Frame-synchronized dispatch of geometry notifications.
+
+By default, items call their geometry callbacks as soon as a property
+changes: moving an item with setX and setY notifies twice, and every
+line bound to it recomputes its geometry twice.
+When a FrameDispatcher is enabled, items only mark themselves as dirty;
+once per frame, after the window has advanced the animations, every
+dirty item gets a single notification comparing its geometry with the
+one it had at the start of the frame. Updates caused by the callbacks
+(e.g. bound lines moving) are delivered in the same flush.
+
+	from PyPaper.core.dispatch import enable_frame_dispatch
+	enable_frame_dispatch(_canvas_)
+'''
+
+from PyQt5.QtCore import QRectF, QTimer
+from PyQt5 import sip
+
+_active = None
+
+def frame_dispatcher():
+	'''Returns the active FrameDispatcher, or None'''
+	return _active
+
+def enable_frame_dispatch(window):
+	'''Enables the frame-synchronized dispatch, synchronized with window'''
+	global _active
+	if _active is not None:
+		_active.close()
+	_active = FrameDispatcher(window)
+	return _active
+
+def disable_frame_dispatch():
+	'''Goes back to immediate dispatch, delivering pending notifications'''
+	global _active
+	if _active is not None:
+		disp, _active = _active, None
+		disp.close()
+
+class FrameDispatcher:
+	'''Collects dirty items and deferred updates, delivering them when
+	the window emits afterAnimating (on the GUI thread, before the scene
+	graph is synchronized; beforeRendering is not used because it may be
+	emitted on the render thread)'''
+
+	# Passes per flush, to stop cascades of updates that never settle
+	MAX_PASSES = 16
+
+	def __init__(self, window):
+		self._window = window
+		self._dirty = {} # Item: geometry at the start of the frame
+		self._deferred = {} # (item, name): function to call
+		self._flush_queued = False
+		window.afterAnimating.connect(self.flush)
+
+	def mark(self, item, g_old):
+		'''Mark the item as changed, g_old is its geometry before the change'''
+		if item not in self._dirty:
+			self._dirty[item] = QRectF(g_old)
+			self._ensure_flush()
+
+	def defer(self, item, name, func):
+		'''Call func at the next flush; a later call with the same item
+		and name replaces the previous function'''
+		self._deferred[(item, name)] = func
+		self._ensure_flush()
+
+	def _ensure_flush(self):
+		'''Windows not on screen do not render frames: flush as soon as
+		control returns to the event loop'''
+		if not self._flush_queued and not self._window.isExposed():
+			self._flush_queued = True
+			QTimer.singleShot(0, self.flush)
+
+	def flush(self):
+		'''Run deferred updates and deliver the notifications'''
+		self._flush_queued = False
+		for _ in range(self.MAX_PASSES):
+			if not self._dirty and not self._deferred:
+				return
+			deferred, self._deferred = self._deferred, {}
+			for (item, name), func in deferred.items():
+				if not sip.isdeleted(item):
+					func()
+			dirty, self._dirty = self._dirty, {}
+			for item, g_old in dirty.items():
+				if not sip.isdeleted(item):
+					g_new = QRectF(item.x(), item.y(), item.width(), item.height())
+					item._dispatch_geometry(g_new, g_old)
+		# Still something to do: continue in the next frame
+		self._window.update()
+
+	def close(self):
+		'''Deliver what is pending and stop listening to the window'''
+		self._window.afterAnimating.disconnect(self.flush)
+		self.flush()
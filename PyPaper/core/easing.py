@@ -0,0 +1,134 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Easing curves, named or custom.
+
+Wherever an easing is accepted (move_to, prop_animation, TimeAnim,
+tweens, layer sprites) it can be:
+
+	'InOutQuad'              the name of a QEasingCurve type
+	QEasingCurve(...)        a Qt curve
+	(0.25, 0.1, 0.25, 1)     cubic-bezier control points, as in CSS (or a list)
+	lambda t: t * t          a function from [0, 1] to values, ending at 1
+	spring(stiffness=...)    a damped spring (a function as well)
+
+or a name given with register_easing. Functions are sampled once in a
+spline of cubic Bezier segments, evaluated by Qt: Python is not called
+back while animations run. Curves are cached, so animations with the
+same easing share it.'''
+
+from PyQt5.QtCore import QEasingCurve, QPointF
+
+from collections.abc import Sequence
+import math
+import numbers
+import weakref
+
+# Number of cubic segments approximating functions. Qt 5 keeps the
+# segments of a BezierSpline in arrays of 10 elements, which it does
+# not grow: more segments corrupt memory
+_SEGMENTS = 10
+
+_named = {} # Registered easing specs
+_curves = {} # Spec: QEasingCurve
+_fn_curves = weakref.WeakKeyDictionary() # Function: QEasingCurve
+
+def register_easing(name, spec):
+	'''Make spec (see above) usable as easing=name'''
+	_named[name] = spec
+	_curves.pop(name, None)
+
+def _slope(func, t, eps=1e-4):
+	a, b = max(t - eps, 0.0), min(t + eps, 1.0)
+	return (func(b) - func(a)) / (b - a)
+
+def _sample(func, segments):
+	'''Spline of Bezier segments through the samples of func, with the
+	slopes of func there (a cubic Hermite spline)'''
+	n = segments
+	ts = [i / n for i in range(n + 1)]
+	vs = [float(func(t)) for t in ts]
+	ds = [_slope(func, t) for t in ts]
+	# Curves go from 0 to 1
+	vs[0], vs[-1] = 0.0, 1.0
+	curve = QEasingCurve(QEasingCurve.BezierSpline)
+	h = 1 / n
+	for i in range(n):
+		# Control points at one third of the segment: progress is linear
+		c1 = QPointF(ts[i] + h / 3, vs[i] + ds[i] * h / 3)
+		c2 = QPointF(ts[i + 1] - h / 3, vs[i + 1] - ds[i + 1] * h / 3)
+		curve.addCubicBezierSegment(c1, c2, QPointF(ts[i + 1], vs[i + 1]))
+	return curve
+
+def _build(spec):
+	if isinstance(spec, QEasingCurve):
+		return spec
+	if isinstance(spec, str):
+		if spec in _named:
+			return _build(_named[spec])
+		return QEasingCurve(getattr(QEasingCurve, spec, QEasingCurve.Linear))
+	if isinstance(spec, tuple) and len(spec) == 4:
+		x1, y1, x2, y2 = spec
+		curve = QEasingCurve(QEasingCurve.BezierSpline)
+		curve.addCubicBezierSegment(QPointF(x1, y1), QPointF(x2, y2), QPointF(1, 1))
+		return curve
+	if callable(spec):
+		return _sample(spec, _SEGMENTS)
+	raise RuntimeError('Unknown easing: {}'.format(spec))
+
+def easing_curve(spec):
+	'''Returns the QEasingCurve for an easing spec, see above'''
+	if isinstance(spec, QEasingCurve):
+		return spec
+	if callable(spec):
+		try:
+			curve = _fn_curves.get(spec)
+			if curve is None:
+				curve = _fn_curves[spec] = _build(spec)
+			return curve
+		except TypeError:
+			# Not weakly referenceable
+			return _build(spec)
+	if isinstance(spec, Sequence) and not isinstance(spec, str):
+		# Control points, e.g. as a list
+		if len(spec) != 4 or not all(isinstance(v, numbers.Real) for v in spec):
+			raise RuntimeError('Unknown easing: {}'.format(spec))
+		spec = tuple(spec)
+	try:
+		curve = _curves.get(spec)
+	except TypeError:
+		raise RuntimeError('Unknown easing: {}'.format(spec))
+	if curve is None:
+		curve = _curves[spec] = _build(spec)
+	return curve
+
+def spring(stiffness=180, damping=12, mass=1):
+	'''Easing of a damped spring released at 0, oscillating around 1.
+	Parameters are those of the physical spring, over one second'''
+	w0 = math.sqrt(stiffness / mass)
+	zeta = damping / (2 * math.sqrt(stiffness * mass))
+	def position(t):
+		if zeta < 1:
+			wd = w0 * math.sqrt(1 - zeta * zeta)
+			return 1 - math.exp(-zeta * w0 * t) * (math.cos(wd * t) + zeta * w0 / wd * math.sin(wd * t))
+		# Critically or over damped: no oscillation
+		return 1 - math.exp(-w0 * t) * (1 + w0 * t)
+	end = position(1)
+	# Whatever is left of the motion is spread over the curve
+	def _spring(t):
+		return position(t) + (1 - end) * t
+	return _spring
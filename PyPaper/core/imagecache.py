@@ -0,0 +1,194 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Process-wide cache of decoded and scaled images.
+
+Images are decoded once per path and scaled once per target size, fit
+mode and stretch, so that many items showing the same image share it
+and repaints do not rescale it. The least recently used images are
+dropped when the cache exceeds its memory budget.
+
+	from PyPaper.core.imagecache import image_cache
+	image_cache().set_budget(256 * 2**20)
+	print(image_cache().stats())
+'''
+
+from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtGui import QImage
+
+from collections import OrderedDict
+import os
+
+def fit_size(img_size, box_size, fit_mode, stretch):
+	'''Returns the size (QSize) of an image of img_size drawn in a box
+	of box_size. fit_mode is one of
+		'none': image has its original size or stretched to fit
+		'full': image is never cropped, keeping the aspect ratio
+		'width': image's width never exceeds box's width
+		'height': similar to width
+	If stretch is False, the image is never enlarged'''
+	iw, ih = img_size.width(), img_size.height()
+	bw, bh = box_size.width(), box_size.height()
+	if fit_mode == 'full':
+		if not stretch:
+			bw, bh = min(iw, bw), min(ih, bh)
+		return img_size.scaled(QSize(bw, bh), Qt.KeepAspectRatio)
+	elif fit_mode == 'width':
+		w = bw if stretch else min(iw, bw)
+		return QSize(w, round(ih * w / iw) if iw else 0)
+	elif fit_mode == 'height':
+		h = bh if stretch else min(ih, bh)
+		return QSize(round(iw * h / ih) if ih else 0, h)
+	elif stretch: # none
+		return QSize(box_size)
+	return QSize(img_size)
+
+def fit_image(img, box_size, fit_mode, stretch):
+	'''Scale img to be drawn in a box of box_size (QSize), see fit_size.
+	Returns img itself if it has already the right size'''
+	size = fit_size(img.size(), box_size, fit_mode, stretch)
+	if size == img.size():
+		return img
+	return img.scaled(size, Qt.IgnoreAspectRatio)
+
+class ImageCache:
+	'''LRU cache of images, with a budget in bytes.
+	Keys are the path for decoded images and
+	(path, width, height, fit_mode, stretch, clip) for scaled ones'''
+
+	def __init__(self, budget=64 * 2**20):
+		self._images = OrderedDict() # Key: image, least recently used first
+		self._alias_of = {} # Scaled key: path, when the image is not scaled
+		self._aliases = {} # Path: scaled keys of its aliases
+		self._budget = budget
+		self._bytes = 0
+		self._hits = 0
+		self._misses = 0
+		self._evictions = 0
+
+	def set_budget(self, budget):
+		'''Set the memory budget in bytes, evicting images if needed'''
+		self._budget = budget
+		self._evict()
+
+	def get_budget(self):
+		return self._budget
+
+	def load(self, path):
+		'''Returns the image at path, or None if the file does not exist'''
+		img = self._lookup(path)
+		if img is None and os.path.isfile(path):
+			img = QImage(path)
+			if img.isNull():
+				return None
+			self._store(path, img)
+		return img
+
+	def scaled(self, path, box_size, fit_mode='full', stretch=True, clip=None):
+		'''Returns the image at path, clipped to the (x, y, w, h) clip
+		rectangle if not None, then scaled with fit_image.
+		None if the file does not exist'''
+		if clip is not None:
+			clip = tuple(clip)
+		key = (path, box_size.width(), box_size.height(), fit_mode, stretch, clip)
+		img = self._lookup(key)
+		if img is not None and key in self._alias_of:
+			# Keep the image under its path as recent as the alias
+			self._images.move_to_end(path)
+		if img is None:
+			src = self.load(path)
+			if src is None:
+				return None
+			if clip is not None:
+				src = src.copy(*clip)
+			img = fit_image(src, box_size, fit_mode, stretch)
+			# Unscaled images are not stored twice, only aliased
+			if img is not src or clip is not None:
+				self._store(key, img)
+			elif path in self._images:
+				self._store(key, img, alias_of=path)
+		return img
+
+	def clear(self):
+		self._images.clear()
+		self._alias_of.clear()
+		self._aliases.clear()
+		self._bytes = 0
+
+	def reset_stats(self):
+		self._hits = self._misses = self._evictions = 0
+
+	def stats(self):
+		'''Returns a dict with hits, misses, evictions, number of images
+		and bytes used'''
+		return {
+			'hits': self._hits,
+			'misses': self._misses,
+			'evictions': self._evictions,
+			'images': len(self._images),
+			'bytes': self._bytes,
+			'budget': self._budget,
+		}
+
+	def _lookup(self, key):
+		img = self._images.get(key)
+		if img is None:
+			self._misses += 1
+		else:
+			self._hits += 1
+			self._images.move_to_end(key)
+		return img
+
+	def _store(self, key, img, alias_of=None):
+		'''Store img under key. If alias_of is given, img is the image
+		stored under that key: it takes no more memory, and it is
+		dropped together with it'''
+		self._images[key] = img
+		if alias_of is None:
+			self._bytes += img.sizeInBytes()
+		else:
+			self._alias_of[key] = alias_of
+			self._aliases.setdefault(alias_of, []).append(key)
+		self._evict()
+
+	def _drop(self, key):
+		img = self._images.pop(key)
+		src = self._alias_of.pop(key, None)
+		if src is not None:
+			self._aliases[src].remove(key)
+			if not self._aliases[src]:
+				del self._aliases[src]
+			return
+		self._bytes -= img.sizeInBytes()
+		for alias in self._aliases.pop(key, ()):
+			del self._images[alias]
+			del self._alias_of[alias]
+
+	def _evict(self):
+		# The last image is kept even if above budget, as it is in use
+		while self._bytes > self._budget and len(self._images) > 1:
+			key = next(iter(self._images))
+			# Aliases free no memory
+			if key not in self._alias_of:
+				self._evictions += 1
+			self._drop(key)
+
+_cache = ImageCache()
+
+def image_cache():
+	'''Returns the process-wide ImageCache'''
+	return _cache
@@ -0,0 +1,315 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Frame time profiler.
+
+While enabled, the Python code running in each frame is timed and split
+in animation updates (TimeAnim callbacks, tween and sprite drivers),
+Registry callbacks and paint calls, by class. Time spent by nested
+sections is not counted twice: a callback run by an animation counts as
+callback only. Every second, the live items, painted textures and
+running animations are counted.
+Only classes defined when the profiler is enabled are instrumented.
+
+	from PyPaper.core.profiler import enable_profiler
+	prof = enable_profiler(_canvas_) # Also shows the overlay
+	...
+	prof.save('frames.csv') # Or .json
+	disable_profiler()
+
+From the command line: ./pypaper.py --profile frames.csv script.py'''
+
+from PyQt5.QtCore import Qt, QAbstractAnimation, QRectF
+from PyQt5.QtGui import QColor, QFont
+from PyQt5.QtQuick import QQuickPaintedItem
+
+from PyPaper.core.styleditem import Item
+from PyPaper.core.registry import Registry
+from PyPaper.core.animation import animation_stats
+from PyPaper.core.imagecache import image_cache
+
+from collections import deque
+import csv
+import functools
+import json
+import sys
+import threading
+import time
+
+_active = None
+
+def profiler():
+	'''Returns the active Profiler, or None'''
+	return _active
+
+def enable_profiler(window, overlay=True, history=10000):
+	'''Start profiling the frames of window, keeping the last history'''
+	global _active
+	if _active is not None:
+		_active.close()
+	_active = Profiler(window, overlay, history)
+	return _active
+
+def disable_profiler():
+	'''Stop profiling, returns the stopped Profiler (its frames are kept)'''
+	global _active
+	prof, _active = _active, None
+	if prof is not None:
+		prof.close()
+	return prof
+
+def toggle_profiler(window):
+	if _active is None:
+		return enable_profiler(window)
+	disable_profiler()
+
+def _subclasses(cls):
+	todo = [cls]
+	while todo:
+		c = todo.pop()
+		yield c
+		todo.extend(c.__subclasses__())
+
+def _count_items(root):
+	'''Number of items under root, and how many are painted in Python'''
+	items = painted = 0
+	todo = [root]
+	while todo:
+		it = todo.pop()
+		items += 1
+		if isinstance(it, QQuickPaintedItem) and it.width() > 0 and it.height() > 0:
+			painted += 1
+		todo.extend(it.childItems())
+	return items, painted
+
+class Profiler:
+	'''Records the time of each frame of a window. Use enable_profiler'''
+
+	# Seconds between counts of items and animations
+	COUNT_INTERVAL = 1.0
+
+	def __init__(self, window, overlay=True, history=10000):
+		self._window = window
+		self.frames = deque(maxlen=history)
+		self._local = threading.local()
+		self._lock = threading.Lock()
+		self._patched = [] # (class, name, original)
+		self._reset_frame()
+		self._frame = 0
+		self._t_start = self._t_frame = time.perf_counter()
+		self._t_count = 0
+		self._counts = {}
+		self._instrument()
+		window.afterAnimating.connect(self._next_frame)
+		self.overlay = ProfilerOverlay(self, window.contentItem()) if overlay else None
+
+	def _reset_frame(self):
+		self._totals = {'animation': 0.0, 'callbacks': 0.0, 'paint': 0.0}
+		self._paint = {}
+
+	def _stack(self):
+		stack = getattr(self._local, 'stack', None)
+		if stack is None:
+			stack = self._local.stack = []
+		return stack
+
+	def _timed(self, kind, func):
+		'''Wraps func, adding its time (without nested sections) to kind.
+		For paint, kind is the name of the class'''
+		prof = self
+		@functools.wraps(func)
+		def _wrapper(*args, **kwargs):
+			stack = prof._stack()
+			frame = [0.0] # Time of nested sections
+			stack.append(frame)
+			t0 = time.perf_counter()
+			try:
+				return func(*args, **kwargs)
+			finally:
+				elapsed = time.perf_counter() - t0
+				stack.pop()
+				if stack:
+					stack[-1][0] += elapsed
+				own = elapsed - frame[0]
+				with prof._lock:
+					if kind in prof._totals:
+						prof._totals[kind] += own
+					else:
+						prof._totals['paint'] += own
+						prof._paint[kind] = prof._paint.get(kind, 0.0) + own
+		return _wrapper
+
+	def _patch(self, cls, name, kind):
+		orig = cls.__dict__[name]
+		self._patched.append((cls, name, orig))
+		setattr(cls, name, self._timed(kind, orig))
+
+	def _instrument(self):
+		'''Wrap the methods of the classes defined so far'''
+		self._patch(Registry, '_run_callbacks', 'callbacks')
+		for cls in _subclasses(Item):
+			if 'paint' in cls.__dict__ and cls is not ProfilerOverlay:
+				self._patch(cls, 'paint', cls.__name__)
+		for cls in _subclasses(QAbstractAnimation):
+			# Wrapping Qt classes would make every animation call Python
+			if cls.__module__.startswith('PyQt5'):
+				continue
+			for name in ('updateCurrentTime', 'updateCurrentValue'):
+				if name in cls.__dict__:
+					self._patch(cls, name, 'animation')
+
+	def _next_frame(self):
+		'''Close the frame started at the previous call'''
+		now = time.perf_counter()
+		with self._lock:
+			totals, paint = self._totals, self._paint
+			self._reset_frame()
+		if now - self._t_count >= self.COUNT_INTERVAL:
+			self._t_count = now
+			self._counts = self._count()
+		rec = {
+			'frame': self._frame,
+			'time': now - self._t_start,
+			'frame_ms': (now - self._t_frame) * 1e3,
+			'animation_ms': totals['animation'] * 1e3,
+			'callbacks_ms': totals['callbacks'] * 1e3,
+			'paint_ms': totals['paint'] * 1e3,
+			'paint_by_class_ms': {k: v * 1e3 for k, v in paint.items()},
+		}
+		rec.update(self._counts)
+		self.frames.append(rec)
+		self._frame += 1
+		self._t_frame = now
+		if self.overlay is not None:
+			self.overlay.refresh()
+
+	def _count(self):
+		items, textures = _count_items(self._window.contentItem())
+		anims = animation_stats()
+		counts = {
+			'items': items,
+			'textures': textures,
+			'animations': anims['running'],
+			'animation_objects': anims['objects'],
+			'cached_images': image_cache().stats()['images'],
+		}
+		# Without creating the engine (and importing NumPy)
+		tween = sys.modules.get('PyPaper.core.tween')
+		if tween is not None and tween._engine is not None:
+			counts['tweens'] = len(tween._engine)
+		return counts
+
+	def summary(self, last=None):
+		'''Averages of the last frames (all if None), as a dict'''
+		frames = list(self.frames)[-last:] if last else list(self.frames)
+		if not frames:
+			return {}
+		n = len(frames)
+		out = {k: sum(f[k] for f in frames) / n for k in ('frame_ms', 'animation_ms', 'callbacks_ms', 'paint_ms')}
+		by_class = {}
+		for f in frames:
+			for k, v in f['paint_by_class_ms'].items():
+				by_class[k] = by_class.get(k, 0.0) + v / n
+		out['paint_by_class_ms'] = by_class
+		out['fps'] = 1000 / out['frame_ms'] if out['frame_ms'] else 0
+		for k in ('items', 'textures', 'animations'):
+			if k in frames[-1]:
+				out[k] = frames[-1][k]
+		return out
+
+	def save(self, path):
+		'''Write the frames to path, as JSON if it ends with .json,
+		otherwise as CSV (one column per painted class)'''
+		if path.endswith('.json'):
+			self.save_json(path)
+		else:
+			self.save_csv(path)
+
+	def save_json(self, path):
+		with open(path, 'w') as f:
+			json.dump({'frames': list(self.frames), 'summary': self.summary()}, f, indent=1)
+
+	def save_csv(self, path):
+		frames = list(self.frames)
+		classes = sorted({k for f in frames for k in f['paint_by_class_ms']})
+		counts = sorted({k for f in frames for k in f} - {'frame', 'time', 'frame_ms', 'animation_ms', 'callbacks_ms', 'paint_ms', 'paint_by_class_ms'})
+		head = ['frame', 'time', 'frame_ms', 'animation_ms', 'callbacks_ms', 'paint_ms']
+		with open(path, 'w', newline='') as f:
+			out = csv.writer(f)
+			out.writerow(head + ['paint_ms:' + c for c in classes] + counts)
+			for fr in frames:
+				by_class = fr['paint_by_class_ms']
+				out.writerow([fr[k] for k in head] + [by_class.get(c, 0.0) for c in classes] + [fr.get(k, '') for k in counts])
+
+	def close(self):
+		'''Stop recording and remove the instrumentation and the overlay'''
+		self._window.afterAnimating.disconnect(self._next_frame)
+		for cls, name, orig in reversed(self._patched):
+			setattr(cls, name, orig)
+		self._patched = []
+		if self.overlay is not None:
+			self.overlay.remove()
+			self.overlay = None
+
+class ProfilerOverlay(Item):
+	'''Shows the averages of the profiler over the last frames, in the
+	top left corner of the window'''
+
+	# Seconds between refreshes, frames averaged
+	INTERVAL = 0.25
+	FRAMES = 30
+
+	def __init__(self, prof, parent):
+		super().__init__(parent)
+		self._prof = prof
+		self._lines = []
+		self._t = 0
+		self._movable = False
+		self.setAcceptedMouseButtons(Qt.NoButton)
+		self.setZ(1e9)
+		self.set_pos(4, 4)
+		self.set_size(260, 60)
+
+	def refresh(self):
+		now = time.perf_counter()
+		if now - self._t < self.INTERVAL:
+			return
+		self._t = now
+		s = self._prof.summary(self.FRAMES)
+		if not s:
+			return
+		lines = [
+			'{:.1f} fps  frame {:.2f} ms'.format(s['fps'], s['frame_ms']),
+			'anim {:.2f}  callbacks {:.2f}  paint {:.2f} ms'.format(s['animation_ms'], s['callbacks_ms'], s['paint_ms']),
+		]
+		top = sorted(s['paint_by_class_ms'].items(), key=lambda kv: -kv[1])[:3]
+		lines.extend('  {} {:.2f} ms'.format(k, v) for k, v in top)
+		if 'items' in s:
+			lines.append('items {}  textures {}  animations {}'.format(s['items'], s['textures'], s['animations']))
+		self._lines = lines
+		self.set_size(280, 14 * len(lines) + 8)
+		self.update()
+
+	def paint(self, painter):
+		painter.fillRect(QRectF(0, 0, self.width(), self.height()), QColor(0, 0, 0, 170))
+		font = QFont('Monospace')
+		font.setStyleHint(QFont.Monospace)
+		font.setPixelSize(11)
+		painter.setFont(font)
+		painter.setPen(QColor(255, 255, 255))
+		for i, line in enumerate(self._lines):
+			painter.drawText(4, 14 * (i + 1), line)
@@ -21,24 +21,61 @@ from PyQt5.QtWidgets import *
 from PyQt5.QtGui import QIcon
 
 from PyPaper.core.window import Window
+from PyPaper.core.aio import install as install_asyncio
 
 import argparse
 
 def main():
 	import sys
-	app = QApplication(sys.argv)
 
 	parser = argparse.ArgumentParser(description='PyPaper is cwl')
 	parser.add_argument('scripts', type=str, nargs='*', help='Source files')
 	parser.add_argument('--command', '-c', type=str, help='Command to execute')
+	parser.add_argument('--frame-dispatch', action='store_true', help='Deliver geometry notifications once per frame')
+	parser.add_argument('--render', type=str, metavar='DIR', help='Render the scripts to images in DIR, without windows')
+	parser.add_argument('--fps', type=float, default=30, help='Frames per second when rendering')
+	parser.add_argument('--frames', type=int, help='Frames to render (default: until animations are over)')
+	parser.add_argument('--size', type=str, default='1024x768', help='Size of rendered frames, WxH')
+	parser.add_argument('--workers', type=int, default=1, help='Processes rendering the frames')
+	parser.add_argument('--scrollback', type=int, default=10000, help='Lines kept in the console output (0 for no limit)')
+	parser.add_argument('--console-log', type=str, metavar='FILE', help='Append the lines removed from the console output to FILE')
+	parser.add_argument('--profile', type=str, metavar='FILE', help='Profile frame times, saving them to FILE at exit (.csv or .json)')
 	args = parser.parse_args()
 
-	screen = Window(args.scripts, args.command)
+	if args.render is not None:
+		import os
+		# No display is needed
+		os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+		os.environ.setdefault('QT_QUICK_BACKEND', 'software')
+		app = QApplication(sys.argv)
+		from PyPaper.core.render import render, render_parallel
+		size = tuple(int(v) for v in args.size.lower().split('x'))
+		if args.workers > 1:
+			chunks = render_parallel(args.scripts, args.render, args.workers, args.fps, args.frames, size, args.command)
+			for i, (first, end, written, secs) in enumerate(chunks):
+				print('Worker {}: frames {}-{}, {} images in {:.2f} s'.format(i, first, end - 1, written, secs))
+			n = sum(c[2] for c in chunks)
+		else:
+			n = render(args.scripts, args.render, args.fps, args.frames, size, args.command)
+		print('Rendered {} frames to {}'.format(n, args.render))
+		sys.exit(0)
+
+	app = QApplication(sys.argv)
+	# Coroutines run with the Qt event loop
+	install_asyncio()
+	screen = Window(args.scripts, args.command, args.frame_dispatch, args.scrollback, args.console_log)
 	screen.setWindowTitle('PyPaper')
 	screen.resize(1024, 768)
 	icon = QIcon('Art/icon128.png')
 	app.setWindowIcon(icon)
 	screen.show()
+	# Show the last output and save the log
+	app.aboutToQuit.connect(screen.out_buffer_.close)
+
+	if args.profile is not None:
+		from PyPaper.core.profiler import enable_profiler
+		prof = enable_profiler(screen.qqw_)
+		app.aboutToQuit.connect(lambda: prof.save(args.profile))
 
 	sys.exit(app.exec_())
 
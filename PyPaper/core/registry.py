@@ -15,38 +15,126 @@
 #
 # Copyright 2015 Alessandro "AkiRoss" Re
 
+import weakref
+
+class Subscription:
+	'''Handle to a callback registered in a Registry.
+	The source and the target are referenced weakly: the subscription
+	stops working when either of them is gone.
+	Use cancel() to unregister the callback in O(1)'''
+
+	__slots__ = ('event', 'callback', '_source', '_target', '__weakref__')
+
+	def __init__(self, source, event, target_obj, callback):
+		self.event = event
+		self.callback = callback
+		self._source = weakref.ref(source)
+		if target_obj is None:
+			self._target = None
+		else:
+			try:
+				self._target = weakref.ref(target_obj)
+			except TypeError:
+				# Not weak-referenceable, keep it alive
+				self._target = lambda: target_obj
+
+	@property
+	def target(self):
+		'''The target object, None for call-once callbacks or dead targets'''
+		return None if self._target is None else self._target()
+
+	def active(self):
+		'''True until cancelled or until source or target are gone'''
+		if self._source is None or self._source() is None:
+			return False
+		return self._target is None or self._target() is not None
+
+	def cancel(self):
+		'''Unregister the callback. Can be called more than once'''
+		if self._source is None:
+			return
+		src = self._source()
+		if src is not None:
+			subs = src._callbacks.get(self.event)
+			if subs is not None:
+				subs.pop(self, None)
+				if not subs:
+					del src._callbacks[self.event]
+		tgt = self.target
+		if tgt is not None:
+			back = getattr(tgt, '_subscribed', None)
+			if back is not None:
+				back.pop(self, None)
+		self._source = None
+
 class Registry:
 	def __init__(self):
+		# For each event, the subscriptions in registration order
+		# (dicts are used as ordered sets, to remove in O(1))
 		self._callbacks = {}
+		# Subscriptions of other registries targeting this object
+		self._subscribed = {}
 
 	def register(self, event, target_obj, callback):
 		'''Register a callback for the specified event.
 		When the event happens in self, the callback is called in target_obj.
+		Returns a Subscription, whose cancel() unregisters the callback.
 
 		If target_obj is None, the callback is called once and then removed.
 			No first argument is passed to the callback
 		If target_obj is not None, the callback is called until removed,
-			and callback is automatically removed on event target_obj.on_remove
+			and callback is automatically removed when target_obj is released
+			(see release_subscriptions) or garbage collected.
+			Note that target_obj is weakly referenced.
 		'''
-		if target_obj is None:
-			def _call_once(*args, **kwargs):
-				callback(*args, **kwargs)
-				self.unregister(event, None, _call_once)
-			self._callbacks.setdefault(event, []).append((None, _call_once))
-		else:
-			self._callbacks.setdefault(event, []).append((target_obj, callback))
-			def _remove_cb(unused, obj):
-				self.unregister(event, target_obj, callback)
-			target_obj.register('on_remove', None, _remove_cb)
-
-	def unregister(self, event, target_obj, callback):
-		'''Unregister a callback for the specified event'''
-		self._callbacks[event].remove((target_obj, callback))
-	
+		sub = Subscription(self, event, target_obj, callback)
+		self._callbacks.setdefault(event, {})[sub] = None
+		if target_obj is not None:
+			back = getattr(target_obj, '_subscribed', None)
+			if back is not None:
+				back[sub] = None
+		return sub
+
+	def unregister(self, event, target_obj=None, callback=None):
+		'''Unregister a callback for the specified event.
+		Passing the Subscription returned by register is O(1), passing the
+		(event, target_obj, callback) triple requires a scan of the event'''
+		if isinstance(event, Subscription):
+			event.cancel()
+			return
+		for sub in self._callbacks.get(event, ()):
+			if sub.target is target_obj and sub.callback == callback:
+				sub.cancel()
+				return
+		raise ValueError('Callback not registered for event {}'.format(event))
+
+	def release_subscriptions(self):
+		'''Cancel every subscription where this object is the source or
+		the target. Objects being removed shall call this'''
+		for subs in list(self._callbacks.values()):
+			for sub in list(subs):
+				sub.cancel()
+		for sub in list(self._subscribed):
+			sub.cancel()
+
 	def _run_callbacks(self, event, *args, **kwargs):
 		'''Run the callbacks associated to event, passing the specified parameters'''
+		subs = self._callbacks.get(event)
+		if not subs:
+			return
 		# What if a callback calls unregister while iterating? Copy the list before iterating
-		for obj, cb in list(it for it in self._callbacks.get(event, [])):
-			cb(obj, *args, **kwargs)
-
-
+		for sub in list(subs):
+			if sub._source is None:
+				# Cancelled by a previous callback
+				continue
+			if sub._target is None:
+				# Call once
+				sub.cancel()
+				sub.callback(None, *args, **kwargs)
+				continue
+			obj = sub._target()
+			if obj is None:
+				# Target is gone
+				sub.cancel()
+				continue
+			sub.callback(obj, *args, **kwargs)
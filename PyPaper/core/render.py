@@ -0,0 +1,251 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Offline rendering of scenes to numbered images.
+
+Scripts are run as in the PyPaper window (with _root_ and _canvas_
+defined), but animations started by PyPaper follow a VirtualClock
+instead of the wall clock: each frame the clock moves forward of exactly
+1000 / fps milliseconds, the scene is grabbed and saved, and the next
+frame is computed as soon as the image is written. Output is the same
+at every run, and independent of the speed of the machine.
+
+	python pypaper.py --render out/ --fps 30 Examples/sorting.py
+
+With --workers, the frames are split in contiguous chunks rendered by
+separate processes: each one runs the scripts again, computes without
+saving the frames before its chunk, then renders its own. The random
+module is seeded before running scripts, so every process sees the same
+scene.
+
+Animations started calling QAbstractAnimation.start directly, and
+QTimers, still run on the wall clock.'''
+
+from PyQt5.QtCore import QAbstractAnimation, QCoreApplication, QEventLoop, QSize, QTimer
+from PyQt5.QtGui import QImage, QPainter
+from PyQt5.QtQuick import QQuickWindow
+from PyQt5 import sip
+
+from PyPaper.core.animation import set_clock, get_clock
+
+import os
+import random
+import time
+
+class VirtualClock:
+	'''Drives animations by setting their time: they are started and
+	paused at once, then moved forward at each step'''
+
+	def __init__(self, fps=30):
+		self.fps = fps
+		self.frame = 0 # Frame currently shown
+		self._anims = {} # Animation: frame when it started
+		self._frame_hooks = []
+
+	def time(self, frame=None):
+		'''Time of frame (default the current one), in milliseconds'''
+		if frame is None:
+			frame = self.frame
+		return frame * 1000 / self.fps
+
+	def on_frame(self, func):
+		'''Call func(frame) before leaving each frame, e.g. to save it'''
+		self._frame_hooks.append(func)
+
+	def start(self, anim, policy=QAbstractAnimation.KeepWhenStopped):
+		anim.start(policy)
+		# Drivers may stop during start
+		if anim.state() == QAbstractAnimation.Running:
+			anim.pause()
+			self._anims[anim] = self.frame
+
+	def busy(self):
+		'''True while some animation is running'''
+		self._prune()
+		return bool(self._anims)
+
+	def _prune(self):
+		for anim in list(self._anims):
+			if sip.isdeleted(anim) or anim.state() == QAbstractAnimation.Stopped:
+				del self._anims[anim]
+
+	def step(self):
+		'''Leave the current frame and move to the next one'''
+		for func in self._frame_hooks:
+			func(self.frame)
+		self.frame += 1
+		now = self.time()
+		# Animations started while stepping wait for the next frame
+		for anim, start in list(self._anims.items()):
+			if sip.isdeleted(anim) or anim.state() == QAbstractAnimation.Stopped:
+				del self._anims[anim]
+			else:
+				anim.setCurrentTime(int(round(now - self.time(start))))
+		self._prune()
+
+	def wait(self, anim):
+		'''Step until anim is finished, used by blocking animations'''
+		while not sip.isdeleted(anim) and anim.state() != QAbstractAnimation.Stopped:
+			self.step()
+
+	def __enter__(self):
+		self._previous = get_clock()
+		set_clock(self)
+		return self
+
+	def __exit__(self, *exc):
+		set_clock(self._previous)
+
+def grab(window, size=None):
+	'''Returns a QImage with the contents of window, rendered offscreen.
+	The window must be visible, e.g. on the offscreen platform'''
+	root = window.contentItem()
+	if size is None:
+		size = QSize(window.width(), window.height())
+	result = root.grabToImage(size)
+	if not result:
+		raise RuntimeError('Cannot grab the window')
+	loop = QEventLoop()
+	result.ready.connect(loop.quit)
+	QTimer.singleShot(10000, loop.quit)
+	loop.exec_()
+	item = result.image()
+	if item.isNull():
+		raise RuntimeError('Cannot grab the window')
+	# Items are grabbed on a transparent background
+	img = QImage(size, QImage.Format_ARGB32_Premultiplied)
+	img.fill(window.color())
+	painter = QPainter(img)
+	painter.drawImage(0, 0, item)
+	painter.end()
+	return img
+
+class Renderer:
+	'''Renders scripts into out_dir, naming images with pattern.
+	Frames before first, and from end on (if not None), are computed
+	but not saved'''
+
+	def __init__(self, out_dir, fps=30, size=(1024, 768), pattern='frame_{:05d}.png', seed=0, first=0, end=None):
+		self.out_dir = out_dir
+		self.pattern = pattern
+		self.clock = VirtualClock(fps)
+		self.clock.on_frame(self.save_frame)
+		self.window = QQuickWindow()
+		self.window.resize(*size)
+		self.window.show()
+		self.py_ctx = {
+			'_root_': self.window.contentItem(),
+			'_canvas_': self.window,
+			'_renderer_': self,
+		}
+		self.written = 0
+		self.first = first
+		self.end = end
+		if out_dir is not None:
+			os.makedirs(out_dir, exist_ok=True)
+		random.seed(seed)
+
+	def path(self, frame):
+		return os.path.join(self.out_dir, self.pattern.format(frame))
+
+	def save_frame(self, frame):
+		if frame < self.first or (self.end is not None and frame >= self.end):
+			# Deferred work still happens, as when grabbing
+			QCoreApplication.processEvents()
+			return
+		if not grab(self.window).save(self.path(frame)):
+			raise RuntimeError('Cannot write {}'.format(self.path(frame)))
+		self.written += 1
+
+	def run_file(self, path):
+		'''Execute a script, as the PyPaper window does'''
+		if not os.path.isfile(path):
+			raise RuntimeError('Not a file: {}'.format(path))
+		src = open(path).read()
+		with self.clock:
+			exec(compile(src, path, 'exec'), self.py_ctx)
+
+	def run_code(self, cmd):
+		with self.clock:
+			exec(compile(cmd, '<command>', 'exec'), self.py_ctx)
+
+	def render(self, frames=None, max_frames=18000):
+		'''Render until frame number frames (excluded) or, if None,
+		until animations are over (at most max_frames). Returns the
+		number of the last rendered frame'''
+		with self.clock:
+			clock = self.clock
+			if frames is None:
+				while clock.busy() and clock.frame < max_frames:
+					clock.step()
+				# The final state
+				self.save_frame(clock.frame)
+				return clock.frame
+			while clock.frame < frames:
+				clock.step()
+			return frames - 1
+
+def _run(scripts, command, **kwargs):
+	r = Renderer(**kwargs)
+	for path in scripts:
+		r.run_file(path)
+	if command is not None:
+		r.run_code(command)
+	return r
+
+def render(scripts, out_dir, fps=30, frames=None, size=(1024, 768), command=None, pattern='frame_{:05d}.png', seed=0):
+	'''Run scripts (and command), rendering their animations into
+	out_dir. Requires a QApplication; use the offscreen platform
+	(QT_QPA_PLATFORM=offscreen) when there is no display.
+	Returns the number of images written'''
+	r = _run(scripts, command, out_dir=out_dir, fps=fps, size=size, pattern=pattern, seed=seed, end=frames)
+	r.render(frames)
+	return r.written
+
+def count_frames(scripts, fps=30, size=(1024, 768), command=None, seed=0, max_frames=18000):
+	'''Number of frames rendered when animations are left to finish'''
+	r = _run(scripts, command, out_dir=None, fps=fps, size=size, seed=seed, first=max_frames + 1)
+	return r.render(None, max_frames) + 1
+
+def _render_chunk(scripts, command, first, end, **kwargs):
+	'''Worker process: render frames from first to end (excluded)'''
+	os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+	os.environ.setdefault('QT_QUICK_BACKEND', 'software')
+	from PyQt5.QtWidgets import QApplication
+	app = QApplication.instance() or QApplication([])
+	t0 = time.perf_counter()
+	# Blocking animations may step past end while the scripts run
+	r = _run(scripts, command, first=first, end=end, **kwargs)
+	r.render(end)
+	return first, end, r.written, time.perf_counter() - t0
+
+def render_parallel(scripts, out_dir, workers=2, fps=30, frames=None, size=(1024, 768), command=None, pattern='frame_{:05d}.png', seed=0):
+	'''As render, splitting the frames among workers processes.
+	If frames is None, the scripts are run once here to count them.
+	Returns a list with (first frame, end frame, images written, seconds)
+	for each worker'''
+	import multiprocessing
+	if frames is None:
+		frames = count_frames(scripts, fps, size, command, seed)
+	workers = max(1, min(workers, frames))
+	bounds = [frames * i // workers for i in range(workers + 1)]
+	kwargs = dict(out_dir=out_dir, fps=fps, size=size, pattern=pattern, seed=seed)
+	# Workers build their own QApplication, so they must not be forked
+	ctx = multiprocessing.get_context('spawn')
+	with ctx.Pool(workers) as pool:
+		jobs = [pool.apply_async(_render_chunk, (scripts, command, bounds[i], bounds[i + 1]), kwargs) for i in range(workers)]
+		return [job.get() for job in jobs]
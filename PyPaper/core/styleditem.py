@@ -19,11 +19,34 @@ from PyQt5.QtQuick import *
 from PyQt5.QtGui import QPainter
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
+from PyQt5 import sip
 
-from PyPaper.core.animation import seq_anim_cm, par_anim_cm, prop_animation
+import math
+
+from PyPaper.core.animation import seq_anim_cm, par_anim_cm, prop_animation, running_animations, stop_animations
 from PyPaper.core.registry import Registry
+from PyPaper.core.dispatch import frame_dispatcher
+from PyPaper.core.imagecache import image_cache, fit_image, fit_size
 from PyPaper.tools.tools import *
 
+# Events fired by Item.geometryChanged
+_GEOMETRY_EVENTS = frozenset([
+	'on_x_changed', 'on_y_changed', 'on_pos_changed',
+	'on_width_changed', 'on_height_changed', 'on_size_changed',
+])
+
+# Item changes handled by Item.itemChange: event name and value attribute
+_ITEM_CHANGES = {
+	QQuickItem.ItemChildAddedChange: ('on_child_added', 'item'),
+	QQuickItem.ItemChildRemovedChange: ('on_child_removed', 'item'),
+	QQuickItem.ItemSceneChange: ('on_scene_change', 'window'),
+	QQuickItem.ItemVisibleHasChanged: ('on_visibility_changed', 'boolValue'),
+	QQuickItem.ItemParentHasChanged: ('on_parent_changed', 'item'),
+	QQuickItem.ItemOpacityHasChanged: ('on_opacity_changed', 'realValue'),
+	QQuickItem.ItemActiveFocusHasChanged: ('on_focus_changed', 'boolValue'),
+	QQuickItem.ItemRotationHasChanged: ('on_rotation_changed', 'realValue'),
+}
+
 class Item(QQuickPaintedItem, Registry):
 	'''This class is the base class, representing an item
 	capable of be used in PyPaper, supporting animations,
@@ -34,7 +57,7 @@ class Item(QQuickPaintedItem, Registry):
 
 	def __init__(self, parent=None):
 		super().__init__(parent)
-		self._animations = [] # List of playing animations involving this item
+		self._animations = [] # Running animations involving this item, removed when they stop
 		self._animation_contexts = [] # Groups of animations to be built
 
 		# Ensure that all mouse buttons are accepted
@@ -51,39 +74,50 @@ class Item(QQuickPaintedItem, Registry):
 		:type g_new: QRectF
 		:type g_old: QRectF
 		'''
-		def _test_change(v1, v2, callback):
-			'''If v1 and v2 are different, try to call the callback if exists'''
-			if v1 != v2:
-				self._run_callbacks(callback, self, v1, v2)
+		super().geometryChanged(g_new, g_old)
+		# Fast path: nobody is listening to geometry events
+		cbs = self._callbacks
+		if cbs and not _GEOMETRY_EVENTS.isdisjoint(cbs):
+			disp = frame_dispatcher()
+			if disp is None:
+				self._dispatch_geometry(g_new, g_old)
+			else:
+				# Notify once per frame
+				disp.mark(self, g_old)
+
+	def _dispatch_geometry(self, g_new, g_old):
+		'''Calls the callbacks of the geometry events which have subscribers,
+		building their arguments only when needed'''
+		x, y, w, h = g_new.x(), g_new.y(), g_new.width(), g_new.height()
+		ox, oy, ow, oh = g_old.x(), g_old.y(), g_old.width(), g_old.height()
+		# Callbacks may register other callbacks: check each time
+		cbs = self._callbacks
 
 		# Check for position changes
-		p_new = (g_new.x(), g_new.y())
-		p_old = (g_old.x(), g_old.y())
-		_test_change(p_new[0], p_old[0], 'on_x_changed')
-		_test_change(p_new[0], p_old[1], 'on_y_changed')
-		_test_change(p_new, p_old, 'on_pos_changed')
+		if x != ox or y != oy:
+			if x != ox and 'on_x_changed' in cbs:
+				self._run_callbacks('on_x_changed', self, x, ox)
+			if y != oy and 'on_y_changed' in cbs:
+				self._run_callbacks('on_y_changed', self, y, oy)
+			if 'on_pos_changed' in cbs:
+				self._run_callbacks('on_pos_changed', self, (x, y), (ox, oy))
 
 		# Check for size changes
-		s_new = (g_new.width(), g_new.height())
-		s_old = (g_old.width(), g_old.height())
-		_test_change(s_new[0], s_old[0], 'on_width_changed')
-		_test_change(s_new[1], s_old[1], 'on_height_changed')
-		_test_change(s_new, s_old, 'on_size_changed')
+		if w != ow or h != oh:
+			if w != ow and 'on_width_changed' in cbs:
+				self._run_callbacks('on_width_changed', self, w, ow)
+			if h != oh and 'on_height_changed' in cbs:
+				self._run_callbacks('on_height_changed', self, h, oh)
+			if 'on_size_changed' in cbs:
+				self._run_callbacks('on_size_changed', self, (w, h), (ow, oh))
 	
 	def itemChange(self, change, val):
 		'''Handle various item changes, calling the appropriate callbacks'''
-		changes = {
-			QQuickItem.ItemChildAddedChange: ('on_child_added', 'item'),
-			QQuickItem.ItemChildRemovedChange: ('on_child_removed', 'item'),
-			QQuickItem.ItemSceneChange: ('on_scene_change', 'window'),
-			QQuickItem.ItemVisibleHasChanged: ('on_visibility_changed', 'boolValue'),
-			QQuickItem.ItemParentHasChanged: ('on_parent_changed', 'item'),
-			QQuickItem.ItemOpacityHasChanged: ('on_opacity_changed', 'realValue'),
-			QQuickItem.ItemActiveFocusHasChanged: ('on_focus_changed', 'boolValue'),
-			QQuickItem.ItemRotationHasChanged: ('on_rotation_changed', 'realValue')
-		}
-		cb, vkey = changes[change]
-		self._run_callbacks(cb, self, getattr(val, vkey))
+		super().itemChange(change, val)
+		ev = _ITEM_CHANGES.get(change)
+		# Read the value only if someone is listening
+		if ev is not None and ev[0] in self._callbacks:
+			self._run_callbacks(ev[0], self, getattr(val, ev[1]))
 	
 	def mousePressEvent(self, ev):
 		if self._movable:
@@ -113,6 +147,8 @@ class Item(QQuickPaintedItem, Registry):
 	def remove(self): # FIXME I removed the unused parameter. If crashes, try to use wrap_skip
 		'''Remove the item from the scene and deletes it'''
 		self._run_callbacks('on_remove', self)
+		# Callbacks from and to this item are not needed anymore
+		self.release_subscriptions()
 		# Remove from scenegraph
 		self.setParentItem(None)
 		# Remove from object hierarchy
@@ -128,6 +164,15 @@ class Item(QQuickPaintedItem, Registry):
 		self._run_callbacks('on_attach', self)
 		self.setParentItem(parent)
 
+	def running_animations(self):
+		'''Returns the running animations involving this item'''
+		return running_animations(self)
+
+	def stop_animations(self, finish=False):
+		'''Stop the animations involving this item, see
+		animation.stop_animations'''
+		stop_animations(self, finish)
+
 	def set_pos(self, x, y):
 		self.setX(x)
 		self.setY(y)
@@ -166,9 +211,12 @@ class Item(QQuickPaintedItem, Registry):
 			if on_finished:
 				agrp.finished.connect(on_finished)
 			agrp.addAnimation(prop_animation(self, 'opacity', end_op, **kwargs))
+		return agrp
 	
 	def move_to(self, x, y, offset=False, on_finished=None, **kwargs):
-		'''Animate the movement of this item toward a given target position.'''
+		'''Animate the movement of this item toward a given target position.
+		Like the other _to methods, returns the timeline of the animation,
+		which can be awaited (see core.aio)'''
 		if offset:
 			xo, yo = self.get_pos()
 			if x is not None: x += xo
@@ -183,6 +231,7 @@ class Item(QQuickPaintedItem, Registry):
 				agrp.addAnimation(prop_animation(self, 'x', x, **kwargs))
 			else:
 				agrp.addAnimation(prop_animation(self, 'y', y, **kwargs))
+		return agrp
 
 	def resize_to(self, w, h, offset=False, on_finished=None, **kwargs):
 		'''Animate the resize of this item'''
@@ -200,6 +249,7 @@ class Item(QQuickPaintedItem, Registry):
 				agrp.addAnimation(prop_animation(self, 'width', w, **kwargs))
 			else:
 				agrp.addAnimation(prop_animation(self, 'height', h, **kwargs))
+		return agrp
 	
 	def rotate_to(self, a, offset=False, on_finished=None, **kwargs):
 		'''Animate the rotation of this item'''
@@ -209,6 +259,7 @@ class Item(QQuickPaintedItem, Registry):
 			if on_finished:
 				agrp.finished.connect(on_finished)
 			agrp.addAnimation(prop_animation(self, 'rotation', a, **kwargs))
+		return agrp
 
 class StyledItem(Item):
 	'''StyledItem, this is a multi-purpose item which probably
@@ -279,13 +330,10 @@ class StyledItem(Item):
 		return self._font_size
 
 	def set_background_image(self, image_path):
-		import os
 		if image_path != self._backgr_img_path:
 			self._backgr_img_path = image_path
-			if os.path.isfile(image_path):
-				self._backgr_img = QImage(image_path)
-			else:
-				self._backgr_img = None
+			# Decoded once, shared by all the items using this path
+			self._backgr_img = image_cache().load(image_path)
 			self.update()
 	
 	def get_background_image(self):
@@ -346,53 +394,21 @@ class StyledItem(Item):
 
 		# If a background image is set
 		if self._backgr_img is not None:
-			# If a clipping region has been specified, copy the image 
-			# FIXME this is not really efficient I think
-			if hasattr(self, 'bg_clip_rect'):
-				bg_img = self._backgr_img.copy(*self.bg_clip_rect)
-			else:
-				bg_img = self._backgr_img
-
-			# Get rendering parameters
-			fit_mode = self._bg_img_fit_mode
-			enlarge_image = self._bg_img_stretch
-			# Get sizes
-			img_size = bg_img.size()
+			clip = getattr(self, 'bg_clip_rect', None)
 			box_size = br_bg.size().toSize()
-			# Compute target size
-			if fit_mode == 'full':
-				# Full mode will preserve aspect ratio
-				if enlarge_image:
-					target_size = box_size
-				else:
-					tw = min(img_size.width(), box_size.width())
-					th = min(img_size.height(), box_size.height())
-					target_size = QSize(tw, th)
-				target_ar = Qt.KeepAspectRatio
-				scaled_img = bg_img.scaled(target_size, target_ar)
-			elif fit_mode == 'width':
-				# Width mode will never render the image wider than the box
-				if enlarge_image:
-					targ_w = box_size.width()
-				else:
-					targ_w = min(img_size.width(), box_size.width())
-				scaled_img = bg_img.scaledToWidth(targ_w)
-			elif fit_mode == 'height':
-				if enlarge_image:
-					targ_h = box_size.height()
-				else:
-					targ_h = min(img_size.height(), box_size.height())
-				scaled_img = bg_img.scaledToHeight(targ_h)
-			else: # none/stretch
-				if enlarge_image:
-					target_size = box_size
-					target_ar = Qt.IgnoreAspectRatio
-					scaled_img = bg_img.scaled(target_size, target_ar)
-				else:
-					scaled_img = bg_img 
-
-			# Draw image
-			painter.drawImage(bord_l, bord_t, scaled_img)
+			fit_mode, stretch = self._bg_img_fit_mode, self._bg_img_stretch
+			if clip is not None:
+				# Draw only the clipped part, scaling while drawing
+				src = QRectF(clip) if isinstance(clip, QRectF) else QRectF(*clip)
+				size = fit_size(src.size().toSize(), box_size, fit_mode, stretch)
+				painter.drawImage(QRectF(bord_l, bord_t, size.width(), size.height()), self._backgr_img, src)
+			else:
+				# Shared, scaled only when size or mode change
+				scaled_img = image_cache().scaled(self._backgr_img_path, box_size, fit_mode, stretch)
+				if scaled_img is None:
+					# File is gone, use the loaded image
+					scaled_img = fit_image(self._backgr_img, box_size, fit_mode, stretch)
+				painter.drawImage(bord_l, bord_t, scaled_img)
 
 		# Draw text, after setting padding
 		if self._text is not None:
@@ -459,6 +475,7 @@ class StyledItem(Item):
 				agrp.finished.connect(on_finished)
 			agrp.addAnimation(prop_animation(self, 'x_radius', x, **kwargs))
 			agrp.addAnimation(prop_animation(self, 'y_radius', y, **kwargs))
+		return agrp
 	
 	def set_rect_radius_mode(self, relative):
 		if relative:
@@ -475,6 +492,7 @@ class StyledItem(Item):
 			if on_finished:
 				agrp.finished.connect(on_finished)
 			agrp.addAnimation(prop_animation(self, 'background_color', color, **kwargs))
+		return agrp
 
 	def border_color_to(self, color, on_finished=None, **kwargs):
 		'''Animate the border color of this item. You can use a RGB(A) tuple for color'''
@@ -484,4 +502,116 @@ class StyledItem(Item):
 			if on_finished:
 				agrp.finished.connect(on_finished)
 			agrp.addAnimation(prop_animation(self, 'border_color', color, **kwargs))
+		return agrp
 	
+
+_TRANSPARENT = QColor(Qt.transparent)
+
+def _rgba(col):
+	return None if col is None else col.rgba()
+
+class SGStyledItem(StyledItem):
+	'''A StyledItem drawn with scene graph nodes instead of painting
+	on each update. Boxes without radius, image and text are made of two
+	rectangle nodes: animating their colors or size only changes node
+	properties and no Python painting is done.
+	Other items are painted once in a texture, which is painted again
+	only when their look changes (e.g. not when they are moved).
+	API and box model are the same of StyledItem'''
+
+	def __init__(self, parent=None):
+		super().__init__(parent)
+		self._sg_nodes = None # Child nodes of the item node
+		self._sg_key = None # What the nodes show, to skip unneeded work
+
+	def _is_box(self):
+		'''True if the item can be drawn with rectangle nodes'''
+		return ((self._x_rad == 0 or self._y_rad == 0)
+			and self._backgr_img is None and self._text is None
+			# A paint callback may draw anything
+			and 'paint' not in self.__dict__)
+
+	def _texture_key(self, dpr):
+		'''Everything paint depends on: the texture is painted again
+		when this changes. None if it cannot be known'''
+		if 'paint' in self.__dict__:
+			return None
+		clip = getattr(self, 'bg_clip_rect', None)
+		return (self.width(), self.height(), dpr,
+			_rgba(self.bord_col_), _rgba(self.backg_col_), _rgba(self._font_col), self._font_size,
+			self._x_rad, self._y_rad, self._rel_rad, self._marg, self._bord, self._padd,
+			self._text, id(self._backgr_img), self._bg_img_fit_mode, self._bg_img_stretch,
+			None if clip is None else QRectF(clip) if isinstance(clip, QRectF) else tuple(clip))
+
+	def _set_children(self, node, kind, children):
+		'''Replace the children of node'''
+		if self._sg_nodes is not None:
+			for child in self._sg_nodes[1:]:
+				node.removeChildNode(child)
+				sip.delete(child)
+		for child in children:
+			node.appendChildNode(child)
+		self._sg_nodes = (kind,) + tuple(children)
+		self._sg_key = None
+
+	def updatePaintNode(self, node, data):
+		if node is None:
+			# First time, or the scene graph deleted our nodes
+			node = QSGNode()
+			self._sg_nodes = None
+			self._sg_key = None
+		win = self.window()
+		if self.width() <= 0 or self.height() <= 0:
+			self._set_children(node, None, [])
+		elif self._is_box():
+			self._update_box(node, win)
+		else:
+			self._update_texture(node, win)
+		return node
+
+	def _update_box(self, node, win):
+		nodes = self._sg_nodes
+		if nodes is None or nodes[0] != 'box':
+			self._set_children(node, 'box', [win.createRectangleNode(), win.createRectangleNode()])
+			nodes = self._sg_nodes
+		_, bord_node, backg_node = nodes
+
+		# Rectangles change only with geometry and box model
+		key = (self.width(), self.height(), self._marg, self._bord)
+		if key != self._sg_key:
+			# Same box model of StyledItem.paint
+			marg_l, marg_t, marg_r, marg_b = self._marg
+			br = self.contentsBoundingRect().adjusted(marg_l, marg_t, -marg_r, -marg_b)
+			bord_l, bord_t, bord_r, bord_b = self._bord
+			bord_node.setRect(br)
+			backg_node.setRect(br.adjusted(bord_l, bord_t, -bord_r, -bord_b))
+			self._sg_key = key
+
+		bord_col = self.bord_col_
+		bord_node.setColor(bord_col if bord_col is not None else _TRANSPARENT)
+		backg_col = self.backg_col_
+		backg_node.setColor(backg_col if backg_col is not None else _TRANSPARENT)
+
+	def _update_texture(self, node, win):
+		dpr = win.effectiveDevicePixelRatio()
+		key = self._texture_key(dpr)
+		if self._sg_nodes is not None and self._sg_nodes[0] == 'texture' and key is not None and key == self._sg_key:
+			return
+
+		w, h = self.width(), self.height()
+		img = QImage(max(1, math.ceil(w * dpr)), max(1, math.ceil(h * dpr)), QImage.Format_ARGB32_Premultiplied)
+		img.setDevicePixelRatio(dpr)
+		img.fill(Qt.transparent)
+		painter = QPainter(img)
+		self.paint(painter)
+		painter.end()
+
+		# A new node owning the texture, the old one is deleted with its own
+		tex = win.createTextureFromImage(img)
+		img_node = win.createImageNode()
+		img_node.setTexture(tex)
+		img_node.setOwnsTexture(True)
+		sip.transferto(tex, None)
+		img_node.setRect(QRectF(0, 0, w, h))
+		self._set_children(node, 'texture', [img_node])
+		self._sg_key = key
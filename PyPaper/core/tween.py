@@ -0,0 +1,262 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Tween engine: a single driver animation advances every active tween.
+
+Start values, changes, times and easing of all the tweens are kept in
+NumPy arrays, so that each frame the values are computed with a few
+vectorized operations and then written to their targets in one pass.
+Targets are Qt properties (with fast paths for the geometry, opacity
+and colors of the items) or plain Python attributes.
+
+	from PyPaper.core.tween import tween
+	for i, it in enumerate(items):
+		tween(it, 'pos', QPointF(10 * i, 100), duration=1000, easing='OutBounce')
+
+This module requires NumPy.'''
+
+from PyQt5.QtCore import QAbstractAnimation
+from PyQt5.QtGui import QColor
+from PyQt5 import sip
+
+from PyPaper.core.animation import value_components, read_property, property_writer, start_animation
+from PyPaper.core.easing import easing_curve
+from PyPaper.tools.tools import make_rgba
+
+import numpy as np
+
+# Samples of each easing curve
+_LUT_SIZE = 1024
+# Sampled curves are forgotten, when no tween uses them, once there
+# are more than these
+_MAX_LUTS = 64
+
+class _Driver(QAbstractAnimation):
+	'''Runs while some tween is active'''
+
+	def __init__(self, engine):
+		super().__init__()
+		self._engine = engine
+
+	def duration(self):
+		return -1
+
+	def updateCurrentTime(self, t):
+		self._engine.tick(t)
+
+class TweenEngine:
+	'''Advances all its tweens from one driver animation.
+	Each tween animates up to 4 components (e.g. a point or a color)
+	and a new tween on the same target and attribute replaces the old one'''
+
+	CHANNELS = 4
+
+	def __init__(self, capacity=256):
+		self._start = np.zeros((capacity, self.CHANNELS))
+		self._delta = np.zeros((capacity, self.CHANNELS))
+		self._t0 = np.zeros(capacity)
+		self._dur = np.ones(capacity)
+		self._ease = np.zeros(capacity, dtype=np.intp)
+		self._active = np.zeros(capacity, dtype=bool)
+		self._index = None # Active slots, None when to be computed
+
+		self._slots = {} # (target, attr): slot
+		self._keys = [None] * capacity # Slot: (target, attr)
+		self._writers = [None] * capacity # Slot: function(target, components)
+		self._callbacks = {} # Slot: on_finished
+		self._free = list(range(capacity - 1, -1, -1))
+
+		self._lut_table = np.zeros((8, _LUT_SIZE)) # Sampled easing curves
+		self._lut_free = list(range(7, -1, -1))
+		self._lut_rows = {} # Samples (bytes): row in _lut_table
+		self._lut_curves = {} # id(curve): (curve, row)
+		self._driver = None
+		self._starting = False
+
+	def __len__(self):
+		return len(self._slots)
+
+	def _lut(self, easing):
+		'''Row of _lut_table with the samples of easing. Specs may be
+		unhashable (e.g. a QEasingCurve), so the curve is the key; curves
+		with the same samples (e.g. equal lambdas) share the row'''
+		curve = easing_curve(easing)
+		hit = self._lut_curves.get(id(curve))
+		if hit is not None:
+			return hit[1]
+		step = 1 / (_LUT_SIZE - 1)
+		samples = np.array([curve.valueForProgress(k * step) for k in range(_LUT_SIZE)])
+		key = samples.tobytes()
+		row = self._lut_rows.get(key)
+		if row is None:
+			row = self._lut_rows[key] = self._lut_row()
+			self._lut_table[row] = samples
+		if len(self._lut_curves) >= 4 * _MAX_LUTS:
+			# Only a shortcut to the rows, which are found by samples too
+			self._lut_curves.clear()
+		self._lut_curves[id(curve)] = (curve, row)
+		return row
+
+	def _lut_row(self):
+		'''A free row of _lut_table'''
+		if not self._lut_free and len(self._lut_rows) >= _MAX_LUTS:
+			# Forget the curves no tween is using
+			used = set(self._ease[self._active].tolist())
+			for key, row in list(self._lut_rows.items()):
+				if row not in used:
+					del self._lut_rows[key]
+					self._lut_free.append(row)
+			self._lut_curves = dict((k, v) for k, v in self._lut_curves.items() if v[1] in used)
+		if not self._lut_free:
+			n = len(self._lut_table)
+			self._lut_table = np.concatenate([self._lut_table, np.zeros((n, _LUT_SIZE))])
+			self._lut_free = list(range(2 * n - 1, n - 1, -1))
+		return self._lut_free.pop()
+
+	def _grow(self):
+		n = len(self._t0)
+		self._start = np.concatenate([self._start, np.zeros((n, self.CHANNELS))])
+		self._delta = np.concatenate([self._delta, np.zeros((n, self.CHANNELS))])
+		self._t0 = np.concatenate([self._t0, np.zeros(n)])
+		self._dur = np.concatenate([self._dur, np.ones(n)])
+		self._ease = np.concatenate([self._ease, np.zeros(n, dtype=np.intp)])
+		self._active = np.concatenate([self._active, np.zeros(n, dtype=bool)])
+		self._keys += [None] * n
+		self._writers += [None] * n
+		self._free = list(range(2 * n - 1, n - 1, -1)) + self._free
+
+	def _now(self):
+		'''Time of the driver, starting it if needed'''
+		if self._driver is None:
+			self._driver = _Driver(self)
+		# Paused when driven by a virtual clock
+		if self._driver.state() == QAbstractAnimation.Stopped:
+			self._starting = True
+			start_animation(self._driver)
+			self._starting = False
+		return self._driver.currentTime()
+
+	def tween(self, target, attr, end, duration=500, easing='InOutQuad', start=None, delay=0, on_finished=None):
+		'''Animate attr of target to end, in duration milliseconds, after
+		delay milliseconds. attr is a Qt property of target (e.g. 'pos',
+		'background_color') or any attribute holding a number or a tuple
+		of numbers. If start is None, it is the current value'''
+		if start is None:
+			start = read_property(target, attr)
+		if isinstance(start, QColor) and hasattr(end, '__iter__'):
+			end = make_rgba(*end)
+		s, make = value_components(start)
+		e, _ = value_components(end)
+		if len(s) != len(e) or len(s) > self.CHANNELS:
+			raise RuntimeError('Cannot tween {} from {} to {}'.format(attr, start, end))
+
+		writer = property_writer(target, attr, make)
+
+		key = (target, attr)
+		slot = self._slots.get(key)
+		if slot is None:
+			if not self._free:
+				self._grow()
+			slot = self._slots[key] = self._free.pop()
+			self._keys[slot] = key
+		self._callbacks.pop(slot, None)
+		if on_finished is not None:
+			self._callbacks[slot] = on_finished
+
+		n = len(s)
+		self._start[slot, :n] = s
+		self._delta[slot, :n] = np.subtract(e, s)
+		self._t0[slot] = self._now() + delay
+		self._dur[slot] = max(duration, 0)
+		self._ease[slot] = self._lut(easing)
+		self._writers[slot] = (writer, n)
+		self._active[slot] = True
+		self._index = None
+
+	def cancel(self, target, attr=None):
+		'''Stop the tweens of target (only of attr, if not None), leaving
+		the current values and without calling on_finished'''
+		keys = [(target, attr)] if attr is not None else [k for k in self._slots if k[0] is target]
+		for key in keys:
+			slot = self._slots.get(key)
+			if slot is not None:
+				self._release(slot)
+
+	def _release(self, slot):
+		del self._slots[self._keys[slot]]
+		self._keys[slot] = None
+		self._writers[slot] = None
+		self._callbacks.pop(slot, None)
+		self._active[slot] = False
+		self._free.append(slot)
+		self._index = None
+
+	def tick(self, now):
+		'''Compute the values at time now and write them'''
+		if self._starting:
+			return
+		if self._index is None:
+			self._index = np.flatnonzero(self._active)
+		idx = self._index
+		if len(idx):
+			dur = self._dur[idx]
+			elapsed = now - self._t0[idx]
+			p = elapsed / np.where(dur > 0, dur, 1)
+			# Instant tweens jump to the end, once their delay is over
+			instant = dur <= 0
+			p[instant] = np.where(elapsed[instant] >= 0, 1, -1)
+			started = p >= 0
+			np.clip(p, 0, 1, out=p)
+			e = self._lut_table[self._ease[idx], np.rint(p * (_LUT_SIZE - 1)).astype(np.intp)]
+			values = (self._start[idx] + self._delta[idx] * e[:, None]).tolist()
+
+			keys, writers = self._keys, self._writers
+			finished = idx[p >= 1].tolist()
+			for slot, v, go in zip(idx.tolist(), values, started.tolist()):
+				if go:
+					writer, n = writers[slot]
+					try:
+						writer(keys[slot][0], v[:n])
+					except RuntimeError:
+						# The item has been deleted
+						if sip.isdeleted(keys[slot][0]):
+							finished.append(slot)
+							self._callbacks.pop(slot, None)
+						else:
+							raise
+
+			callbacks = [self._callbacks.get(slot) for slot in finished]
+			for slot in finished:
+				self._release(slot)
+			for cb in callbacks:
+				if cb is not None:
+					cb()
+		if not self._slots and self._driver is not None:
+			self._driver.stop()
+
+_engine = None
+
+def tween_engine():
+	'''Returns the process-wide TweenEngine'''
+	global _engine
+	if _engine is None:
+		_engine = TweenEngine()
+	return _engine
+
+def tween(target, attr, end, **kwargs):
+	'''Animate attr of target with the process-wide engine, see TweenEngine.tween'''
+	tween_engine().tween(target, attr, end, **kwargs)
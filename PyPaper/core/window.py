@@ -22,11 +22,13 @@ from PyQt5.QtGui import QFont, QTextCursor, QWheelEvent
 
 from PyPaper.core.styleditem import StyledItem
 from PyPaper.core.jedimodel import JediEdit
+from PyPaper.core.dispatch import enable_frame_dispatch
+from PyPaper.core.aio import AsyncConsole
+from PyPaper.core.console import ConsoleOutput
 
 import os
 import sys
-import io
-import code
+import ast
 
 class QuickWindow(QQuickWindow):
 	def __init__(self, parent=None):
@@ -67,11 +69,14 @@ class QuickWindow(QQuickWindow):
 		super().wheelEvent(event)
 
 class Window(QWidget):
-	def __init__(self, sources=[], command=None, parent=None):
+	def __init__(self, sources=[], command=None, frame_dispatch=False, max_blocks=10000, log_path=None, parent=None):
 		super().__init__(parent)
 
 		# The QuickWindow used to store the scenegraph and showing the images
 		self.qqw_ = QuickWindow()
+		# Geometry notifications once per frame, if requested
+		if frame_dispatch:
+			enable_frame_dispatch(self.qqw_)
 
 		# Prompt symbols for normal prompt and continuation prompt
 		self.prompts_ = ['>>>', '...']
@@ -83,47 +88,14 @@ class Window(QWidget):
 		# A text eitor to store the results (read-only)
 		self.output_ = QPlainTextEdit()
 		self.output_.setReadOnly(True)
-#		self.output_.setMaximumBlockCount(100
 		# Make text monospaced
 		font = QFont()
 		font.setFamily("Monospace")
 		font.setStyleHint(QFont.Monospace)
 		font.setPointSize(10)
 		self.output_.setFont(font)
-
-		# Use output_ to display stdout and stderr
-		# TODO check if redirect_stdout/redirect_stderr can help
-		class Writer(io.IOBase):
-			'''This class is used in place of stdout and stderr to
-			print directly to the output window.
-			If tee is provided, write also happens on that stream.'''
-			def __init__(self, edit, color=None, tee=None):
-				self.edit_ = edit
-				self.col_ = color
-				self._tee = tee
-				self._buffer = ''
-
-				self.errors = 'backslashreplace'
-				self.encoding = 'UTF-8'
-
-			def write(self, data):
-				# If tee is present, write also on that
-				if self._tee is not None:
-					self._tee.write(data)
-
-				# Buffer the data, we work row-wise
-				self._buffer += data
-				lines = self._buffer.split('\n')
-				for line in lines[:-1]:
-					# Move to the end point and insert the text
-					if self.col_ is None:
-						self.edit_.appendPlainText(line)
-					else:
-						line = line.replace('&', '&amp;').replace(' ', '&nbsp;').replace('<', '&lt;').replace('>', '&gt;').replace('\n', '<br/>')
-						html = "<font color='{}'>{}</font>".format(self.col_, line)
-						self.edit_.appendHtml(html)
-				# Last line goes in the buffer
-				self._buffer = lines[-1]
+		# Lines are queued and shown once per frame, keeping max_blocks of them
+		self.out_buffer_ = ConsoleOutput(self.output_, max_blocks, log_path)
 
 		# Window container
 		container_w = QWidget.createWindowContainer(self.qqw_)
@@ -161,8 +133,8 @@ class Window(QWidget):
 		self.reset_interpreter()
 
 		# After initialization, setup the output streams
-		sys.stdout = Writer(self.output_, color='black', tee=sys.__stdout__)
-		sys.stderr = Writer(self.output_, color='red', tee=sys.__stderr__)
+		sys.stdout = self.out_buffer_.writer('black', tee=sys.__stdout__)
+		sys.stderr = self.out_buffer_.writer('red', tee=sys.__stderr__)
 #		sys.stdin = TODO would be nice to have an object as stdin to use with input()
 
 		# As last thing, it's possible to run the scripts
@@ -184,7 +156,7 @@ class Window(QWidget):
 			'_canvas_': self.qqw_,
 			'_win_': self,
 		}
-		self.interp_ = code.InteractiveConsole(self.py_ctx_)
+		self.interp_ = AsyncConsole(self.py_ctx_)
 
 	def show_panel(self):
 		'''Show the console panel'''
@@ -211,7 +183,7 @@ class Window(QWidget):
 		'''Reads a file and execute it as if typed'''
 		if os.path.isfile(path):
 			src = open(path).read()
-			code = compile(src, path, 'exec')
+			code = compile(src, path, 'exec', flags=ast.PyCF_ALLOW_TOP_LEVEL_AWAIT)
 			self.console_.add_history(src)
 			self.interp_.runcode(code)
 			# Update locals
@@ -16,63 +16,111 @@
 # Copyright 2015 Alessandro "AkiRoss" Re
 
 from PyPaper.tools.items import *
+from PyPaper.tools.tools import _center
+from PyPaper.core.animation import par_anim_cm
 
 class Node:
 	def __init__(self, graph, root_item, radius=10):
 		self.item = CircleItem(root_item)
 		self.item.set_radius(radius) # Start with a default radius
 		self.graph = graph
+		# Adjacency, kept up to date by the graph
+		self._out_edges = set() # Edges starting from this node
+		self._in_edges = set() # Edges ending in this node
 
 	def remove(self):
 		self.graph.remove(self)
 	
 	def outbound_edges(self):
 		'''Returns the set of edges for which this node is a start'''
-		oe = set()
-		for edge in self.graph._edges:
-			if edge.start is self:
-				oe.add(edge)
-		return oe
+		return set(self._out_edges)
 
 	def inbound_edges(self):
 		'''Returns the set of edges for which this node is an end'''
-		ie = set()
-		for edge in self.graph._edges:
-			if edge.end is self:
-				ie.add(edge)
-		return ie
+		return set(self._in_edges)
 
 	def successors(self):
 		'''Returns the set of direct-successors of this node'''
-		return set(e.end for e in self.outbound_edges())
+		return set(e.end for e in self._out_edges)
 
 	def predecessors(self):
 		'''Returns the set of direct-predecessors of this node'''
-		return set(e.start for e in self.inbound_edges())
+		return set(e.start for e in self._in_edges)
 
 	def __str__(self):
 		if self.name:
 			return str(self.name)
 		return super().__str__()
 
+# Shared by every edge, to avoid a closure per registration
+_line_set_opacity = wrap_skip(LineItem.setOpacity)
+
 class Edge:
-	def __init__(self, start, end, graph, root_item):
+	def __init__(self, start, end, graph, root_item, place=True):
+		'''If place is False, the line is bound to the nodes but not
+		placed: the graph will place it with update_line.
+		If the graph has an edge layer, the edge is drawn by the layer
+		and has no item, but an index in the layer'''
 		self.start = start
 		self.end = end
-		self.item = LineItem(parent=root_item)#make_line(start.item, end.item, graph._item_root)
-		self.item.setZ(-1) # Under the circles
-		bind_line(self.item, start.item, end.item)
 		self.graph = graph
+		layer = graph._edge_layer
+		if layer is None:
+			self.item = LineItem(parent=root_item)#make_line(start.item, end.item, graph._item_root)
+			self.item.setZ(-1) # Under the circles
+			bind_line(self.item, start.item, end.item, place)
+			self.index = None
+		else:
+			self.item = None
+			self.index = layer.add_edge(start.item, end.item)
 	
 	def remove(self):
 		self.graph.remove(self)
 
+	def set_color(self, col):
+		'''Set the line color'''
+		if self.item is None:
+			self.graph._edge_layer.set_edge_color(self.index, col)
+		else:
+			self.item.set_border_color(col)
+
+	def get_color(self):
+		if self.item is None:
+			return self.graph._edge_layer.get_edge_color(self.index)
+		return self.item.get_border_color()
+
+	def _dispose(self):
+		'''Remove the line from the scene'''
+		if self.item is None:
+			self.graph._edge_layer.remove_edge(self.index)
+		else:
+			self.item.remove()
+
 class Graph:
-	def __init__(self, root_item, radius=10):
+	def __init__(self, root_item, radius=10, edge_layer=False):
+		'''If edge_layer is True, all the edges are drawn by a single
+		EdgeLayer instead of a LineItem each: this scales to many more
+		edges, but edges have no item (use Edge.set_color to style them)
+		and do not follow the opacity of the nodes'''
 		self._nodes = set()
 		self._edges = set()
 		self._item_root = root_item
 		self._def_radius = radius
+		self._edge_layer = EdgeLayer(root_item) if edge_layer else None
+
+	@classmethod
+	def from_edge_list(cls, root_item, edges, radius=10, edge_layer=False):
+		'''Builds a graph from an iterable of (a, b) or (a, b, edge_name) tuples,
+		where a and b are node names. Nodes are created in order of appearance'''
+		edges = list(edges)
+		g = cls(root_item, radius, edge_layer)
+		names = {}
+		for e in edges:
+			names.setdefault(e[0], None)
+			names.setdefault(e[1], None)
+		by_name = dict(zip(names, g.add_nodes(list(names))))
+		g.add_edges((by_name[e[0]], by_name[e[1]]) + tuple(e[2:]) for e in edges)
+		return g
 
 	def add_node(self, name=None):
 		n = Node(self, self._item_root, self._def_radius)
@@ -80,53 +128,139 @@ class Graph:
 		self._nodes.add(n)
 		return n
 
+	def add_nodes(self, n_or_names):
+		'''Add many nodes at once. The argument is either the number of
+		(unnamed) nodes to create or an iterable of names.
+		Returns the list of new nodes'''
+		if isinstance(n_or_names, int):
+			n_or_names = [None] * n_or_names
+		with gc_paused():
+			return [self.add_node(name) for name in n_or_names]
+
 	def add_edge(self, n1, n2, name=None):
+		return self.add_edges([(n1, n2, name)])[0]
+
+	def add_edges(self, pairs):
+		'''Add many edges at once. pairs is an iterable of (n1, n2) or
+		(n1, n2, name) tuples. Every pair is validated before any edge is
+		created, and lines are placed once, after all the edges are wired.
+		Returns the list of new edges'''
 		# Ensure nodes are valid
-		if n1 not in self._nodes:
-			raise RuntimeError('Node n1 not belonging to this graph')
-		if n2 not in self._nodes:
-			raise RuntimeError('Node n2 not belonging to this graph')
-		# Create an edge object
-		e = Edge(n1, n2, self, self._item_root)
-		e.name = name
-		self._edges.add(e)
-		# Create a line for this edge
-#		e.item = make_line(n1.item, n2.item)
-#		def _bind(line):
-#			rem = lambda it: line.remove()
-#			opa = lambda it, op: line.setOpacity(op)
-#			return rem, opa
-		# Line is removed on node removed
-#		rem, opa = _bind(e.item)
-		n1.item.register('on_remove', e.item, LineItem.remove)
-		n1.item.register('on_opacity_changed', e.item, wrap_skip(LineItem.setOpacity))# lambda s,o,op: s.setOpacity(op))
-		n2.item.register('on_remove', e.item, LineItem.remove)
-		n2.item.register('on_opacity_changed', e.item, wrap_skip(LineItem.setOpacity))
-
-		# Return the edge
-		return e
+		specs = []
+		for pair in pairs:
+			n1, n2 = pair[0], pair[1]
+			if n1 not in self._nodes:
+				raise RuntimeError('Node n1 not belonging to this graph')
+			if n2 not in self._nodes:
+				raise RuntimeError('Node n2 not belonging to this graph')
+			specs.append((n1, n2, pair[2] if len(pair) > 2 else None))
+
+		edges = []
+		with gc_paused():
+			for n1, n2, name in specs:
+				# Create an edge object, the line is placed later
+				e = Edge(n1, n2, self, self._item_root, place=False)
+				e.name = name
+				self._edges.add(e)
+				n1._out_edges.add(e)
+				n2._in_edges.add(e)
+				edges.append(e)
+				if e.item is None:
+					# The layer takes care of it
+					continue
+				# Line is removed on node removed
+				n1.item.register('on_remove', e.item, LineItem.remove)
+				n1.item.register('on_opacity_changed', e.item, _line_set_opacity)
+				n2.item.register('on_remove', e.item, LineItem.remove)
+				n2.item.register('on_opacity_changed', e.item, _line_set_opacity)
+
+			# Geometry is computed only when everything is wired
+			for e in edges:
+				if e.item is not None:
+					update_line(e.item, e.start.item, e.end.item)
+		return edges
 	
 	def remove(self, element):
 		# Find the element in the graph
 		if element in self._nodes:
-			# Remove the edges
-			to_remove = set()
-			for edge in self._edges:
-				if edge.start is element or edge.end is element:
-					to_remove.add(edge)
-			for edge in to_remove:
-				self._edges.remove(edge)
+			# Remove the edges, using the node adjacency (self-loops appear once)
+			for edge in element._out_edges | element._in_edges:
+				self._unlink(edge)
 				# Remove the item, will remove the line
-				edge.item.remove()
+				edge._dispose()
 			element.item.remove()
 			self._nodes.remove(element)
 		elif element in self._edges:
 			# Remove the edge and unbind it from the node
-			element.item.remove()
-			self._edges.remove(element)
+			element._dispose()
+			self._unlink(element)
 		else:
 			raise RuntimeError('Element not belonging to this graph')
+
+	def _unlink(self, edge):
+		'''Remove the edge from the graph and from the adjacency of its nodes'''
+		self._edges.remove(edge)
+		edge.start._out_edges.discard(edge)
+		edge.end._in_edges.discard(edge)
 	
+	def layout_force(self, iterations=50, width=None, height=None, animate=False, live=False, seed=None, **kwargs):
+		'''Places the nodes with a force-directed layout (see tools.layout.ForceLayout).
+		The layout covers a width x height area, by default the size of the
+		root item. Current positions are used as the starting point, unless
+		all the nodes are on the same spot.
+		The result is applied instantly or, if animate is True, using move_to
+		in a single parallel animation group (kwargs are passed to move_to).
+		If live is True, one iteration is run and applied at every frame
+		instead, so the layout can be watched while it converges.
+		Returns the ForceLayout, which can be stepped further.
+		Requires NumPy.'''
+		from PyPaper.tools.layout import ForceLayout
+
+		nodes = list(self._nodes)
+		index = dict((n, i) for i, n in enumerate(nodes))
+		edges = [(index[e.start], index[e.end]) for e in self._edges]
+
+		if width is None:
+			width = self._item_root.width() or max(100, 50 * len(nodes) ** 0.5)
+		if height is None:
+			height = self._item_root.height() or max(100, 50 * len(nodes) ** 0.5)
+
+		centers = [_center(n.item.get_pos(), n.item.get_size()) for n in nodes]
+		if len(set(centers)) < 2:
+			centers = None
+		layout = ForceLayout(len(nodes), edges, width, height, centers, seed)
+
+		if live:
+			from PyQt5.QtCore import QTimer
+			# Only one live layout per graph
+			if getattr(self, '_layout_timer', None) is not None:
+				self._layout_timer.stop()
+			timer = QTimer()
+			def _tick():
+				layout.step()
+				self._apply_layout(nodes, layout.positions())
+				if layout.iterations >= iterations:
+					timer.stop()
+			timer.timeout.connect(_tick)
+			timer.start(16)
+			self._layout_timer = timer
+		else:
+			layout.run(iterations)
+			self._apply_layout(nodes, layout.positions(), animate, **kwargs)
+		return layout
+
+	def _apply_layout(self, nodes, centers, animate=False, **kwargs):
+		'''Move the node items so that their centers are in the given positions'''
+		if animate:
+			with par_anim_cm(*(n.item for n in nodes)):
+				for n, (x, y) in zip(nodes, centers.tolist()):
+					w, h = n.item.get_size()
+					n.item.move_to(x - w / 2, y - h / 2, **kwargs)
+		else:
+			for n, (x, y) in zip(nodes, centers.tolist()):
+				w, h = n.item.get_size()
+				n.item.set_pos(x - w / 2, y - h / 2)
+
 	def nodes(self):
 		return set(self._nodes)
 
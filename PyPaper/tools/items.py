@@ -20,8 +20,10 @@ from PyQt5.QtGui import QPainter
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 
-from PyPaper.core.styleditem import StyledItem
+from PyPaper.core.styleditem import Item, StyledItem
+from PyPaper.core.dispatch import frame_dispatcher
 from PyPaper.tools.tools import *
+from PyPaper.tools.tools import _center
 
 # TODO add text facilities to StyledItem
 
@@ -62,6 +64,12 @@ class LineItem(StyledItem):
 	def set_end(self, x, y):
 		self.end_ = (x, y)
 		self._update_geometry()
+
+	def set_points(self, sx, sy, ex, ey):
+		'''Set both start and end, updating the geometry once'''
+		self.start_ = (sx, sy)
+		self.end_ = (ex, ey)
+		self._update_geometry()
 	
 	def set_line_width(self, lw):
 		self.lw_ = lw
@@ -76,7 +84,15 @@ class LineItem(StyledItem):
 		self.update()
 	
 	def _update_geometry(self):
-		'''Update item geometry using start and end points'''
+		'''Update item geometry using start and end points.
+		With frame dispatch, this happens once per frame'''
+		disp = frame_dispatcher()
+		if disp is None:
+			self._apply_geometry()
+		else:
+			disp.defer(self, 'geometry', self._apply_geometry)
+
+	def _apply_geometry(self):
 		# Get start and end points
 		sx, sy = self.start_
 		ex, ey = self.end_
@@ -125,12 +141,206 @@ class LineItem(StyledItem):
 			x2 -= cos(ang) * offs
 			y2 -= sin(ang) * offs
 
-		painter.drawLine(x, y, x2, y2)
+		painter.drawLine(QLineF(x, y, x2, y2))
 
 		if self._start_mark:
-			painter.fillRect(x - 5, y - 5, 10, 10, self.get_border_color())
+			painter.fillRect(QRectF(x - 5, y - 5, 10, 10), self.get_border_color())
 		if self._end_mark:
-			painter.fillRect(x2 - 5, y2 - 5, 10, 10, self.get_border_color())
+			painter.fillRect(QRectF(x2 - 5, y2 - 5, 10, 10), self.get_border_color())
+
+		if self.get_text() is not None:
+			painter.drawText(QPointF((x + x2) * 0.5, (y + y2) * 0.5), self.get_text())
+
+
+# Callbacks used by EdgeLayer, shared by all the layers
+def _layer_item_moved(layer, item, new, old):
+	layer._item_moved(item)
+
+def _layer_item_removed(layer, item):
+	layer.remove_item_edges(item)
+
+class EdgeLayer(Item):
+	'''Draws many lines, each one joining the centers of two items, in a
+	single item (one texture and one paint call for all of them, instead
+	of a LineItem each).
+	Each edge has its own color, width and end markers. When an item
+	moves, only the lines touching it are updated, and only the region
+	they cover is repainted.
+	The layer covers its parent, so items must share the parent of the
+	layer for coordinates to match. Edges are identified by the index
+	returned by add_edge'''
+
+	def __init__(self, parent=None):
+		super().__init__(parent)
+		self.setZ(-1) # Under the items
+		# Clicks go to what is under the layer
+		self.setAcceptedMouseButtons(Qt.NoButton)
+		self._movable = False
+
+		# Per edge data, None when the slot is free
+		self._lines = [] # QLineF
+		self._ends = [] # (item_1, item_2)
+		self._styles = [] # (QColor, width)
+		self._marks = {} # Index: (start marker, end marker), only for marked edges
+		self._free = [] # Free slots
+		self._count = 0
+
+		self._by_item = {} # Item: set of edge indices
+		self._subs = {} # Item: subscriptions of the layer on that item
+		self._groups = None # Lines grouped by style, None when to be rebuilt
+
+		if parent is not None:
+			parent.widthChanged.connect(self._follow_parent)
+			parent.heightChanged.connect(self._follow_parent)
+			self._follow_parent()
+
+	def _follow_parent(self):
+		p = self.parentItem()
+		if p is not None:
+			self.set_size(p.width(), p.height())
+
+	def __len__(self):
+		return self._count
+
+	def add_edge(self, item_1, item_2, color=(0, 0, 0), width=2):
+		'''Add a line between the centers of item_1 and item_2,
+		returns the index of the edge'''
+		if hasattr(color, '__iter__'):
+			color = make_rgba(*color)
+		line = QLineF(QPointF(*_center(item_1.get_pos(), item_1.get_size())), QPointF(*_center(item_2.get_pos(), item_2.get_size())))
+		if self._free:
+			i = self._free.pop()
+			self._lines[i] = line
+			self._ends[i] = (item_1, item_2)
+			self._styles[i] = (color, width)
+		else:
+			i = len(self._lines)
+			self._lines.append(line)
+			self._ends.append((item_1, item_2))
+			self._styles.append((color, width))
+		self._count += 1
+		for it in (item_1, item_2):
+			self._watch(it).add(i)
+		self._groups = None
+		self.update(self._line_rect(i))
+		return i
+
+	def remove_edge(self, i):
+		'''Remove the edge with index i'''
+		rect = self._line_rect(i)
+		for it in set(self._ends[i]):
+			edges = self._by_item[it]
+			edges.discard(i)
+			if not edges:
+				self._unwatch(it)
+		self._lines[i] = None
+		self._ends[i] = None
+		self._styles[i] = None
+		self._marks.pop(i, None)
+		self._free.append(i)
+		self._count -= 1
+		self._groups = None
+		self.update(rect)
+
+	def remove_item_edges(self, item):
+		'''Remove every edge touching item'''
+		for i in list(self._by_item.get(item, ())):
+			self.remove_edge(i)
+
+	def edges_of(self, item):
+		'''Returns the set of indices of the edges touching item'''
+		return set(self._by_item.get(item, ()))
+
+	def set_edge_color(self, i, color):
+		if hasattr(color, '__iter__'):
+			color = make_rgba(*color)
+		if self._styles[i][0] != color:
+			self._styles[i] = (color, self._styles[i][1])
+			self._groups = None
+			self.update(self._line_rect(i))
+
+	def get_edge_color(self, i):
+		return self._styles[i][0]
+
+	def set_edge_width(self, i, width):
+		rect = self._line_rect(i)
+		self._styles[i] = (self._styles[i][0], width)
+		self._groups = None
+		self.update(rect.united(self._line_rect(i)))
+
+	def get_edge_width(self, i):
+		return self._styles[i][1]
+
+	def set_edge_markers(self, i, start, end):
+		'''Enable or disable the square markers at the ends of the edge'''
+		if start or end:
+			self._marks[i] = (start, end)
+		else:
+			self._marks.pop(i, None)
+		self.update(self._line_rect(i))
+
+	def _watch(self, item):
+		'''Returns the edges of the item, subscribing to it if new'''
+		edges = self._by_item.get(item)
+		if edges is None:
+			edges = self._by_item[item] = set()
+			self._subs[item] = [
+				item.register('on_pos_changed', self, _layer_item_moved),
+				item.register('on_size_changed', self, _layer_item_moved),
+				item.register('on_remove', self, _layer_item_removed),
+			]
+		return edges
+
+	def _unwatch(self, item):
+		del self._by_item[item]
+		for sub in self._subs.pop(item):
+			sub.cancel()
 
-		painter.drawText((x + x2) * 0.5, (y + y2) * 0.5, self.get_text())
+	def _line_rect(self, i):
+		'''Rectangle covered by the line i, including width and markers'''
+		line = self._lines[i]
+		m = max(self._styles[i][1], 5) + 1
+		r = QRectF(line.p1(), line.p2()).normalized()
+		return r.adjusted(-m, -m, m, m).toAlignedRect()
 
+	def _item_moved(self, item):
+		'''Move the ends of the lines touching item'''
+		c = QPointF(*_center(item.get_pos(), item.get_size()))
+		dirty = QRect()
+		for i in self._by_item.get(item, ()):
+			dirty = dirty.united(self._line_rect(i))
+			line = self._lines[i]
+			a, b = self._ends[i]
+			if a is item:
+				line.setP1(c)
+			if b is item:
+				line.setP2(c)
+			dirty = dirty.united(self._line_rect(i))
+		if not dirty.isNull():
+			self.update(dirty)
+
+	def paint(self, painter):
+		'''
+		:type painter: QPainter
+		'''
+		painter.setRenderHint(QPainter.Antialiasing, True)
+		if self._groups is None:
+			# Lines sharing the style are drawn together. Lists contain
+			# the same QLineF that are moved, so they are valid until
+			# edges are added, removed or restyled
+			groups = {}
+			for line, style in zip(self._lines, self._styles):
+				if line is not None:
+					groups.setdefault((style[0].rgba(), style[1]), (style, []))[1].append(line)
+			self._groups = list(groups.values())
+		for (color, width), lines in self._groups:
+			pen = QPen(color)
+			pen.setWidthF(width)
+			painter.setPen(pen)
+			painter.drawLines(lines)
+		for i, (start, end) in self._marks.items():
+			line, color = self._lines[i], self._styles[i][0]
+			if start:
+				painter.fillRect(QRectF(line.x1() - 5, line.y1() - 5, 10, 10), color)
+			if end:
+				painter.fillRect(QRectF(line.x2() - 5, line.y2() - 5, 10, 10), color)
@@ -0,0 +1,161 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Force-directed layout working on plain index arrays, so that it can run
+without any item (e.g. headless, for a fixed number of iterations).
+Graph.layout_force uses it to place the nodes of a Graph.
+
+This module requires NumPy.'''
+
+import numpy as np
+
+def _square_distances(p, q):
+	'''Returns the (len(p), len(q)) matrix of square distances'''
+	dx = p[:, 0, None] - q[None, :, 0]
+	dy = p[:, 1, None] - q[None, :, 1]
+	return dx * dx + dy * dy
+
+class ForceLayout:
+	'''Fruchterman-Reingold layout. Node positions are kept in a (n, 2) array.
+
+	Attraction is computed exactly on the edges. Repulsion is exact only
+	between nodes sharing a cell of a uniform grid: every other cell acts
+	as a single mass placed in its centroid. With about sqrt(n) cells, an
+	iteration costs O(n * sqrt(n)) vectorized operations instead of n^2
+	Python-level pairs.
+
+	Example:
+		lay = ForceLayout(3, [(0, 1), (1, 2)], 400, 300, seed=1)
+		pos = lay.run(100) # (3, 2) array of centers
+	'''
+
+	def __init__(self, n_nodes, edges, width, height, positions=None, seed=None, cells=None, cooling=0.95):
+		'''edges is an iterable of (i, j) node indices.
+		positions is an optional (n, 2) array of initial centers, which
+		are randomized inside the width x height area if missing.
+		cells is the number of grid cells per side, computed if missing'''
+		self._n = n_nodes
+		self._w = float(width)
+		self._h = float(height)
+		self._edges = np.asarray(list(edges), dtype=np.intp).reshape(-1, 2)
+		self._rnd = np.random.default_rng(seed)
+		if positions is None:
+			self._pos = self._rnd.random((n_nodes, 2)) * (self._w, self._h)
+		else:
+			self._pos = np.array(positions, dtype=float).reshape(n_nodes, 2)
+		# Optimal distance between nodes
+		self._k = (self._w * self._h / max(n_nodes, 1)) ** 0.5
+		# sqrt(n) cells in total
+		self._cells = cells or max(1, int(round(n_nodes ** 0.25)))
+		self._temp = max(self._w, self._h) / 10
+		self._cooling = cooling
+		self.iterations = 0
+
+	def positions(self):
+		'''Returns the (n, 2) array with the node centers'''
+		return self._pos
+
+	def run(self, iterations):
+		'''Runs a fixed number of iterations and returns the positions'''
+		for _ in range(iterations):
+			self.step()
+		return self._pos
+
+	def step(self):
+		'''Runs a single iteration'''
+		if self._n == 0:
+			return
+		disp = self._repulsion()
+		self._attraction(disp)
+
+		# Move along the displacement, but not farther than the temperature
+		length = np.hypot(disp[:, 0], disp[:, 1])
+		length[length == 0] = 1
+		scale = np.minimum(length, self._temp) / length
+		self._pos += disp * scale[:, None]
+		np.clip(self._pos[:, 0], 0, self._w, out=self._pos[:, 0])
+		np.clip(self._pos[:, 1], 0, self._h, out=self._pos[:, 1])
+
+		self._temp *= self._cooling
+		self.iterations += 1
+
+	def _attraction(self, disp):
+		'''Adds to disp the attraction along the edges'''
+		if not len(self._edges):
+			return
+		src, dst = self._edges[:, 0], self._edges[:, 1]
+		delta = self._pos[src] - self._pos[dst]
+		dist = np.hypot(delta[:, 0], delta[:, 1])
+		# Force is d^2 / k along the edge
+		force = delta * (dist / self._k)[:, None]
+		for axis in (0, 1):
+			disp[:, axis] -= np.bincount(src, force[:, axis], self._n)
+			disp[:, axis] += np.bincount(dst, force[:, axis], self._n)
+
+	def _repulsion(self):
+		'''Returns the displacement caused by the repulsion between nodes'''
+		pos, n, g = self._pos, self._n, self._cells
+		k2 = self._k ** 2
+		disp = np.zeros_like(pos)
+
+		# Assign each node to a grid cell
+		lo = pos.min(axis=0)
+		span = np.maximum(pos.max(axis=0) - lo, 1e-9)
+		cxy = np.minimum((g * (pos - lo) / span).astype(np.intp), g - 1)
+		cell = cxy[:, 0] * g + cxy[:, 1]
+
+		# Mass and centroid of the non-empty cells
+		mass = np.bincount(cell, minlength=g * g).astype(float)
+		full = np.nonzero(mass)[0]
+		cmass = mass[full]
+		cent = np.empty((len(full), 2))
+		cent[:, 0] = np.bincount(cell, pos[:, 0], g * g)[full] / cmass
+		cent[:, 1] = np.bincount(cell, pos[:, 1], g * g)[full] / cmass
+
+		# Repulsion from masses m_j in c_j is sum_j k^2 m_j (p - c_j) / |p - c_j|^2
+		# which is computed as p * sum_j w_j - sum_j w_j c_j, using matrix products
+
+		# Far field: every other cell, as a point mass (in chunks, to bound memory)
+		# Distances are expanded in matrix products: these are large, so precision is not an issue
+		cent2 = (cent ** 2).sum(axis=1)
+		chunk = max(1, 2 ** 22 // max(len(full), 1))
+		for a in range(0, n, chunk):
+			b = min(a + chunk, n)
+			p = pos[a:b]
+			d2 = (p ** 2).sum(axis=1)[:, None] + cent2[None, :] - 2 * p @ cent.T
+			w = k2 * cmass[None, :] / np.maximum(d2, 1e-9)
+			# Own cell is handled exactly below
+			w[cell[a:b, None] == full[None, :]] = 0
+			disp[a:b] += p * w.sum(axis=1)[:, None] - w @ cent
+
+		# Near field: exact repulsion between nodes of the same cell
+		order = np.argsort(cell, kind='stable')
+		bounds = np.searchsorted(cell[order], full)
+		for s, e in zip(bounds, list(bounds[1:]) + [n]):
+			if e - s < 2:
+				continue
+			idx = order[s:e]
+			p = pos[idx]
+			d2 = _square_distances(p, p)
+			np.fill_diagonal(d2, np.inf)
+			# Coincident nodes get pushed apart by the jitter
+			if (d2 <= 1e-9).any():
+				pos[idx] += self._rnd.random((len(idx), 2)) - 0.5
+				continue
+			w = k2 / d2
+			disp[idx] += p * w.sum(axis=1)[:, None] - w @ p
+		return disp
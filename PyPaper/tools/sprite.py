@@ -1,15 +1,26 @@
-from PyPaper.core.styleditem import StyledItem
-from PyPaper.core.animation import par_anim_cm, TimeAnim
+from PyPaper.core.styleditem import Item, StyledItem
+from PyPaper.core.animation import par_anim_cm, TimeAnim, start_animation
+from PyPaper.core.imagecache import image_cache
+from PyPaper.core.easing import easing_curve
+from PyQt5.QtCore import Qt, QRectF, QAbstractAnimation
+from PyQt5.QtGui import QPainter, QPixmap
+from PyQt5 import sip
 from functools import partial
+from array import array
+from bisect import bisect_right
+import math
 import warnings
 
-# FIXME a protocol should be defined to allow the creation of other decorators
-# * sequence create a time based sequence
-# * frameseq create a frame based sequence
-# * user may want to create other sequence decorators
-# Most of the information about the definition of the sequence should be in the
-# sequence decorator, while sequenced should use a protocol to get that information
-# and place it in the right place
+# Easing curves of a SpriteLayer are forgotten, when no movement uses
+# them, once there are more than these
+_MAX_CURVES = 64
+
+# Sequence decorators (sequence, frameseq) store on the decorated method
+# a (name, paint function, params) tuple; params['build'](name, params)
+# returns the <name>_to method, which sequenced adds to the class.
+# Classes can build the methods in their own way, with a
+# _sequence_builders dict mapping params['kind'] to a build function.
+# Other decorators can follow the same protocol.
 
 def sequenced(cls):
 	'''This decorator prepares a Sprite subclass to store sequence methods'''
@@ -20,38 +31,42 @@ def sequenced(cls):
 		if not hasattr(method, '__seq'):
 			continue
 
-		def _scope_definition(name, paint_func, params):
-			# Save the sequence painting function
-			cls._sequences[name] = paint_func
-
-			def _seq(self, *args, **kwargs):
-				'''Perform the animation of the frame and the action'''
-				# TODO Merge kwargs
-
-				def _durat_func():
-					'''Determine the duration of the animation, using speed'''
-					dist = params['dist_func'](self, *args)
-					# TODO check if this computation is necessary or if we can in
-					# some way recycle what is done in animation.PropertyAnimation
-					# (but I think it is not possible, or not easily)
-					duration = dist * 1000 / params['speed']
-#					print('Duration for sequence', duration, 'distance was', dist, 'speed', params['speed'])
-					return duration
-
-				with par_anim_cm(self) as grp:
-					ta = TimeAnim(_durat_func, partial(self._set_current_frame, name, params['speed']), easing=params['easing'])
-#					print('action is', params['action'], 'on args', args)
-					params['action'](self, *args, easing=params['easing'], speed=params['speed'])
-					grp.addAnimation(ta)
-
-			_seq.__name__ = name + '_to'
-			_seq.__qualname__ = '.'.join(_seq.__qualname__.split('.')[:-1] + [_seq.__name__])
-			setattr(cls, name + '_to', _seq)
-
 		# Found a sequence method, get the parameters
-		_scope_definition(*getattr(method, '__seq'))
+		name, paint_func, params = getattr(method, '__seq')
+		# Save the sequence painting function
+		cls._sequences[name] = paint_func
+
+		build = getattr(cls, '_sequence_builders', {}).get(params['kind'], params['build'])
+		_seq = build(name, params)
+		_seq.__name__ = name + '_to'
+		_seq.__qualname__ = '.'.join(_seq.__qualname__.split('.')[:-1] + [_seq.__name__])
+		setattr(cls, name + '_to', _seq)
 	return cls
 
+def _time_sequence(name, params):
+	'''Builds the method of a sequence'''
+	def _seq(self, *args, **kwargs):
+		'''Perform the animation of the frame and the action'''
+		# TODO Merge kwargs
+
+		def _durat_func():
+			'''Determine the duration of the animation, using speed'''
+			dist = params['dist_func'](self, *args)
+			# TODO check if this computation is necessary or if we can in
+			# some way recycle what is done in animation.PropertyAnimation
+			# (but I think it is not possible, or not easily)
+			duration = dist * 1000 / params['speed']
+#			print('Duration for sequence', duration, 'distance was', dist, 'speed', params['speed'])
+			return duration
+
+		with par_anim_cm(self) as grp:
+			ta = TimeAnim(_durat_func, partial(self._set_current_frame, name, params['speed']), easing=params['easing'])
+#			print('action is', params['action'], 'on args', args)
+			params['action'](self, *args, easing=params['easing'], speed=params['speed'])
+			grp.addAnimation(ta)
+		return grp
+	return _seq
+
 def sequence(name, speed=None, distance_func=None, duration=None, action=None, easing='InOutQuad'):
 	'''Decorate a method in a sequenced class, creating a new method <name>_to.
 	The method will execute a sprite animation of specified speed or duration, executing in parallel
@@ -88,11 +103,154 @@ def sequence(name, speed=None, distance_func=None, duration=None, action=None, e
 				'action': action,
 				'easing': easing,
 				'offset': False,
+				'kind': 'time',
+				'build': _time_sequence,
+				}
+		setattr(func, '__seq', (name, func, params))
+		return func
+	return _decorator
+
+class _FrameSchedule:
+	'''Frames of one run of a frameseq, and the times they start'''
+
+	def __init__(self, frames, fps, duration, loop):
+		step = 1000 / fps
+		slots = max(1, math.ceil(duration / step))
+		self._times = [k * step for k in range(1, slots)]
+		if loop:
+			self._frames = [k % frames for k in range(slots)]
+		else:
+			self._frames = [min(k, frames - 1) for k in range(slots)]
+
+	def frame_at(self, time):
+		return self._frames[bisect_right(self._times, time)]
+
+def _frame_sequence(name, params):
+	'''Builds the method of a frameseq'''
+	frames, fps = params['frames'], params['fps']
+	cycle = frames * 1000 / fps
+
+	def _seq(self, *args, **kwargs):
+		'''Perform the animation of the frames and the action'''
+		schedule = [None]
+
+		def _durat_func():
+			if params['duration'] is not None:
+				duration = params['duration']
+			elif params['speed'] is not None and params['dist_func'] is not None:
+				duration = params['dist_func'](self, *args) * 1000 / params['speed']
+			else:
+				duration = cycle
+			schedule[0] = _FrameSchedule(frames, fps, duration, params['loop'])
+			return duration
+
+		def _tick(time, duration):
+			self._set_sequence_frame(name, schedule[0].frame_at(time))
+
+		with par_anim_cm(self) as grp:
+			# Frames advance at constant rate
+			ta = TimeAnim(_durat_func, _tick, easing='Linear')
+			action = params['action']
+			if action is not None:
+				if params['speed'] is not None:
+					action(self, *args, easing=params['easing'], speed=params['speed'])
+				else:
+					duration = params['duration'] if params['duration'] is not None else cycle
+					action(self, *args, easing=params['easing'], duration=int(round(duration)))
+			grp.addAnimation(ta)
+		return grp
+	return _seq
+
+def frameseq(name, frames, fps, action=None, distance_func=None, speed=None, duration=None, easing='InOutQuad', loop=True):
+	'''Decorate a method in a sequenced class, creating a new method <name>_to,
+	like sequence, but the animation is made of frames: the decorated method
+	is called as method(self, painter, frame), with frame in range(frames),
+	and frames advance fps times per second. The sprite is repainted only
+	when the frame changes.
+	The duration is, in order: duration if not None; computed at the start
+	from distance_func and speed, if both are given; one cycle of frames.
+	The action, if not None, runs in parallel with the given speed or the
+	same duration.
+	If loop is False, the last frame is kept until the end'''
+	if frames < 1 or fps <= 0:
+		raise RuntimeError('Frame sequence "{}" needs at least one frame and a positive fps'.format(name))
+	if speed is not None and distance_func is None:
+		raise RuntimeError('Frame sequence "{}" has speed but no distance_func'.format(name))
+
+	def _decorator(func):
+		params = {
+				'frames': frames,
+				'fps': fps,
+				'speed': speed,
+				'duration': duration,
+				'dist_func': distance_func,
+				'action': action,
+				'easing': easing,
+				'loop': loop,
+				'kind': 'frame',
+				'build': _frame_sequence,
 				}
 		setattr(func, '__seq', (name, func, params))
 		return func
 	return _decorator
 
+class SpriteSheet:
+	'''An image containing many frames, each one a rectangle of the image.
+	The image is loaded once, on first use, and frames are drawn through
+	their source rectangle without copying them, so a sheet can be shared
+	by all the sprites of a class, e.g. as a class attribute:
+
+	class Bomb(Sprite):
+		sheet = SpriteSheet.from_grid('bomb.png', 48, 48)
+
+	Frames are rects as (x, y, w, h) tuples or QRectF'''
+
+	def __init__(self, path, rects):
+		self._path = path
+		self._rects = [QRectF(r) if isinstance(r, QRectF) else QRectF(*r) for r in rects]
+		self._image = None
+
+	@classmethod
+	def from_grid(cls, path, frame_w, frame_h, columns=None, rows=None, count=None, spacing=0, margin=0):
+		'''Frames of frame_w x frame_h, left to right and top to bottom.
+		If columns or rows are None, they are as many as fit the image.
+		count limits the number of frames, spacing is the space between
+		frames and margin the space around them'''
+		if columns is None or rows is None:
+			img = image_cache().load(path)
+			if img is None:
+				raise RuntimeError('Cannot load sprite sheet "{}"'.format(path))
+			if columns is None:
+				columns = (img.width() - 2 * margin + spacing) // (frame_w + spacing)
+			if rows is None:
+				rows = (img.height() - 2 * margin + spacing) // (frame_h + spacing)
+		rects = [(margin + c * (frame_w + spacing), margin + r * (frame_h + spacing), frame_w, frame_h)
+			for r in range(rows) for c in range(columns)]
+		if count is not None:
+			rects = rects[:count]
+		return cls(path, rects)
+
+	def __len__(self):
+		return len(self._rects)
+
+	def __getitem__(self, i):
+		'''Returns the rectangle of frame i'''
+		return self._rects[i]
+
+	def get_image(self):
+		if self._image is None:
+			self._image = image_cache().load(self._path)
+			if self._image is None:
+				raise RuntimeError('Cannot load sprite sheet "{}"'.format(self._path))
+		return self._image
+
+	def draw(self, painter, i, target):
+		'''Draw frame i (modulo the number of frames) in the target
+		rectangle, a QRectF or a (x, y, w, h) tuple'''
+		if not isinstance(target, QRectF):
+			target = QRectF(*target)
+		painter.drawImage(target, self.get_image(), self._rects[i % len(self._rects)])
+
 class Sprite(StyledItem):
 	'''Sprite is a general purpose class for items that have
 	frame-by-frame animation behavior.
@@ -118,21 +276,450 @@ class Sprite(StyledItem):
 	of the specified action (3, in this case: self, x, y) and computes a
 	distance between the current state (e.g. self.get_pos()) and the the input
 	state (e.g. x, y). Must return a float
+
+	Sequences made of a few frames (e.g. from a SpriteSheet) are better
+	defined with frameseq, which repaints only when the frame changes:
+
+		@frameseq('blink', frames=3, fps=10)
+		def _blink_paint(self, painter, frame):
+			self.sheet.draw(painter, frame, (0, 0, 48, 48))
 	'''
 
 	def __init__(self, parent, paint_fallback=True):
 		super().__init__(parent)
-		self._frame = (None, None, None, None)
+		self._frame = (None, ()) # Current sequence and arguments of its paint
 		self._fallback = paint_fallback
 	
 	def paint(self, painter):
-		sname, speed, time, dur = self._frame
+		sname, args = self._frame
 		if sname in type(self)._sequences:
-			type(self)._sequences[sname](self, painter, speed, time, dur)
+			type(self)._sequences[sname](self, painter, *args)
 		elif self._fallback:
 			super().paint(painter)
 
 	def _set_current_frame(self, sequence, speed, time, duration):
-		self._frame = (sequence, speed, time, duration)
+		self._frame = (sequence, (speed, time, duration))
 		self.update()
 
+	def _set_sequence_frame(self, sequence, frame):
+		'''Show a frame of a frameseq, repainting only if it changed'''
+		current = (sequence, (frame,))
+		if self._frame != current:
+			self._frame = current
+			self.update()
+
+
+def _frame_duration(self, params, args):
+	'''Duration of a frameseq started on self with args'''
+	if params['duration'] is not None:
+		return params['duration']
+	if params['speed'] is not None and params['dist_func'] is not None:
+		return params['dist_func'](self, *args) * 1000 / params['speed']
+	return params['frames'] * 1000 / params['fps']
+
+def _layer_time_sequence(name, params):
+	'''Builds the method of a sequence for a LayerSprite'''
+	def _seq(self, *args, on_finished=None, **kwargs):
+		duration = params['dist_func'](self, *args) * 1000 / params['speed']
+		if params['action'] is not None:
+			params['action'](self, *args, easing=params['easing'], speed=params['speed'])
+		self._layer._start_sequence(self, name, params, duration, on_finished)
+	return _seq
+
+def _layer_frame_sequence(name, params):
+	'''Builds the method of a frameseq for a LayerSprite'''
+	def _seq(self, *args, on_finished=None, **kwargs):
+		duration = _frame_duration(self, params, args)
+		if params['action'] is not None:
+			if params['speed'] is not None:
+				params['action'](self, *args, easing=params['easing'], speed=params['speed'])
+			else:
+				params['action'](self, *args, easing=params['easing'], duration=duration)
+		self._layer._start_sequence(self, name, params, duration, on_finished)
+	return _seq
+
+class LayerSprite:
+	'''A sprite drawn by a SpriteLayer, created with SpriteLayer.add_sprite.
+	Subclasses define sequences with @sequenced, @sequence and @frameseq
+	as for Sprite, but the decorated methods return the index of the
+	sheet frame to show instead of painting:
+
+	@sequenced
+	class Walker(LayerSprite):
+		@frameseq('walk', frames=4, fps=8, speed=50, action=LayerSprite.move_to, distance_func=df)
+		def _walk(self, frame):
+			return 4 + frame
+
+	w = layer.add_sprite(Walker, 10, 10)
+	w.walk_to(200, 10)
+
+	Sequence methods start at once, replacing the running sequence, and
+	accept an on_finished callback'''
+
+	_sequences = {}
+	_sequence_builders = {'time': _layer_time_sequence, 'frame': _layer_frame_sequence}
+
+	def __init__(self, layer, index):
+		self._layer = layer
+		self._index = index
+
+	def get_layer(self):
+		return self._layer
+
+	def set_pos(self, x, y):
+		self._layer._set_pos(self._index, x, y)
+
+	def get_pos(self):
+		return self._layer._get_pos(self._index)
+
+	def set_size(self, w, h):
+		self._layer._set_size(self._index, w, h)
+
+	def get_size(self):
+		i = self._index
+		return (self._layer._w[i], self._layer._h[i])
+
+	def set_frame(self, frame):
+		'''Show the frame of the sheet with index frame'''
+		self._layer._set_frame(self._index, frame)
+
+	def get_frame(self):
+		return self._layer._frame[self._index]
+
+	def move_to(self, x, y, offset=False, speed=None, duration=500, easing='InOutQuad', on_finished=None):
+		'''Move toward (x, y) in duration milliseconds, or at speed pixels per second'''
+		self._layer._start_move(self, x, y, offset, speed, duration, easing, on_finished)
+
+	def stop(self):
+		'''Stop sequence and movement, without calling on_finished'''
+		self._layer._stop(self._index)
+
+	def remove(self):
+		self._layer.remove_sprite(self)
+
+class _LayerDriver(QAbstractAnimation):
+	'''Runs while some sprite of the layer is animated'''
+
+	def __init__(self, layer):
+		super().__init__(layer)
+		self._layer = layer
+
+	def duration(self):
+		return -1
+
+	def updateCurrentTime(self, t):
+		self._layer._tick(t)
+
+class SpriteLayer(Item):
+	'''Draws many sprites from one SpriteSheet in a single item, with a
+	single paint call. Sprites are LayerSprite handles, while their state
+	is kept by the layer in arrays: position, size and frame are stored
+	in the array of fragments given to QPainter.drawPixmapFragments.
+	One animation drives all the sequences and movements of the sprites.
+	The layer covers its parent: sprite coordinates are relative to it.
+	Sprites are drawn in order of creation, until one is removed: the last
+	sprite takes the place of the removed one'''
+
+	def __init__(self, sheet, parent=None):
+		super().__init__(parent)
+		self.setAcceptedMouseButtons(Qt.NoButton)
+		self._movable = False
+		self._sheet = sheet
+		self._pixmap = None
+
+		# Sprites, drawn from the first to the last
+		self._frags = sip.array(QPainter.PixmapFragment, 16)
+		self._handles = []
+		self._w = array('d')
+		self._h = array('d')
+		self._frame = array('i') # Index of the frame in the sheet
+		# Sequences: index in _seq_defs, or -1 when not running
+		self._seq = array('i')
+		self._seq_t0 = array('d')
+		self._seq_dur = array('d')
+		self._seq_slot = array('i') # Last frame of a frameseq
+		# Movements: duration is -1 when not moving
+		self._mv_t0 = array('d')
+		self._mv_dur = array('d')
+		self._mv_from = array('d') # x, y pairs
+		self._mv_to = array('d')
+		self._mv_ease = array('i') # Index in _curves
+		self._arrays = [self._w, self._h, self._frame, self._seq, self._seq_t0,
+			self._seq_dur, self._seq_slot, self._mv_t0, self._mv_dur, self._mv_ease]
+		self._pairs = [self._mv_from, self._mv_to]
+
+		self._seq_defs = [] # (kind, paint function, params)
+		self._seq_ids = {} # (class, name): index in _seq_defs
+		self._curves = [] # QEasingCurve, None when free
+		self._curve_ids = {} # id(curve): (curve, index in _curves)
+		self._curve_free = []
+		self._finished = {} # (handle, 'seq' or 'move'): on_finished callback
+		self._active = set() # Indices of animated sprites
+
+		self._driver = _LayerDriver(self)
+		self._starting = False
+		self._ticking = False # While ticking, the whole layer is updated once
+		self._changed = False
+
+		if parent is not None:
+			parent.widthChanged.connect(self._follow_parent)
+			parent.heightChanged.connect(self._follow_parent)
+			self._follow_parent()
+
+	def _follow_parent(self):
+		p = self.parentItem()
+		if p is not None:
+			self.set_size(p.width(), p.height())
+
+	def __len__(self):
+		return len(self._handles)
+
+	def sprites(self):
+		return list(self._handles)
+
+	def add_sprite(self, cls=LayerSprite, x=0, y=0, w=None, h=None, frame=0):
+		'''Add a sprite of class cls (a LayerSprite), showing the given
+		frame of the sheet. Size defaults to the size of the frame'''
+		i = len(self._handles)
+		if i == len(self._frags):
+			self._grow()
+		src = self._sheet[frame % len(self._sheet)]
+		w = src.width() if w is None else w
+		h = src.height() if h is None else h
+		handle = cls(self, i)
+		self._handles.append(handle)
+		for arr, v in zip(self._arrays, (w, h, frame, -1, 0, 0, -1, 0, -1, 0)):
+			arr.append(v)
+		for arr in self._pairs:
+			arr.extend((0, 0))
+		f = self._frags[i]
+		f.x, f.y = x + w / 2, y + h / 2
+		f.rotation, f.opacity = 0, 1
+		self._set_frame(i, frame)
+		return handle
+
+	def remove_sprite(self, handle):
+		i, last = handle._index, len(self._handles) - 1
+		self.update(self._sprite_rect(i))
+		self._active.discard(i)
+		self._finished.pop((handle, 'seq'), None)
+		self._finished.pop((handle, 'move'), None)
+		if i != last:
+			# The last sprite takes the place of the removed one
+			moved = self._handles[last]
+			self._handles[i] = moved
+			moved._index = i
+			self._frags[i] = self._frags[last]
+			for arr in self._arrays:
+				arr[i] = arr[last]
+			for arr in self._pairs:
+				arr[2 * i:2 * i + 2] = arr[2 * last:2 * last + 2]
+			if last in self._active:
+				self._active.discard(last)
+				self._active.add(i)
+		self._handles.pop()
+		for arr in self._arrays:
+			arr.pop()
+		for arr in self._pairs:
+			del arr[-2:]
+		handle._layer = None
+
+	def _grow(self):
+		frags = sip.array(QPainter.PixmapFragment, 2 * len(self._frags))
+		for i in range(len(self._handles)):
+			frags[i] = self._frags[i]
+		self._frags = frags
+
+	def _sprite_rect(self, i):
+		f, w, h = self._frags[i], self._w[i], self._h[i]
+		return QRectF(f.x - w / 2 - 1, f.y - h / 2 - 1, w + 2, h + 2).toAlignedRect()
+
+	def _dirty(self, i):
+		'''Repaint the area of sprite i'''
+		if self._ticking:
+			self._changed = True
+		else:
+			self.update(self._sprite_rect(i))
+
+	def _set_pos(self, i, x, y):
+		f = self._frags[i]
+		self._dirty(i)
+		f.x, f.y = x + self._w[i] / 2, y + self._h[i] / 2
+		self._dirty(i)
+
+	def _get_pos(self, i):
+		f = self._frags[i]
+		return (f.x - self._w[i] / 2, f.y - self._h[i] / 2)
+
+	def _set_size(self, i, w, h):
+		x, y = self._get_pos(i)
+		self._dirty(i)
+		self._w[i], self._h[i] = w, h
+		self._set_pos(i, x, y)
+		self._set_frame(i, self._frame[i])
+
+	def _set_frame(self, i, frame):
+		'''Show the frame of the sheet, updating the source rectangle'''
+		src = self._sheet[frame % len(self._sheet)]
+		f = self._frags[i]
+		self._frame[i] = frame
+		f.sourceLeft, f.sourceTop = src.x(), src.y()
+		f.width, f.height = src.width(), src.height()
+		f.scaleX, f.scaleY = self._w[i] / src.width(), self._h[i] / src.height()
+		self._dirty(i)
+
+	def _now(self):
+		'''Time of the driver, starting it if needed'''
+		# Paused when driven by a virtual clock
+		if self._driver.state() == QAbstractAnimation.Stopped:
+			self._starting = True
+			start_animation(self._driver)
+			self._starting = False
+		return self._driver.currentTime()
+
+	def _curve(self, easing):
+		# Specs may be unhashable (e.g. a QEasingCurve): the curve is the key
+		curve = easing_curve(easing)
+		hit = self._curve_ids.get(id(curve))
+		if hit is not None:
+			return hit[1]
+		if not self._curve_free and len(self._curves) >= _MAX_CURVES:
+			self._reclaim_curves()
+		if self._curve_free:
+			c = self._curve_free.pop()
+			self._curves[c] = curve
+		else:
+			c = len(self._curves)
+			self._curves.append(curve)
+		self._curve_ids[id(curve)] = (curve, c)
+		return c
+
+	def _reclaim_curves(self):
+		'''Forget the curves no movement is using'''
+		used = set(e for e, d in zip(self._mv_ease, self._mv_dur) if d >= 0)
+		for key, (curve, c) in list(self._curve_ids.items()):
+			if c not in used:
+				del self._curve_ids[key]
+				self._curves[c] = None
+				self._curve_free.append(c)
+
+	def _start_sequence(self, handle, name, params, duration, on_finished):
+		key = (type(handle), name)
+		s = self._seq_ids.get(key)
+		if s is None:
+			s = self._seq_ids[key] = len(self._seq_defs)
+			self._seq_defs.append((params['kind'], type(handle)._sequences[name], params))
+		i = handle._index
+		self._seq[i] = s
+		self._seq_t0[i] = self._now()
+		self._seq_dur[i] = duration
+		self._seq_slot[i] = -1
+		self._finished.pop((handle, 'seq'), None)
+		if on_finished is not None:
+			self._finished[(handle, 'seq')] = on_finished
+		self._active.add(i)
+		# Show the first frame now
+		finished = []
+		self._advance(i, self._seq_t0[i], finished)
+		for key in finished:
+			cb = self._finished.pop(key, None)
+			if cb is not None:
+				cb()
+
+	def _start_move(self, handle, x, y, offset, speed, duration, easing, on_finished):
+		i = handle._index
+		x0, y0 = self._get_pos(i)
+		if offset:
+			x, y = x + x0, y + y0
+		if speed is not None:
+			duration = ((x - x0) ** 2 + (y - y0) ** 2) ** 0.5 * 1000 / speed
+		self._mv_from[2 * i:2 * i + 2] = array('d', (x0, y0))
+		self._mv_to[2 * i:2 * i + 2] = array('d', (x, y))
+		self._mv_t0[i] = self._now()
+		self._mv_dur[i] = duration
+		self._mv_ease[i] = self._curve(easing)
+		self._finished.pop((handle, 'move'), None)
+		if on_finished is not None:
+			self._finished[(handle, 'move')] = on_finished
+		self._active.add(i)
+
+	def _stop(self, i):
+		self._seq[i] = -1
+		self._mv_dur[i] = -1
+		self._active.discard(i)
+		handle = self._handles[i]
+		self._finished.pop((handle, 'seq'), None)
+		self._finished.pop((handle, 'move'), None)
+
+	def _tick(self, now):
+		'''Advance sequences and movements of the animated sprites'''
+		if self._starting:
+			return
+		finished = []
+		self._ticking = True
+		self._changed = False
+		try:
+			for i in list(self._active):
+				self._advance(i, now, finished)
+		finally:
+			self._ticking = False
+		if self._changed:
+			self.update()
+
+		for key in finished:
+			cb = self._finished.pop(key, None)
+			if cb is not None:
+				cb()
+		if not self._active:
+			self._driver.stop()
+
+	def _advance(self, i, now, finished):
+		'''Advance sprite i at time now, appending to finished the
+		(handle, 'move' or 'seq') animations which ended'''
+		handle = self._handles[i]
+		# Movement
+		dur = self._mv_dur[i]
+		if dur >= 0:
+			t = now - self._mv_t0[i]
+			p = 1 if t >= dur else t / dur
+			e = self._curves[self._mv_ease[i]].valueForProgress(p)
+			x0, y0 = self._mv_from[2 * i], self._mv_from[2 * i + 1]
+			x1, y1 = self._mv_to[2 * i], self._mv_to[2 * i + 1]
+			self._set_pos(i, x0 + (x1 - x0) * e, y0 + (y1 - y0) * e)
+			if p == 1:
+				self._mv_dur[i] = -1
+				finished.append((handle, 'move'))
+		# Sequence
+		s = self._seq[i]
+		if s >= 0:
+			kind, func, params = self._seq_defs[s]
+			t, dur = now - self._seq_t0[i], self._seq_dur[i]
+			done = t >= dur
+			if done:
+				t = dur
+			if kind == 'frame':
+				fps, frames = params['fps'], params['frames']
+				slots = max(1, math.ceil(dur * fps / 1000))
+				slot = min(int(t * fps / 1000), slots - 1)
+				k = slot % frames if params['loop'] else min(slot, frames - 1)
+				# Frame changes only a few times per second
+				if k != self._seq_slot[i]:
+					self._seq_slot[i] = k
+					self._set_frame(i, func(handle, k))
+			else:
+				self._set_frame(i, func(handle, params['speed'], t, dur))
+			if done:
+				self._seq[i] = -1
+				finished.append((handle, 'seq'))
+		if self._mv_dur[i] < 0 and self._seq[i] < 0:
+			self._active.discard(i)
+
+	def paint(self, painter):
+		'''
+		:type painter: QPainter
+		'''
+		n = len(self._handles)
+		if n:
+			if self._pixmap is None:
+				self._pixmap = QPixmap.fromImage(self._sheet.get_image())
+			painter.drawPixmapFragments(self._frags[:n], self._pixmap)
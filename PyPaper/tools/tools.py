@@ -17,6 +17,8 @@
 
 from PyQt5.QtGui import QColor
 from collections import namedtuple
+from contextlib import contextmanager
+import gc
 import sys
 
 class Rect(namedtuple('Rect', 'x y w h')):
@@ -46,33 +48,61 @@ def wrap_skip(func):
 		return func(args[0], *args[2:])
 	return _skip2
 
+@contextmanager
+def gc_paused():
+	'''Disables the cyclic garbage collector inside the context.
+	Allocating many objects in a row triggers many collections, each
+	one walking the whole heap: pausing them keeps bulk work linear'''
+	enabled = gc.isenabled()
+	gc.disable()
+	try:
+		yield
+	finally:
+		if enabled:
+			gc.enable()
+
 def make_rgba(r, g, b, a=1):
 	return QColor.fromRgbF(r, g, b, a)
 
-def bind_line(line, item_1, item_2):
-	def map_center(pos, size):
-		'''Given a position (top-left corner),
-		computes the center by adding half size'''
-		return map(lambda a, b: a + b / 2, pos, size)
+def _center(pos, size):
+	'''Given a position (top-left corner),
+	computes the center by adding half size'''
+	return pos[0] + size[0] / 2, pos[1] + size[1] / 2
+
+# Callbacks used by bind_line, shared by all the lines
+def _start_on_pos(line, obj, xy_new, xy_old):
+	line.set_start(*_center(xy_new, obj.get_size()))
+
+def _end_on_pos(line, obj, xy_new, xy_old):
+	line.set_end(*_center(xy_new, obj.get_size()))
 
-	def _bind_pos(func):
-		def on_change(self, obj, xy_new, xy_old):
-			func(self, *map_center(xy_new, obj.get_size()))
-		return on_change
+def _start_on_size(line, obj, wh_new, wh_old):
+	line.set_start(*_center(obj.get_pos(), wh_new))
 
-	def _bind_cent(func):
-		def on_change(self, obj, wh_new, wh_old):
-			func(self, *map_center(obj.get_pos(), wh_new))
-		return on_change
+def _end_on_size(line, obj, wh_new, wh_old):
+	line.set_end(*_center(obj.get_pos(), wh_new))
 
+def bind_line(line, item_1, item_2, update=True):
+	'''Binds the line ends to the centers of item_1 and item_2.
+	If update is False, the line is not placed now: call update_line
+	when ready (useful when binding many lines at once)'''
 	# Bind item position change to line property update
-	line_t = type(line)
-	item_1.register('on_pos_changed', line, _bind_pos(line_t.set_start))#_bind(line, 'set_start'))
-	item_2.register('on_pos_changed', line, _bind_pos(line_t.set_end))#_bind(line, 'set_end'))
-	item_1.register('on_size_changed', line, _bind_cent(line_t.set_start))
-	item_2.register('on_size_changed', line, _bind_cent(line_t.set_end))
+	item_1.register('on_pos_changed', line, _start_on_pos)
+	item_2.register('on_pos_changed', line, _end_on_pos)
+	item_1.register('on_size_changed', line, _start_on_size)
+	item_2.register('on_size_changed', line, _end_on_size)
 
 	# Ensure that line has correct start and end positions
-	line.set_start(*map_center(item_1.get_pos(), item_1.get_size()))
-	line.set_end(*map_center(item_2.get_pos(), item_2.get_size()))
+	if update:
+		update_line(line, item_1, item_2)
 
+def update_line(line, item_1, item_2):
+	'''Places the line ends on the centers of item_1 and item_2'''
+	sx, sy = _center(item_1.get_pos(), item_1.get_size())
+	ex, ey = _center(item_2.get_pos(), item_2.get_size())
+	if hasattr(line, 'set_points'):
+		# Single geometry update
+		line.set_points(sx, sy, ex, ey)
+	else:
+		line.set_start(sx, sy)
+		line.set_end(ex, ey)
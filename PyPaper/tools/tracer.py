@@ -0,0 +1,259 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Tracing graph algorithms.
+
+The algorithms run on a snapshot of the graph adjacency (plain lists of
+indices), recording what happens as a compact Trace. The trace is then
+compiled to a StepTimeline, which plays all the color changes with a
+single animation, instead of one animation group per step.
+
+Example:
+	tracer = GraphTracer(graph)
+	timeline = tracer.compile(tracer.bfs(start_node), step=100)
+	timeline.play()
+'''
+
+from PyPaper.core.animation import TimeAnim, start_animation
+from PyPaper.tools.tools import make_rgba
+
+from array import array
+from collections import deque
+import heapq
+
+# Events kinds, as stored in a Trace
+DISCOVER, VISIT, RELAX, FINISH = range(4)
+EVENT_NAMES = ('discover', 'visit', 'relax', 'finish')
+
+# Default colors for nodes (background) and edges (line color) per event
+NODE_COLORS = {
+	'discover': (1, 1, 0),
+	'visit': (0, 0, 1),
+	'finish': (0, 1, 0),
+}
+EDGE_COLORS = {
+	'discover': (0, 0, 1),
+	'relax': (1, 0.5, 0),
+}
+
+class Trace:
+	'''Sequence of events, stored in three parallel arrays:
+	event kind, node index and edge index (-1 if no edge is involved).
+	Indices refer to the nodes and edges of the tracer that built it'''
+
+	def __init__(self):
+		self.kinds = array('b')
+		self.nodes = array('l')
+		self.edges = array('l')
+		self.result = None # Algorithm result, e.g. the distances
+
+	def record(self, kind, node, edge=-1):
+		self.kinds.append(kind)
+		self.nodes.append(node)
+		self.edges.append(edge)
+
+	def __len__(self):
+		return len(self.kinds)
+
+	def __iter__(self):
+		'''Iterates over (kind name, node index, edge index) tuples'''
+		for k, n, e in zip(self.kinds, self.nodes, self.edges):
+			yield EVENT_NAMES[k], n, e
+
+class GraphTracer:
+	'''Runs algorithms on a snapshot of a Graph adjacency.
+	Changes to the graph after creating the tracer are not seen'''
+
+	def __init__(self, graph, directed=True):
+		self.nodes = list(graph.nodes())
+		self.edges = list(graph.edges())
+		index = dict((n, i) for i, n in enumerate(self.nodes))
+		self._index = index
+		# Adjacency lists of (neighbour, edge) indices
+		self._adj = [[] for _ in self.nodes]
+		for ei, e in enumerate(self.edges):
+			s, t = index[e.start], index[e.end]
+			self._adj[s].append((t, ei))
+			if not directed:
+				self._adj[t].append((s, ei))
+
+	def bfs(self, source):
+		'''Breadth-first visit from the source node'''
+		tr = Trace()
+		src = self._index[source]
+		seen = set([src])
+		tr.record(DISCOVER, src)
+		queue = deque([src])
+		while queue:
+			n = queue.popleft()
+			tr.record(VISIT, n)
+			for m, e in self._adj[n]:
+				if m not in seen:
+					seen.add(m)
+					tr.record(DISCOVER, m, e)
+					queue.append(m)
+			tr.record(FINISH, n)
+		return tr
+
+	def dfs(self, source):
+		'''Depth-first visit from the source node (iterative, no recursion limit)'''
+		tr = Trace()
+		src = self._index[source]
+		seen = set([src])
+		tr.record(DISCOVER, src)
+		tr.record(VISIT, src)
+		# Stack of (node, iterator over its adjacency)
+		stack = [(src, iter(self._adj[src]))]
+		while stack:
+			n, it = stack[-1]
+			for m, e in it:
+				if m not in seen:
+					seen.add(m)
+					tr.record(DISCOVER, m, e)
+					tr.record(VISIT, m)
+					stack.append((m, iter(self._adj[m])))
+					break
+			else:
+				stack.pop()
+				tr.record(FINISH, n)
+		return tr
+
+	def dijkstra(self, source, weight=None):
+		'''Shortest paths from the source node.
+		weight is a function taking an Edge and returning its (non negative)
+		length, by default every edge has length 1.
+		The distances, as a {node: distance} dict, are in trace.result'''
+		if weight is None:
+			weights = [1] * len(self.edges)
+		else:
+			weights = [weight(e) for e in self.edges]
+		tr = Trace()
+		src = self._index[source]
+		dist = {src: 0}
+		done = set()
+		tr.record(DISCOVER, src)
+		heap = [(0, src)]
+		while heap:
+			d, n = heapq.heappop(heap)
+			if n in done:
+				continue
+			done.add(n)
+			tr.record(VISIT, n)
+			for m, e in self._adj[n]:
+				nd = d + weights[e]
+				if m not in done and nd < dist.get(m, nd + 1):
+					dist[m] = nd
+					tr.record(RELAX, m, e)
+					heapq.heappush(heap, (nd, m))
+			tr.record(FINISH, n)
+		tr.result = dict((self.nodes[n], d) for n, d in dist.items())
+		return tr
+
+	def compile(self, trace, step=50, node_colors=NODE_COLORS, edge_colors=EDGE_COLORS):
+		'''Compiles the trace to a StepTimeline. Each event takes step ms.
+		node_colors and edge_colors map event names to RGB(A) tuples:
+		events with no color for a kind of element do not change it.
+		Changes that leave an element with the same color are dropped'''
+		qcolors = {}
+		def _qcolor(c):
+			if c not in qcolors:
+				qcolors[c] = make_rgba(*c)
+			return qcolors[c]
+
+		node_cols = [_qcolor(node_colors[k]) if k in node_colors else None for k in EVENT_NAMES]
+		edge_cols = [_qcolor(edge_colors[k]) if k in edge_colors else None for k in EVENT_NAMES]
+
+		# Targets are the node items followed by the edges
+		n_nodes = len(self.nodes)
+		targets = [(n.item, n.item.set_background_color) for n in self.nodes]
+		targets += [(e, e.set_color) for e in self.edges]
+		current = [n.item.get_background_color() for n in self.nodes]
+		current += [e.get_color() for e in self.edges]
+		initial = list(current)
+
+		times = array('d')
+		which = array('l')
+		values = []
+		def _key(t, target, col):
+			if col is not None and current[target] != col:
+				current[target] = col
+				times.append(t)
+				which.append(target)
+				values.append(col)
+
+		for i, (k, n, e) in enumerate(zip(trace.kinds, trace.nodes, trace.edges)):
+			t = i * step
+			_key(t, n, node_cols[k])
+			if e >= 0:
+				_key(t, n_nodes + e, edge_cols[k])
+
+		return StepTimeline(targets, initial, times, which, values, len(trace) * step)
+
+class StepTimeline:
+	'''A flat list of keyframes, each one setting a value on a target at
+	a given time. Times must be sorted. Playing forward just applies the
+	keyframes as time passes; seeking backward restores the initial
+	values and replays from the start'''
+
+	def __init__(self, targets, initial, times, which, values, duration):
+		'''targets is a list of (object, setter) pairs, initial is the list
+		of their initial values. times, which and values are the keyframes:
+		at times[i], values[i] is set on targets[which[i]]'''
+		self._targets = targets
+		self._initial = initial
+		self._times = times
+		self._which = which
+		self._values = values
+		self._cursor = 0
+		self._time = 0
+		self._anim = None
+		self.duration = duration
+
+	def __len__(self):
+		'''Number of keyframes'''
+		return len(self._times)
+
+	def seek(self, t):
+		'''Brings the targets to their state at time t (in ms)'''
+		if t < self._time:
+			self.reset()
+		times, which, values, targets = self._times, self._which, self._values, self._targets
+		i, n = self._cursor, len(times)
+		while i < n and times[i] <= t:
+			targets[which[i]][1](values[i])
+			i += 1
+		self._cursor = i
+		self._time = t
+
+	def reset(self):
+		'''Restore the initial values'''
+		for (obj, setter), v in zip(self._targets, self._initial):
+			setter(v)
+		self._cursor = 0
+		self._time = 0
+
+	def animation(self):
+		'''Returns a new animation playing the timeline, which can be
+		added to animation groups'''
+		return TimeAnim(lambda: self.duration, lambda t, d: self.seek(t), easing='Linear')
+
+	def play(self):
+		'''Play the timeline from the start'''
+		self.reset()
+		self._anim = self.animation()
+		start_animation(self._anim)
+		return self._anim
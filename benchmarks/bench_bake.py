@@ -0,0 +1,86 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Cost of random seeks in a long sequential timeline: setting the time
+of the paused Qt animation group, which updates every animation crossed
+on the way, versus a baked timeline, which writes one sample per
+property. Playback is checked by playing the baked timeline twice,
+as a replay does.
+
+	python -m benchmarks.bench_bake --items 10 50 --steps 20 --seeks 200'''
+
+from benchmarks.common import make_root, timeit, report
+
+import argparse
+import random
+
+def main():
+	from PyQt5.QtCore import QSequentialAnimationGroup, QPointF
+	from PyPaper.core.styleditem import StyledItem
+	from PyPaper.core.animation import prop_animation
+	from PyPaper.core.bake import bake
+	from PyPaper.core.render import VirtualClock
+	from PyQt5.QtCore import QCoreApplication, QEvent
+
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--items', type=int, nargs='+', default=[10, 50])
+	parser.add_argument('--steps', type=int, default=20, help='Moves of each item')
+	parser.add_argument('--seeks', type=int, default=200)
+	args = parser.parse_args()
+
+	rnd = random.Random(0)
+	for n in args.items:
+		win, root = make_root()
+		items = [StyledItem(root) for _ in range(n)]
+		group = QSequentialAnimationGroup()
+		for s in range(args.steps):
+			for it in items:
+				p = QPointF(rnd.randrange(1000), rnd.randrange(700))
+				group.addAnimation(prop_animation(it, 'pos', p, duration=100))
+		total = group.totalDuration()
+		times = [rnd.randrange(total) for _ in range(args.seeks)]
+
+		group.start()
+		group.pause()
+		def qt_seek():
+			for t in times:
+				group.setCurrentTime(t)
+		report('Qt group {} items, per seek'.format(n), timeit(qt_seek) / args.seeks)
+		group.stop()
+
+		report('bake {} items'.format(n), timeit(lambda: bake(group), 1))
+		baked = bake(group)
+		def baked_seek():
+			for t in times:
+				baked.seek(t)
+		report('baked {} items, per seek'.format(n), timeit(baked_seek) / args.seeks)
+
+		def baked_play():
+			# At 1000 fps, stepping through the whole timeline
+			with VirtualClock(1000) as clock:
+				baked.play()
+				while clock.busy():
+					clock.step()
+			# Players are deleted when they stop
+			QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+			if baked.get_time() != baked.duration:
+				raise RuntimeError('Playback stopped at {}'.format(baked.get_time()))
+		report('baked {} items, play'.format(n), timeit(baked_play, 2))
+		win.deleteLater()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,72 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Moving the hub of a star graph, with immediate and frame-synchronized
+geometry notifications. Each simulated frame writes the hub position and
+size a few times, as concurrent animations of several properties do.
+
+	python -m benchmarks.bench_coalesce --edges 2000 --frames 50'''
+
+from benchmarks.common import make_root, timeit, report
+
+import argparse
+
+def main():
+	from PyPaper.core.dispatch import enable_frame_dispatch, disable_frame_dispatch
+	from PyPaper.tools.graph import Graph
+	from PyPaper.tools.items import LineItem
+
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--edges', type=int, default=2000)
+	parser.add_argument('--frames', type=int, default=50)
+	args = parser.parse_args()
+
+	win, root = make_root()
+	g = Graph.from_edge_list(root, [(0, i) for i in range(1, args.edges + 1)])
+	hub = [n for n in g.nodes() if n.name == 0][0]
+
+	# Count line geometry updates
+	counter = [0]
+	apply = LineItem._apply_geometry
+	def _counting(self):
+		counter[0] += 1
+		apply(self)
+	LineItem._apply_geometry = _counting
+
+	def frames(flush):
+		def _frames():
+			for f in range(args.frames):
+				hub.item.setX(f)
+				hub.item.setY(f)
+				hub.item.set_size(20 + f % 2, 20)
+				flush()
+		return _frames
+
+	counter[0] = 0
+	t = timeit(frames(lambda: None), 1)
+	report('immediate, {} lines'.format(args.edges), t, args.frames)
+	print('  line updates per frame: {:.0f}'.format(counter[0] / args.frames))
+
+	disp = enable_frame_dispatch(win)
+	counter[0] = 0
+	t = timeit(frames(disp.flush), 1)
+	report('once per frame, {} lines'.format(args.edges), t, args.frames)
+	print('  line updates per frame: {:.0f}'.format(counter[0] / args.frames))
+	disable_frame_dispatch()
+
+if __name__ == '__main__':
+	main()
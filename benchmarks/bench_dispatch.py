@@ -0,0 +1,95 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Per-event overhead of Item geometry and item change dispatch.
+It is measured against an item whose geometryChanged and itemChange are
+empty Python methods: crossing from C++ to Python is the floor for any
+Python-side dispatch (a plain QQuickPaintedItem is shown for reference).
+
+	python -m benchmarks.bench_dispatch --events 200000'''
+
+from benchmarks.common import make_root, timeit
+
+import argparse
+
+# Overhead per event with no subscribers, above the empty override, in microseconds
+IDLE_TARGET_US = 1.5
+
+def main():
+	from PyQt5.QtQuick import QQuickPaintedItem
+	from PyPaper.core.styleditem import Item
+
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--events', type=int, default=200000)
+	args = parser.parse_args()
+	n = args.events
+
+	class Plain(QQuickPaintedItem):
+		def paint(self, painter):
+			pass
+
+	class Empty(Plain):
+		def geometryChanged(self, g_new, g_old):
+			pass
+		def itemChange(self, change, val):
+			pass
+
+	win, root = make_root()
+
+	def moves(item):
+		def _moves():
+			for i in range(n):
+				item.setX(i & 1)
+		return _moves
+
+	def fades(item):
+		def _fades():
+			for i in range(n):
+				item.setOpacity(0.5 + 0.5 * (i & 1))
+		return _fades
+
+	def listener(target, *args):
+		pass
+
+	plain = Plain(root)
+	empty = Empty(root)
+	idle = Item(root)
+	other = Item(root)
+	other.register('on_remove', root, listener) # Not a geometry event
+	busy = Item(root)
+	busy.register('on_pos_changed', root, listener)
+
+	print('{:<40} {:8.3f} us/event'.format('setX, QQuickPaintedItem', timeit(moves(plain)) / n * 1e6))
+	base = timeit(moves(empty)) / n * 1e6
+	print('{:<40} {:8.3f} us/event'.format('setX, empty override', base))
+	results = {}
+	for label, item in (('no subscribers', idle), ('non-geometry subscriber', other), ('on_pos_changed subscriber', busy)):
+		t = timeit(moves(item)) / n * 1e6
+		results[label] = t - base
+		print('{:<40} {:8.3f} us/event, overhead {:.3f} us'.format('setX, ' + label, t, t - base))
+
+	print('{:<40} {:8.3f} us/event'.format('setOpacity, QQuickPaintedItem', timeit(fades(plain)) / n * 1e6))
+	base = timeit(fades(empty)) / n * 1e6
+	print('{:<40} {:8.3f} us/event'.format('setOpacity, empty override', base))
+	t = timeit(fades(idle)) / n * 1e6
+	print('{:<40} {:8.3f} us/event, overhead {:.3f} us'.format('setOpacity, no subscribers', t, t - base))
+
+	ok = results['no subscribers'] <= IDLE_TARGET_US and results['non-geometry subscriber'] <= IDLE_TARGET_US
+	print('idle overhead target {:.1f} us: {}'.format(IDLE_TARGET_US, 'PASS' if ok else 'FAIL'))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,69 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Cost of a custom easing function while animating many items: a Qt
+custom curve calling the Python function at every tick of every
+animation, versus the function sampled once by easing_curve.
+
+	python -m benchmarks.bench_easing --items 1000 --frames 30'''
+
+from benchmarks.common import make_root, report
+
+import argparse
+import time
+
+def smoother(t):
+	return t * t * t * (t * (t * 6 - 15) + 10)
+
+def run(items, curve, frames):
+	from PyQt5.QtCore import QPointF, QParallelAnimationGroup
+	from PyPaper.core.animation import prop_animation
+	group = QParallelAnimationGroup()
+	for i, it in enumerate(items):
+		group.addAnimation(prop_animation(it, 'pos', QPointF(i % 100 * 10, i // 100 * 10), duration=1000, easing=curve))
+	group.start()
+	group.pause()
+	t0 = time.perf_counter()
+	for f in range(1, frames + 1):
+		group.setCurrentTime(f * 1000 // frames)
+	dt = (time.perf_counter() - t0) / frames
+	group.stop()
+	return dt
+
+def main():
+	from PyQt5.QtCore import QEasingCurve
+	from PyPaper.core.styleditem import StyledItem
+	from PyPaper.core.easing import easing_curve
+
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--items', type=int, nargs='+', default=[1000])
+	parser.add_argument('--frames', type=int, default=30)
+	args = parser.parse_args()
+
+	for n in args.items:
+		win, root = make_root()
+		items = [StyledItem(root) for _ in range(n)]
+		custom = QEasingCurve()
+		custom.setCustomType(smoother)
+		report('Qt custom curve {} items, per frame'.format(n), run(items, custom, args.frames))
+		for it in items:
+			it.set_pos(0, 0)
+		report('easing_curve {} items, per frame'.format(n), run(items, easing_curve(smoother), args.frames))
+		win.deleteLater()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,56 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Graph edges as one LineItem each versus a single EdgeLayer: time to
+build the graph and to drag a hub node connected to every other node.
+
+	python -m benchmarks.bench_edgelayer --nodes 1000 --moves 50'''
+
+from benchmarks.common import make_app, make_root, timeit, report
+
+import argparse
+
+def star(n_nodes):
+	'''Node 0 is connected to all the others'''
+	return [(0, i) for i in range(1, n_nodes)]
+
+def drag(app, hub, moves):
+	for k in range(moves):
+		hub.item.set_pos(200 + k % 20, 200)
+		app.processEvents()
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--nodes', type=int, default=1000)
+	parser.add_argument('--moves', type=int, default=50)
+	args = parser.parse_args()
+
+	from PyPaper.tools.graph import Graph
+	app = make_app()
+	pairs = star(args.nodes)
+	for label, layer in (('LineItem', False), ('EdgeLayer', True)):
+		win, root = make_root()
+		win.show()
+		graph = []
+		report('{} build {} edges'.format(label, len(pairs)),
+			timeit(lambda: graph.append(Graph.from_edge_list(root, pairs, edge_layer=layer)), 1), len(pairs))
+		hub = [n for n in graph[0].nodes() if n.name == 0][0]
+		report('{} drag hub'.format(label), timeit(lambda: drag(app, hub, args.moves), 1), args.moves)
+		win.deleteLater()
+
+if __name__ == '__main__':
+	main()
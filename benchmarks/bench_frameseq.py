@@ -0,0 +1,83 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Sprites playing a 3 frames cycle at 10 fps for one second, with a
+time based sequence (repainting at every animation tick) and a frameseq
+(repainting only on frame change). Reports paints and the CPU time
+of the run.
+
+	python -m benchmarks.bench_frameseq --sprites 300 --duration 1000'''
+
+from benchmarks.common import make_app, make_root, report
+
+import argparse
+import time
+
+def main():
+	from PyQt5.QtCore import QTimer, QRectF
+	from PyPaper.tools.sprite import Sprite, sequenced, sequence, frameseq
+
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--sprites', type=int, default=300)
+	parser.add_argument('--duration', type=int, default=1000, help='milliseconds')
+	args = parser.parse_args()
+
+	paints = [0]
+	def fill(self, painter, frame):
+		paints[0] += 1
+		painter.fillRect(QRectF(0, 0, 10, 10), self.get_background_color().darker(100 + 50 * frame))
+
+	def distance(self):
+		# Fixed duration for speed 1000
+		return args.duration
+
+	@sequenced
+	class TimeSprite(Sprite):
+		@sequence('cycle', speed=1000, distance_func=distance, action=lambda self, **kw: None)
+		def _cycle(self, painter, speed, t, duration):
+			fill(self, painter, int(t // 100) % 3)
+
+	@sequenced
+	class FrameSprite(Sprite):
+		@frameseq('cycle', frames=3, fps=10, duration=args.duration)
+		def _cycle(self, painter, frame):
+			fill(self, painter, frame)
+
+	app = make_app()
+	for cls in (TimeSprite, FrameSprite):
+		win, root = make_root()
+		sprites = []
+		for i in range(args.sprites):
+			s = cls(root)
+			s.set_pos(i % 50 * 12, i // 50 * 12)
+			s.set_size(10, 10)
+			sprites.append(s)
+		win.show()
+		for s in sprites:
+			s.cycle_to()
+		paints[0] = 0
+		t0 = time.process_time()
+		# Let the animations finish
+		QTimer.singleShot(args.duration + 200, app.quit)
+		app.exec_()
+		report('{} {} sprites'.format(cls.__name__, args.sprites), time.process_time() - t0)
+		print('  paints per sprite: {:.1f}'.format(paints[0] / args.sprites))
+		win.close()
+		win.deleteLater()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,84 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Compares the graph adjacency index with a full scan of the edges.
+
+	python -m benchmarks.bench_graph --nodes 2000 --edges 20000'''
+
+from benchmarks.common import make_root, timeit, report
+
+import argparse
+import random
+
+def build_graph(root, n_nodes, n_edges, seed=0):
+	from PyPaper.tools.graph import Graph
+	rnd = random.Random(seed)
+	g = Graph(root)
+	nodes = [g.add_node(i) for i in range(n_nodes)]
+	for _ in range(n_edges):
+		g.add_edge(rnd.choice(nodes), rnd.choice(nodes))
+	return g, nodes
+
+def scan_successors(graph, node):
+	'''How successors were found before the adjacency index'''
+	return set(e.end for e in graph._edges if e.start is node)
+
+def scan_predecessors(graph, node):
+	return set(e.start for e in graph._edges if e.end is node)
+
+def scan_remove(graph, node):
+	'''How nodes were removed before the adjacency index'''
+	to_remove = set()
+	for edge in graph._edges:
+		if edge.start is node or edge.end is node:
+			to_remove.add(edge)
+	for edge in to_remove:
+		graph._unlink(edge)
+		edge._dispose()
+	node.item.remove()
+	graph._nodes.remove(node)
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--nodes', type=int, default=2000)
+	parser.add_argument('--edges', type=int, default=20000)
+	parser.add_argument('--walk', type=int, default=200, help='Nodes to visit')
+	parser.add_argument('--remove', type=int, default=200, help='Nodes to delete')
+	args = parser.parse_args()
+
+	win, root = make_root()
+	g, nodes = build_graph(root, args.nodes, args.edges)
+
+	visited = nodes[:args.walk]
+	def walk(succ, pred):
+		def _walk():
+			for n in visited:
+				succ(n)
+				pred(n)
+		return _walk
+
+	report('neighbour walk, full scan', timeit(walk(lambda n: scan_successors(g, n), lambda n: scan_predecessors(g, n)), 1), len(visited))
+	report('neighbour walk, adjacency', timeit(walk(lambda n: n.successors(), lambda n: n.predecessors())), len(visited))
+
+	victims = nodes[:args.remove]
+	report('node deletion, full scan', timeit(lambda: [scan_remove(g, n) for n in victims], 1), len(victims))
+
+	victims = nodes[args.remove:2 * args.remove]
+	report('node deletion, adjacency', timeit(lambda: [g.remove(n) for n in victims], 1), len(victims))
+
+if __name__ == '__main__':
+	main()
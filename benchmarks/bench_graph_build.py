@@ -0,0 +1,61 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Graph construction time, one edge at a time and in bulk.
+Both should grow linearly with the number of edges.
+
+	python -m benchmarks.bench_graph_build --sizes 2500 5000 10000'''
+
+from benchmarks.common import make_root, timeit, report
+
+import argparse
+import random
+
+def edge_list(n_nodes, n_edges, seed=0):
+	rnd = random.Random(seed)
+	return [(rnd.randrange(n_nodes), rnd.randrange(n_nodes)) for _ in range(n_edges)]
+
+def build_one_by_one(root, pairs):
+	from PyPaper.tools.graph import Graph
+	g = Graph(root)
+	nodes = {}
+	for a, b in pairs:
+		for name in (a, b):
+			if name not in nodes:
+				nodes[name] = g.add_node(name)
+		g.add_edge(nodes[a], nodes[b])
+	return g
+
+def build_bulk(root, pairs):
+	from PyPaper.tools.graph import Graph
+	return Graph.from_edge_list(root, pairs)
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--sizes', type=int, nargs='+', default=[2500, 5000, 10000])
+	args = parser.parse_args()
+
+	for n in args.sizes:
+		pairs = edge_list(n // 4, n)
+		for label, build in (('add_edge', build_one_by_one), ('from_edge_list', build_bulk)):
+			# A fresh window each time, so old items do not pile up
+			win, root = make_root()
+			report('{} {} edges'.format(label, n), timeit(lambda: build(root, pairs), 1), n)
+			win.deleteLater()
+
+if __name__ == '__main__':
+	main()
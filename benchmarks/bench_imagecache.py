@@ -0,0 +1,68 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Many tiles showing the same background image: time to set the image
+and to paint every tile a few times, with the image cache statistics.
+
+	python -m benchmarks.bench_imagecache --tiles 1000 --repaints 3'''
+
+from benchmarks.common import make_root, timeit, report
+
+import argparse
+import os
+import tempfile
+
+def main():
+	from PyQt5.QtGui import QImage, QPainter, QColor
+	from PyPaper.core.styleditem import StyledItem
+	from PyPaper.core.imagecache import image_cache
+
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--tiles', type=int, default=1000)
+	parser.add_argument('--repaints', type=int, default=3)
+	parser.add_argument('--image-size', type=int, default=256)
+	args = parser.parse_args()
+
+	path = os.path.join(tempfile.mkdtemp(), 'tile.png')
+	img = QImage(args.image_size, args.image_size, QImage.Format_ARGB32)
+	img.fill(QColor(0, 128, 255))
+	img.save(path)
+
+	win, root = make_root()
+	tiles = [StyledItem(root) for _ in range(args.tiles)]
+	for t in tiles:
+		t.set_size(64, 64)
+
+	def set_images():
+		for t in tiles:
+			t._backgr_img_path = None # Force the load
+			t.set_background_image(path)
+	report('set image, {} tiles'.format(args.tiles), timeit(set_images, 1), args.tiles)
+
+	canvas = QImage(64, 64, QImage.Format_ARGB32_Premultiplied)
+	def paint():
+		for _ in range(args.repaints):
+			for t in tiles:
+				painter = QPainter(canvas)
+				t.paint(painter)
+				painter.end()
+	report('paint, {} tiles x {}'.format(args.tiles, args.repaints), timeit(paint, 1), args.tiles * args.repaints)
+	print('  cache:', image_cache().stats())
+	os.remove(path)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,42 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Force-directed layout, headless (no items involved).
+
+	python -m benchmarks.bench_layout --sizes 1000 10000'''
+
+from benchmarks.common import timeit, report
+
+import argparse
+
+def main():
+	import numpy as np
+	from PyPaper.tools.layout import ForceLayout
+
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+	parser.add_argument('--iterations', type=int, default=10)
+	args = parser.parse_args()
+
+	for n in args.sizes:
+		edges = np.random.default_rng(0).integers(0, n, (2 * n, 2))
+		side = 20 * n ** 0.5
+		lay = ForceLayout(n, edges, side, side, seed=0)
+		report('layout {} nodes, per iteration'.format(n), timeit(lambda: lay.run(args.iterations), 1) / args.iterations)
+
+if __name__ == '__main__':
+	main()
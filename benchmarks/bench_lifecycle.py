@@ -0,0 +1,109 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Memory under continuous animation: items are animated again and again
+for a while, printing the animation objects alive and the resident
+memory. Both should stay flat, since stopped animations are deleted.
+Then checks that coroutines awaiting animations wake up when the
+animations are stopped.
+
+	python -m benchmarks.bench_lifecycle --items 50 --seconds 20'''
+
+from benchmarks.common import make_root, make_app
+
+import argparse
+import os
+
+def rss_mib():
+	'''Resident memory, in MiB, None if unknown'''
+	try:
+		with open('/proc/self/statm') as f:
+			pages = int(f.read().split()[1])
+	except OSError:
+		return None
+	return pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+def check_stopped_await(app, items):
+	'''Await long moves of items, stop them with stop_animations and
+	check that the awaiting tasks are cancelled, not left pending'''
+	import asyncio
+	from PyPaper.core.aio import install, spawn, sleep
+	from PyPaper.core.animation import stop_animations
+	install()
+	tasks = []
+
+	async def move(it):
+		await it.move_to(0, 0, duration=10000)
+
+	async def stop_all():
+		tasks.extend(spawn(move(it)) for it in items)
+		await sleep(100)
+		stop_animations()
+		await sleep(100)
+		app.quit()
+
+	spawn(stop_all())
+	app.exec_()
+	pending = sum(1 for t in tasks if not t.done())
+	print('stopped awaits: {} cancelled, {} pending'.format(sum(1 for t in tasks if t.cancelled()), pending))
+	if pending:
+		raise RuntimeError('Awaits of stopped animations did not wake up')
+
+def main():
+	from PyQt5.QtCore import QTimer
+	from PyPaper.core.styleditem import StyledItem
+	from PyPaper.core.animation import seq_anim_cm, animation_stats
+
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--items', type=int, default=50)
+	parser.add_argument('--seconds', type=int, default=20)
+	args = parser.parse_args()
+
+	app = make_app()
+	win, root = make_root()
+	items = [StyledItem(root) for _ in range(args.items)]
+	state = {'round': 0}
+
+	def burst():
+		k = state['round'] = state['round'] + 1
+		for i, it in enumerate(items):
+			with seq_anim_cm(it):
+				it.move_to((i * 13 + k * 7) % 900, (i * 7 + k * 13) % 700, duration=40)
+				it.resize_to(10 + k % 10, 10, duration=40)
+
+	def sample():
+		s = animation_stats()
+		print('{:5d} s  started {:8d}  running {:5d}  objects {:6d}  rss {} MiB'.format(
+			state.get('sec', 0), s['started'], s['running'], s['objects'],
+			'?' if rss_mib() is None else '{:.1f}'.format(rss_mib())))
+		state['sec'] = state.get('sec', 0) + 1
+
+	timer = QTimer()
+	timer.timeout.connect(burst)
+	timer.start(50)
+	probe = QTimer()
+	probe.timeout.connect(sample)
+	probe.start(1000)
+	QTimer.singleShot(args.seconds * 1000 + 100, app.quit)
+	app.exec_()
+	timer.stop()
+	probe.stop()
+
+	check_stopped_await(app, items)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,58 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Cost of resolving the durations of speed based animations ahead of
+time, for long sequences of moves, and the total length obtained.
+
+	python -m benchmarks.bench_plan --sizes 1000 10000'''
+
+from benchmarks.common import make_root, timeit, report
+
+import argparse
+import random
+
+def build(items, n, rnd):
+	from PyQt5.QtCore import QPointF, QSequentialAnimationGroup, QParallelAnimationGroup
+	from PyPaper.core.animation import prop_animation
+	group = QSequentialAnimationGroup()
+	for i in range(n // len(items)):
+		step = QParallelAnimationGroup()
+		for it in items:
+			p = QPointF(rnd.randrange(1000), rnd.randrange(700))
+			step.addAnimation(prop_animation(it, 'pos', p, speed=200))
+		group.addAnimation(step)
+	return group
+
+def main():
+	from PyPaper.core.styleditem import StyledItem
+	from PyPaper.core.animation import resolve_durations
+
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+	parser.add_argument('--items', type=int, default=10)
+	args = parser.parse_args()
+
+	for n in args.sizes:
+		win, root = make_root()
+		items = [StyledItem(root) for _ in range(args.items)]
+		group = build(items, n, random.Random(0))
+		report('resolve {} moves'.format(n), timeit(lambda: resolve_durations(group), 1), n)
+		print('  total duration: {:.1f} s'.format(group.totalDuration() / 1000))
+		win.deleteLater()
+
+if __name__ == '__main__':
+	main()
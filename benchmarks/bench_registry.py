@@ -0,0 +1,122 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Stress of Registry register/unregister/remove churn, compared with the
+previous list-based implementation (copied below). No Qt is involved.
+
+	python -m benchmarks.bench_registry --sizes 1000 5000 20000'''
+
+from benchmarks.common import timeit, report
+from PyPaper.core.registry import Registry
+
+import argparse
+import random
+
+class LegacyRegistry:
+	'''The list-based Registry, before subscriptions were handles'''
+	def __init__(self):
+		self._callbacks = {}
+
+	def register(self, event, target_obj, callback):
+		if target_obj is None:
+			def _call_once(*args, **kwargs):
+				callback(*args, **kwargs)
+				self.unregister(event, None, _call_once)
+			self._callbacks.setdefault(event, []).append((None, _call_once))
+		else:
+			self._callbacks.setdefault(event, []).append((target_obj, callback))
+			def _remove_cb(unused, obj):
+				self.unregister(event, target_obj, callback)
+			target_obj.register('on_remove', None, _remove_cb)
+
+	def unregister(self, event, target_obj, callback):
+		self._callbacks[event].remove((target_obj, callback))
+
+	def _run_callbacks(self, event, *args, **kwargs):
+		for obj, cb in list(it for it in self._callbacks.get(event, [])):
+			cb(obj, *args, **kwargs)
+
+class Node(Registry):
+	def remove(self):
+		self._run_callbacks('on_remove', self)
+		self.release_subscriptions()
+
+class LegacyNode(LegacyRegistry):
+	def remove(self):
+		self._run_callbacks('on_remove', self)
+
+def on_change(target, source, value):
+	pass
+
+def hub_teardown(node_t, n, seed=0):
+	'''A hub with n listeners, which are removed one by one in random order'''
+	hub = node_t()
+	leaves = [node_t() for _ in range(n)]
+	for leaf in leaves:
+		hub.register('on_change', leaf, on_change)
+	hub._run_callbacks('on_change', hub, 1)
+	random.Random(seed).shuffle(leaves)
+	for leaf in leaves:
+		leaf.remove()
+
+def hub_removed(node_t, n):
+	'''A hub with n listeners is removed: returns the callbacks left on the listeners'''
+	hub = node_t()
+	leaves = [node_t() for _ in range(n)]
+	for leaf in leaves:
+		hub.register('on_change', leaf, on_change)
+	hub.remove()
+	left = 0
+	for leaf in leaves:
+		left += len(getattr(leaf, '_subscribed', ())) + len(leaf._callbacks.get('on_remove', ()))
+	return left
+
+def churn(node_t, n, seed=0):
+	'''Random register/unregister/dispatch over a few sources'''
+	rnd = random.Random(seed)
+	sources = [node_t() for _ in range(10)]
+	targets = [node_t() for _ in range(100)]
+	live = []
+	for i in range(n):
+		src = rnd.choice(sources)
+		tgt = rnd.choice(targets)
+		sub = src.register('on_change', tgt, on_change)
+		live.append((src, tgt, sub))
+		if i % 3 == 2:
+			src, tgt, sub = live.pop(rnd.randrange(len(live)))
+			if sub is not None:
+				sub.cancel()
+			else:
+				src.unregister('on_change', tgt, on_change)
+		if i % 10 == 0:
+			src._run_callbacks('on_change', src, i)
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000])
+	args = parser.parse_args()
+
+	for n in args.sizes:
+		for label, node_t in (('legacy', LegacyNode), ('handles', Node)):
+			report('{} hub teardown {}'.format(label, n), timeit(lambda: hub_teardown(node_t, n), 1), n)
+		for label, node_t in (('legacy', LegacyNode), ('handles', Node)):
+			report('{} churn {}'.format(label, n), timeit(lambda: churn(node_t, n), 1), n)
+		for label, node_t in (('legacy', LegacyNode), ('handles', Node)):
+			print('{} hub removed {}: {} callbacks left on listeners'.format(label, n, hub_removed(node_t, n)))
+
+if __name__ == '__main__':
+	main()
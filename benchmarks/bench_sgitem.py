@@ -0,0 +1,80 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Frame time with many items changing color each frame, as during a
+background_color_to animation, for StyledItem (painted) and SGStyledItem
+(scene graph nodes). A frame is timed from the property writes to the
+end of its rendering.
+
+	python -m benchmarks.bench_sgitem --items 1000 10000 --frames 10 --size 40'''
+
+from benchmarks.common import make_app, make_root, report
+
+import argparse
+import itertools
+import time
+
+# Frames counter, so that each frame changes the color
+_frames = itertools.count()
+
+def frame_time(app, win, items, frames):
+	'''Average seconds per frame'''
+	from PyQt5.QtGui import QColor
+	swapped = [False]
+	win.frameSwapped.connect(lambda: swapped.__setitem__(0, True))
+	total = 0
+	for _ in range(frames):
+		f = next(_frames) % 2
+		col = QColor.fromRgbF(f, 0, 1 - f)
+		swapped[0] = False
+		t0 = time.perf_counter()
+		for it in items:
+			it.set_background_color(col)
+		while not swapped[0]:
+			app.processEvents()
+		total += time.perf_counter() - t0
+	return total / frames
+
+def main():
+	from PyPaper.core.styleditem import StyledItem, SGStyledItem
+
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--items', type=int, nargs='+', default=[1000, 10000])
+	parser.add_argument('--frames', type=int, default=10)
+	parser.add_argument('--size', type=int, default=40, help='side of the items')
+	args = parser.parse_args()
+
+	app = make_app()
+	for n in args.items:
+		for cls in (StyledItem, SGStyledItem):
+			win, root = make_root()
+			items = []
+			for i in range(n):
+				it = cls(root)
+				it.set_pos(i % 100 * 10, i // 100 % 76 * 10)
+				it.set_size(args.size, args.size)
+				items.append(it)
+			win.show()
+			# First frame builds the nodes
+			frame_time(app, win, items, 1)
+			report('{} {} items'.format(cls.__name__, n), frame_time(app, win, items, args.frames))
+			win.close()
+			win.deleteLater()
+			app.processEvents()
+
+if __name__ == '__main__':
+	main()
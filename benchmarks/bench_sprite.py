@@ -0,0 +1,62 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Drawing sprite frames: copying the frame out of the sheet, as
+bg_clip_rect used to do, versus SpriteSheet drawing through the source
+rectangle.
+
+	python -m benchmarks.bench_sprite --draws 5000'''
+
+from benchmarks.common import make_app, timeit, report
+
+import argparse
+
+def main():
+	from PyQt5.QtCore import QRectF
+	from PyQt5.QtGui import QImage, QPainter
+	from PyPaper.tools.sprite import SpriteSheet
+
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--draws', type=int, default=5000)
+	parser.add_argument('--sheet', default='Examples/tiles.png')
+	parser.add_argument('--frame', type=int, default=48)
+	args = parser.parse_args()
+
+	make_app()
+	sheet = SpriteSheet.from_grid(args.sheet, args.frame, args.frame)
+	image = sheet.get_image()
+	canvas = QImage(args.frame, args.frame, QImage.Format_ARGB32_Premultiplied)
+	target = QRectF(0, 0, args.frame, args.frame)
+
+	def copy_frames():
+		painter = QPainter(canvas)
+		for i in range(args.draws):
+			r = sheet[i % len(sheet)]
+			painter.drawImage(0, 0, image.copy(r.toRect()))
+		painter.end()
+
+	def sheet_frames():
+		painter = QPainter(canvas)
+		for i in range(args.draws):
+			sheet.draw(painter, i, target)
+		painter.end()
+
+	report('copy frame', timeit(copy_frames), args.draws)
+	report('SpriteSheet.draw', timeit(sheet_frames), args.draws)
+
+if __name__ == '__main__':
+	main()
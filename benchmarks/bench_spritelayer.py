@@ -0,0 +1,89 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''A crowd of sprites walking (moving while cycling 3 frames at 10 fps)
+for one second, as Sprite items and as a SpriteLayer.
+Reports the frames rendered and the CPU time per frame.
+
+	python -m benchmarks.bench_spritelayer --sprites 2000 --duration 1000'''
+
+from benchmarks.common import make_app, make_root, report
+
+import argparse
+import time
+
+def main():
+	from PyQt5.QtCore import QTimer, QRectF
+	from PyPaper.core.styleditem import StyledItem
+	from PyPaper.tools.sprite import Sprite, SpriteSheet, SpriteLayer, LayerSprite, sequenced, frameseq
+
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--sprites', type=int, default=2000)
+	parser.add_argument('--duration', type=int, default=1000, help='milliseconds')
+	parser.add_argument('--sheet', default='Examples/tiles.png')
+	args = parser.parse_args()
+
+	sheet = SpriteSheet.from_grid(args.sheet, 48, 48)
+
+	@sequenced
+	class ItemWalker(Sprite):
+		@frameseq('walk', frames=3, fps=10, duration=args.duration, action=StyledItem.move_to)
+		def _walk(self, painter, frame):
+			sheet.draw(painter, frame, QRectF(0, 0, *self.get_size()))
+
+	@sequenced
+	class LayerWalker(LayerSprite):
+		@frameseq('walk', frames=3, fps=10, duration=args.duration, action=LayerSprite.move_to)
+		def _walk(self, frame):
+			return frame
+
+	def start(n, add):
+		walkers = [add(i % 50 * 20, i // 50 * 10) for i in range(n)]
+		for i, w in enumerate(walkers):
+			x, y = w.get_pos()
+			w.walk_to(x + 100, y)
+
+	app = make_app()
+	for label in ('Sprite', 'SpriteLayer'):
+		win, root = make_root()
+		if label == 'Sprite':
+			def add(x, y):
+				s = ItemWalker(root)
+				s.set_pos(x, y)
+				s.set_size(24, 24)
+				return s
+		else:
+			layer = SpriteLayer(sheet, root)
+			def add(x, y):
+				return layer.add_sprite(LayerWalker, x, y, 24, 24)
+		win.show()
+		frames = [0]
+		win.frameSwapped.connect(lambda: frames.__setitem__(0, frames[0] + 1))
+		t0 = time.process_time()
+		start(args.sprites, add)
+		# Let the animations finish
+		QTimer.singleShot(args.duration + 200, app.quit)
+		app.exec_()
+		cpu = time.process_time() - t0
+		report('{} {} sprites, per frame'.format(label, args.sprites), cpu / max(1, frames[0]))
+		print('  frames: {}'.format(frames[0]))
+		win.close()
+		win.deleteLater()
+		app.processEvents()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,74 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Building the animations of a selection sort, as Examples/sorting.py
+does: time to record and compile them, and Qt objects created compared
+to one group per context.
+
+	python -m benchmarks.bench_timeline --items 30'''
+
+from benchmarks.common import make_root, timeit, report
+
+import argparse
+
+def count_qt(anim):
+	'''Number of Qt animation objects in the tree of anim'''
+	from PyQt5.QtCore import QAnimationGroup
+	if isinstance(anim, QAnimationGroup):
+		return 1 + sum(count_qt(anim.animationAt(i)) for i in range(anim.animationCount()))
+	return 1
+
+def selection_sort(data):
+	from PyPaper.core.animation import seq_anim_cm, par_anim_cm
+	with seq_anim_cm(*data):
+		for i in range(len(data)):
+			data[i].background_color_to((0, 0, 1), duration=100)
+			min_i = i
+			for j in range(i, len(data)):
+				data[j].background_color_to((1, 1, 0), duration=25)
+				if data[j].get_size()[0] < data[min_i].get_size()[0]:
+					min_i = j
+				data[j].background_color_to((1, 0, 0), duration=25)
+			data[i], data[min_i] = data[min_i], data[i]
+			with par_anim_cm(*data):
+				for k, it in enumerate(data):
+					it.move_to(50, 100 + 10 * k, duration=100)
+
+def main():
+	from PyPaper.core.styleditem import StyledItem
+	from PyPaper.core.animation import timeline_stats, reset_timeline_stats
+
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--items', type=int, default=30)
+	args = parser.parse_args()
+
+	win, root = make_root()
+	data = [StyledItem(root) for _ in range(args.items)]
+	for i, it in enumerate(data):
+		it.set_size(10 * ((i * 7) % args.items) + 10, 5)
+
+	reset_timeline_stats()
+	report('selection sort, {} items'.format(args.items), timeit(lambda: selection_sort(list(data)), 1))
+	anim = data[0]._animations[-1]
+	anim.stop()
+	stats = timeline_stats()
+	print('  compile time:     {:.2f} ms'.format(stats['build_time'] * 1e3))
+	print('  contexts:         {}'.format(stats['timelines']))
+	print('  Qt objects:       {} (one group per context: {})'.format(count_qt(anim), stats['timelines'] + stats['animations']))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,70 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Building the animation of a graph traversal: one background_color_to
+per step against a compiled StepTimeline.
+
+	python -m benchmarks.bench_tracer --nodes 10000 --edges 20000'''
+
+from benchmarks.common import make_root, timeit, report
+
+import argparse
+import random
+
+def per_step_animation(tracer, trace, steps):
+	'''How a traversal is animated without the tracer (first steps only)'''
+	from PyPaper.core.animation import seq_anim_cm
+	from PyPaper.tools.tracer import NODE_COLORS
+	items = [n.item for n in tracer.nodes]
+	with seq_anim_cm(*items) as grp:
+		for i, (kind, n, e) in enumerate(trace):
+			if i == steps:
+				break
+			if kind in NODE_COLORS:
+				items[n].background_color_to(NODE_COLORS[kind], duration=50)
+	# Contexts yield a Timeline, started as a Qt animation on exit
+	anim = grp.compiled()
+	if anim is not None:
+		anim.stop()
+
+def main():
+	from PyPaper.tools.graph import Graph
+	from PyPaper.tools.tracer import GraphTracer
+
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--nodes', type=int, default=10000)
+	parser.add_argument('--edges', type=int, default=20000)
+	parser.add_argument('--steps', type=int, default=2000, help='Steps animated without the tracer')
+	args = parser.parse_args()
+
+	rnd = random.Random(0)
+	win, root = make_root()
+	g = Graph.from_edge_list(root, [(rnd.randrange(args.nodes), rnd.randrange(args.nodes)) for _ in range(args.edges)])
+	src = next(iter(g.nodes()))
+
+	tracer = GraphTracer(g, directed=False)
+	trace = tracer.bfs(src)
+	report('trace bfs ({} events)'.format(len(trace)), timeit(lambda: tracer.bfs(src)))
+	report('compile timeline', timeit(lambda: tracer.compile(trace)), len(trace))
+	report('background_color_to per step', timeit(lambda: per_step_animation(tracer, trace, args.steps), 1), args.steps)
+
+	tl = tracer.compile(trace)
+	print('keyframes: {} for {} events'.format(len(tl), len(trace)))
+	report('play whole timeline (seek to end)', timeit(lambda: (tl.reset(), tl.seek(tl.duration)), 1), len(tl))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,71 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Cost of advancing the animations of many moving items by one frame,
+without rendering: one PropertyAnimation per item (in a parallel group,
+stepped with setCurrentTime) versus the TweenEngine.
+
+	python -m benchmarks.bench_tween --items 1000 10000 --frames 30'''
+
+from benchmarks.common import make_root, report
+
+import argparse
+import time
+
+def main():
+	from PyQt5.QtCore import QPointF, QParallelAnimationGroup
+	from PyPaper.core.styleditem import StyledItem
+	from PyPaper.core.animation import prop_animation
+	from PyPaper.core.tween import TweenEngine
+
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--items', type=int, nargs='+', default=[1000, 10000])
+	parser.add_argument('--frames', type=int, default=30)
+	args = parser.parse_args()
+
+	duration = 1000
+	step = duration / args.frames
+	for n in args.items:
+		win, root = make_root()
+		items = [StyledItem(root) for _ in range(n)]
+		targets = [QPointF(i % 100 * 10, i // 100 % 70 * 10) for i in range(n)]
+
+		group = QParallelAnimationGroup()
+		for it, p in zip(items, targets):
+			group.addAnimation(prop_animation(it, 'pos', p, duration=duration))
+		group.start()
+		group.pause()
+		t0 = time.perf_counter()
+		for f in range(1, args.frames + 1):
+			group.setCurrentTime(int(f * step))
+		report('PropertyAnimation {} items, per frame'.format(n), (time.perf_counter() - t0) / args.frames)
+		group.stop()
+
+		for it in items:
+			it.set_pos(0, 0)
+		engine = TweenEngine()
+		for it, p in zip(items, targets):
+			engine.tween(it, 'pos', p, duration=duration)
+		engine._driver.stop()
+		t0 = time.perf_counter()
+		for f in range(1, args.frames + 1):
+			engine.tick(f * step)
+		report('TweenEngine {} items, per frame'.format(n), (time.perf_counter() - t0) / args.frames)
+		win.deleteLater()
+
+if __name__ == '__main__':
+	main()
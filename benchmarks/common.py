@@ -0,0 +1,66 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Helpers shared by the benchmarks.
+Benchmarks are meant to be run from the repository root, e.g.
+
+	python -m benchmarks.bench_graph
+
+They use the offscreen Qt platform and the software Quick backend,
+unless QT_QPA_PLATFORM and QT_QUICK_BACKEND say otherwise.'''
+
+import os
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+os.environ.setdefault('QT_QUICK_BACKEND', 'software')
+
+_app = None
+
+def make_app():
+	'''Returns the application, creating it if necessary'''
+	global _app
+	from PyQt5.QtWidgets import QApplication
+	if _app is None:
+		_app = QApplication.instance() or QApplication([])
+	return _app
+
+def make_root(width=1024, height=768):
+	'''Builds a quick window and returns it with its root item'''
+	from PyQt5.QtQuick import QQuickWindow
+	make_app()
+	win = QQuickWindow()
+	win.resize(width, height)
+	return win, win.contentItem()
+
+def timeit(func, repeat=3):
+	'''Returns the best wall time (in seconds) of repeat calls to func'''
+	best = None
+	for _ in range(repeat):
+		t0 = time.perf_counter()
+		func()
+		dt = time.perf_counter() - t0
+		if best is None or dt < best:
+			best = dt
+	return best
+
+def report(name, seconds, count=None):
+	'''Prints a timing line, with per-operation time if count is given'''
+	if count:
+		print('{:<40} {:10.2f} ms {:10.2f} us/op'.format(name, seconds * 1e3, seconds * 1e6 / count))
+	else:
+		print('{:<40} {:10.2f} ms'.format(name, seconds * 1e3))
@@ -0,0 +1,249 @@
+# This file is part of PyPaper.
+#
+# PyPaper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyPaper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PyPaper.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2015 Alessandro "AkiRoss" Re
+
+'''Benchmark suite for the hot paths of PyPaper, with machine readable
+results and comparison with a baseline.
+
+	python -m benchmarks.run                      # Run every case
+	python -m benchmarks.run --only paint sort    # Cases matching a name
+	python -m benchmarks.run --scale 0.1          # Smaller sizes, quick check
+	python -m benchmarks.run --save results.json
+	python -m benchmarks.run --baseline benchmarks/baseline.json
+
+With --baseline, cases slower than tolerance times the baseline are
+reported as regressions and the exit status is 1. Cases are compared
+only when they ran with the same size. Times are the best of --repeat
+runs, each in a new window.'''
+
+from benchmarks.common import make_app, make_root
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+CASES = [] # (name, default size, function, description, maximum repeat)
+
+def case(name, size, description, max_repeat=None):
+	'''Add the decorated function to the suite. It receives the root
+	item and the size, and returns the seconds taken by the part to
+	measure (setup excluded). Long cases can limit their repetitions'''
+	def _decorator(func):
+		CASES.append((name, size, func, description, max_repeat))
+		return func
+	return _decorator
+
+_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@case('create_items', 2000, 'create N StyledItems')
+def create_items(root, n):
+	from PyPaper.core.styleditem import StyledItem
+	t0 = time.perf_counter()
+	items = [StyledItem(root) for _ in range(n)]
+	return time.perf_counter() - t0
+
+@case('move_to', 1000, 'animate N items with move_to, 30 frames of virtual time')
+def move_to(root, n):
+	from PyPaper.core.styleditem import StyledItem
+	from PyPaper.core.render import VirtualClock
+	items = [StyledItem(root) for _ in range(n)]
+	with VirtualClock(fps=60) as clock:
+		t0 = time.perf_counter()
+		for i, it in enumerate(items):
+			it.move_to(i % 100 * 10, i // 100 * 10, duration=500)
+		while clock.busy():
+			clock.step()
+		return time.perf_counter() - t0
+
+@case('registry_dispatch', 100000, 'N events, each delivered to 10 subscribers')
+def registry_dispatch(root, n):
+	from PyPaper.core.registry import Registry
+	class Target:
+		pass
+	def callback(target, *args):
+		pass
+	src = Registry()
+	targets = [Target() for _ in range(10)]
+	for t in targets:
+		src.register('on_event', t, callback)
+	t0 = time.perf_counter()
+	for i in range(n):
+		src._run_callbacks('on_event', i)
+	return time.perf_counter() - t0
+
+@case('console_print', 100000, 'print N lines to the console output and show them')
+def console_print(root, n):
+	from PyQt5.QtWidgets import QPlainTextEdit
+	from PyPaper.core.console import ConsoleOutput
+	edit = QPlainTextEdit()
+	out = ConsoleOutput(edit, max_blocks=10000)
+	stream = out.writer('black')
+	t0 = time.perf_counter()
+	for i in range(n):
+		print('line', i, file=stream)
+	out.flush()
+	return time.perf_counter() - t0
+
+@case('graph_drag_hub', 1000, 'move 100 times a graph node with N bound lines')
+def graph_drag_hub(root, n):
+	from PyPaper.tools.graph import Graph
+	g = Graph(root)
+	hub = g.add_node('hub')
+	leaves = g.add_nodes(n)
+	g.add_edges([(hub, leaf) for leaf in leaves])
+	t0 = time.perf_counter()
+	for k in range(100):
+		hub.item.set_pos(k * 3, k * 2)
+	return time.perf_counter() - t0
+
+def _paint(n, image):
+	from PyQt5.QtGui import QImage, QPainter
+	from PyPaper.core.styleditem import StyledItem
+	it = StyledItem()
+	it.set_size(100, 100)
+	it.set_text('PyPaper')
+	if image:
+		it.set_background_image(os.path.join(_REPO, 'Art', 'icon128.png'))
+	img = QImage(100, 100, QImage.Format_ARGB32_Premultiplied)
+	painter = QPainter(img)
+	t0 = time.perf_counter()
+	for _ in range(n):
+		it.paint(painter)
+	dt = time.perf_counter() - t0
+	painter.end()
+	return dt
+
+@case('paint_plain', 2000, 'N paint calls of a StyledItem')
+def paint_plain(root, n):
+	return _paint(n, False)
+
+@case('paint_image', 2000, 'N paint calls of a StyledItem with background image')
+def paint_image(root, n):
+	return _paint(n, True)
+
+@case('selection_sort', 1000, 'build the animations of Examples/sorting.py selection sort on N bars', max_repeat=1)
+def selection_sort(root, n):
+	from PyPaper.core.styleditem import StyledItem
+	from PyPaper.core.animation import seq_anim_cm, par_anim_cm, stop_animations
+	import random
+	rnd = random.Random(0)
+	data = []
+	for i in range(n):
+		it = StyledItem(root)
+		it.set_size(rnd.randrange(10, 500), 5)
+		data.append(it)
+	t0 = time.perf_counter()
+	# As in Examples/sorting.py
+	with seq_anim_cm(*data):
+		for i in range(n):
+			data[i].background_color_to((0, 0, 1), duration=100)
+			min_i = i
+			data[min_i].background_color_to((0, 1, 0), duration=100)
+			for j in range(i, n):
+				data[j].background_color_to((1, 1, 0), duration=25)
+				if data[j].get_size()[0] < data[min_i].get_size()[0]:
+					data[min_i].background_color_to((1, 0, 0), duration=25)
+					min_i = j
+					data[min_i].background_color_to((0, 1, 0), duration=25)
+				else:
+					data[j].background_color_to((1, 0, 0), duration=25)
+			data[min_i].background_color_to((0, 1, 0), duration=100)
+			data[i], data[min_i] = data[min_i], data[i]
+			with par_anim_cm(*data):
+				for k, it in enumerate(data):
+					it.move_to(50, 100 + 10 * k, duration=100)
+	dt = time.perf_counter() - t0
+	stop_animations()
+	return dt
+
+def run(names=None, scale=1.0, repeat=3, log=sys.stderr):
+	'''Run the cases whose name contains one of names (all if None),
+	returns the results as a dict'''
+	app = make_app()
+	results = {}
+	for name, size, func, description, max_repeat in CASES:
+		if names and not any(n in name for n in names):
+			continue
+		n = max(1, int(size * scale))
+		best = None
+		for _ in range(min(repeat, max_repeat or repeat)):
+			win, root = make_root()
+			dt = func(root, n)
+			win.deleteLater()
+			# Delete what the case created before the next run
+			app.processEvents()
+			if best is None or dt < best:
+				best = dt
+		results[name] = {'size': n, 'seconds': best, 'us_per_op': best * 1e6 / n, 'description': description}
+		print('{:<20} {:>8} {:12.2f} ms {:12.3f} us/op'.format(name, n, best * 1e3, best * 1e6 / n), file=log)
+	return results
+
+def compare(results, baseline, tolerance):
+	'''Returns the regressions: (name, baseline seconds, seconds, ratio)'''
+	regressions = []
+	for name, res in results.items():
+		base = baseline.get(name)
+		if base is None or base['size'] != res['size']:
+			print('{:<20} no baseline'.format(name))
+			continue
+		ratio = res['seconds'] / base['seconds']
+		status = 'REGRESSION' if ratio > tolerance else 'ok'
+		print('{:<20} {:10.2f} ms -> {:10.2f} ms  x{:.2f}  {}'.format(name, base['seconds'] * 1e3, res['seconds'] * 1e3, ratio, status))
+		if ratio > tolerance:
+			regressions.append((name, base['seconds'], res['seconds'], ratio))
+	return regressions
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--only', nargs='+', help='Run the cases whose name contains one of these')
+	parser.add_argument('--scale', type=float, default=1.0, help='Multiply the size of every case')
+	parser.add_argument('--repeat', type=int, default=3)
+	parser.add_argument('--save', type=str, help='Write the results to this JSON file')
+	parser.add_argument('--baseline', type=str, help='Compare with the results in this JSON file')
+	parser.add_argument('--tolerance', type=float, default=1.25, help='Slowdown ratio reported as regression')
+	parser.add_argument('--list', action='store_true', help='List the cases')
+	args = parser.parse_args()
+
+	if args.list:
+		for name, size, func, description, max_repeat in CASES:
+			print('{:<20} {}'.format(name, description.replace('N', str(size))))
+		return
+
+	results = run(args.only, args.scale, args.repeat)
+	doc = {
+		'python': platform.python_version(),
+		'machine': platform.machine(),
+		'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+		'results': results,
+	}
+	if args.save:
+		with open(args.save, 'w') as f:
+			json.dump(doc, f, indent=1, sort_keys=True)
+	else:
+		json.dump(doc, sys.stdout, indent=1, sort_keys=True)
+		print()
+
+	if args.baseline:
+		with open(args.baseline) as f:
+			baseline = json.load(f)['results']
+		if compare(results, baseline, args.tolerance):
+			sys.exit(1)
+
+if __name__ == '__main__':
+	main()